@@ -1,5 +1,6 @@
 import cv2
 import os
+from collections import deque
 import matplotlib.pyplot as plt
 
 
@@ -48,6 +49,45 @@ def process_and_save_all_images(input_folder, output_folder, crop_width, crop_he
     return processed_files
 
 
+def iter_processed_images(input_folder, output_folder, crop_width, crop_height):
+    """
+    Generator version of `process_and_save_all_images`: crops one image at a time and yields
+    (input_path, output_path) as soon as it is saved, so at most one decoded image is held in memory.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+
+    for file_name in os.listdir(input_folder):
+        input_path = os.path.join(input_folder, file_name)
+        if not os.path.isfile(input_path):
+            continue
+        output_path = os.path.join(output_folder, f"{os.path.splitext(file_name)[0]}_crop{os.path.splitext(file_name)[1]}")
+
+        orig_image = cv2.imread(input_path)
+        if orig_image is None:
+            print(f"Skipping {file_name}: Unable to read the file.")
+            continue
+
+        cv2.imwrite(output_path, crop_center(orig_image, crop_width, crop_height))
+        print(f"Processed and saved: {output_path}")
+        yield input_path, output_path
+
+
+def collect_comparison_preview(results, num_each=5):
+    """
+    Consumes a result stream keeping only the first and last `num_each` path pairs (bounded ring),
+    then reloads those few (original, cropped) images from disk for display_comparisons.
+    """
+    head = []
+    tail = deque(maxlen=num_each)
+    for item in results:
+        if len(head) < num_each:
+            head.append(item)
+        else:
+            tail.append(item)
+
+    return [(cv2.imread(input_path), cv2.imread(output_path)) for input_path, output_path in head + list(tail)]
+
+
 def display_comparisons(processed_files):
     """Displays comparisons for the first 5 and last 5 processed files with size information."""
     num_files = len(processed_files)
@@ -87,8 +127,8 @@ def display_comparisons(processed_files):
 
 def main(input_folder, output_folder, crop_width, crop_height):
     """Main function to process and compare images."""
-    processed_files = process_and_save_all_images(input_folder, output_folder, crop_width, crop_height)
-    display_comparisons(processed_files)
+    results = iter_processed_images(input_folder, output_folder, crop_width, crop_height)
+    display_comparisons(collect_comparison_preview(results))
 
 
 # 실행 코드
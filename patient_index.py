@@ -0,0 +1,182 @@
+"""
+데이터셋 폴더의 환자 인덱스.
+
+`<root>/<class>/<patient>_*.bmp` 구조의 데이터셋을 `os.scandir`로 한 번만 스캔하여
+클래스별 파일 이름과 크기를 기록하고, 환자 ID(파일명의 첫 번째 `_` 이전 부분) 단위로 조회합니다.
+인덱스는 `<root>_index.json.gz`에 압축 저장되며, 다시 불러올 때는 디렉토리 mtime이
+바뀐 클래스 폴더만 재스캔합니다.
+
+샘플링(step_3), 크롭(step_4), 분할(step_5)에서 `os.listdir` + 파일별 `os.path.isfile` 대신 사용합니다.
+
+실행: python patient_index.py ../../dataset/medical_datasets/Fundus_BCVA-Est
+"""
+import argparse
+import gzip
+import json
+import os
+from collections import defaultdict
+
+INDEX_FORMAT_VERSION = 1
+
+
+def default_index_path(root):
+    """인덱스 파일 기본 경로: 데이터셋 폴더 옆의 `<root>_index.json.gz`."""
+    return os.path.normpath(root) + "_index.json.gz"
+
+
+def patient_id_from_name(file_name):
+    """파일명에서 '_' 이전 부분을 환자 ID로 추출합니다."""
+    return file_name.split("_")[0]
+
+
+def class_name_from_folder(folder_path):
+    """클래스 폴더 경로에서 클래스 이름(폴더 이름)을 추출합니다. 예: './va_datasets/09/' → '09'."""
+    return os.path.basename(os.path.normpath(folder_path))
+
+
+def scan_class_folder(folder_path):
+    """
+    클래스 폴더 하나를 `os.scandir`로 스캔합니다.
+    Args:
+        folder_path (str): 클래스 폴더 경로.
+    Returns:
+        tuple: (파일 이름 리스트, 파일 크기 리스트) - 파일 이름 순으로 정렬.
+    """
+    files = []
+    with os.scandir(folder_path) as entries:
+        for entry in entries:
+            if entry.is_file():  # d_type으로 판별되므로 별도의 stat 호출이 필요 없음
+                files.append((entry.name, entry.stat().st_size))
+    files.sort()
+    return [name for name, _ in files], [size for _, size in files]
+
+
+class PatientIndex:
+    """
+    클래스 폴더별 파일 목록과 크기를 보관하는 인덱스.
+
+    내부 구조: {클래스 이름: {"mtime_ns": 디렉토리 mtime, "names": [...], "sizes": [...]}}
+    """
+
+    def __init__(self, root, classes=None):
+        self.root = root
+        self.classes = classes or {}
+
+    @classmethod
+    def load(cls, index_path):
+        """압축된 인덱스 파일을 읽습니다."""
+        with gzip.open(index_path, "rt", encoding="utf-8") as f:
+            payload = json.load(f)
+        if payload.get("version") != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Unsupported patient index version in {index_path}: {payload.get('version')}")
+        return cls(payload["root"], payload["classes"])
+
+    def save(self, index_path):
+        """인덱스를 gzip JSON으로 저장합니다 (임시 파일에 쓴 뒤 rename)."""
+        tmp_path = f"{index_path}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump({"version": INDEX_FORMAT_VERSION, "root": self.root, "classes": self.classes},
+                      f, separators=(",", ":"), ensure_ascii=False)
+        os.replace(tmp_path, index_path)
+
+    def refresh(self):
+        """
+        디렉토리 mtime이 바뀐(파일이 추가/삭제된) 클래스 폴더만 다시 스캔하고, 사라진 폴더는 제거합니다.
+        Returns:
+            list: 다시 스캔되었거나 제거된 클래스 이름 목록 (비어 있으면 인덱스 변경 없음).
+        """
+        changed = []
+        present = set()
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                if not entry.is_dir():
+                    continue
+                present.add(entry.name)
+                mtime_ns = entry.stat().st_mtime_ns
+                cached = self.classes.get(entry.name)
+                if cached is not None and cached["mtime_ns"] == mtime_ns:
+                    continue
+                names, sizes = scan_class_folder(entry.path)
+                self.classes[entry.name] = {"mtime_ns": mtime_ns, "names": names, "sizes": sizes}
+                changed.append(entry.name)
+
+        for class_name in list(self.classes):
+            if class_name not in present:
+                del self.classes[class_name]
+                changed.append(class_name)
+        return changed
+
+    def class_names(self):
+        return sorted(self.classes)
+
+    def files(self, class_name, extension=None):
+        """클래스 폴더의 파일 이름 리스트 (extension을 주면 해당 확장자만)."""
+        names = self.classes.get(class_name, {}).get("names", [])
+        if extension is None:
+            return list(names)
+        return [name for name in names if name.endswith(extension)]
+
+    def group_by_patient(self, class_name, extension=None):
+        """
+        클래스 폴더의 파일을 환자 ID별로 그룹화합니다.
+        Returns:
+            defaultdict: {환자 ID: [파일 이름, ...]}
+        """
+        patient_files = defaultdict(list)
+        for name in self.files(class_name, extension):
+            patient_files[patient_id_from_name(name)].append(name)
+        return patient_files
+
+    def patients(self):
+        """
+        전체 클래스에 대한 환자 인덱스.
+        Returns:
+            dict: {환자 ID: [(클래스 이름, 파일 이름, 파일 크기), ...]}
+        """
+        index = defaultdict(list)
+        for class_name in self.class_names():
+            entry = self.classes[class_name]
+            for name, size in zip(entry["names"], entry["sizes"]):
+                index[patient_id_from_name(name)].append((class_name, name, size))
+        return index
+
+
+def load_patient_index(root, index_path=None, refresh=True):
+    """
+    저장된 인덱스를 불러오고(없으면 새로 만들고) 변경된 클래스 폴더만 갱신합니다.
+    Args:
+        root (str): 클래스 폴더들이 들어 있는 데이터셋 폴더 (예: "./va_datasets").
+        index_path (str, optional): 인덱스 파일 경로 (기본값: `<root>_index.json.gz`).
+        refresh (bool): True이면 디렉토리 mtime을 확인하여 변경분을 재스캔하고 저장.
+    Returns:
+        PatientIndex: 환자 인덱스.
+    """
+    index_path = index_path or default_index_path(root)
+    index = None
+    if os.path.exists(index_path):
+        index = PatientIndex.load(index_path)
+        if os.path.normpath(index.root) != os.path.normpath(root):
+            index = None  # 다른 데이터셋의 인덱스이면 새로 생성
+    if index is None:
+        index = PatientIndex(root)
+        refresh = True
+
+    if refresh:
+        changed = index.refresh()
+        if changed or not os.path.exists(index_path):
+            index.save(index_path)
+            print(f"Patient index updated ({len(changed)} class folders rescanned): {index_path}")
+    return index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or refresh the patient index of a dataset folder.")
+    parser.add_argument("root", help="클래스 폴더들이 들어 있는 데이터셋 폴더")
+    parser.add_argument("--index-path", default=None, help="인덱스 파일 경로 (기본값: <root>_index.json.gz)")
+    args = parser.parse_args()
+
+    patient_index = load_patient_index(args.root, args.index_path)
+    for class_name in patient_index.class_names():
+        patients = patient_index.group_by_patient(class_name)
+        total_files = sum(len(files) for files in patients.values())
+        print(f"{class_name}: {len(patients)} patients, {total_files} files")
@@ -0,0 +1,87 @@
+"""
+CLAHE 전처리 마이크로 벤치마크: `ApplyCLAHE` + `Resize` vs `CLAHEPreprocess` (`va_dataset.py`).
+
+원본 해상도의 합성 펀더스 이미지(검은 배경 + 밝은 원)로 이미지당 처리 시간과 기존 결과와의 차이를 비교합니다.
+
+실행: python simple_test/bench_clahe.py [--resolution 1500] [--images 32] [--batch 16]
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+from PIL import Image
+from torchvision import transforms
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from va_dataset import IMAGE_SIZE, ApplyCLAHE, CLAHEPreprocess  # noqa: E402
+
+
+def make_images(num_images, resolution, rng):
+    """원형 안쪽에 노이즈가 있는 RGB 이미지 (크롭된 펀더스 이미지와 비슷한 구조)."""
+    yy, xx = np.mgrid[:resolution, :resolution]
+    inside = (yy - resolution / 2) ** 2 + (xx - resolution / 2) ** 2 < (resolution / 2.1) ** 2
+    images = []
+    for _ in range(num_images):
+        image = rng.integers(0, 60, size=(resolution, resolution, 3), dtype=np.uint8)
+        image[inside] += np.array([110, 60, 30], dtype=np.uint8)
+        image[~inside] = 0
+        images.append(cv2.GaussianBlur(image, (0, 0), 3))
+    return images
+
+
+def timed(fn, images, repeat=3):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(images)
+        best = min(best, time.perf_counter() - start)
+    return result, best / len(images)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--resolution", type=int, default=1500)
+    parser.add_argument("--images", type=int, default=32)
+    parser.add_argument("--batch", type=int, default=16)
+    parser.add_argument("--threads", type=int, default=1, help="cv2 스레드 수 (DataLoader 워커와 같은 조건은 1)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    cv2.setNumThreads(args.threads)
+    images = make_images(args.images, args.resolution, np.random.default_rng(args.seed))
+    pil_images = [Image.fromarray(image) for image in images]
+
+    legacy = transforms.Compose([ApplyCLAHE(), transforms.Resize(IMAGE_SIZE)])
+    cached = CLAHEPreprocess(IMAGE_SIZE)
+    resize_first = CLAHEPreprocess(IMAGE_SIZE, resize_first=True)
+
+    def run_batched(op):
+        def run(batch_images):
+            return np.concatenate([op.batch(batch_images[i:i + args.batch])
+                                   for i in range(0, len(batch_images), args.batch)])
+        return run
+
+    cases = [
+        ("ApplyCLAHE + Resize (PIL)", lambda xs: np.stack([np.asarray(legacy(x)) for x in xs]), pil_images),
+        ("CLAHEPreprocess", lambda xs: np.stack([cached(x) for x in xs]), images),
+        (f"CLAHEPreprocess.batch({args.batch})", run_batched(cached), images),
+        ("CLAHEPreprocess resize_first", lambda xs: np.stack([resize_first(x) for x in xs]), images),
+        (f"resize_first .batch({args.batch})", run_batched(resize_first), images),
+    ]
+
+    print(f"Images: {args.images} x {args.resolution}px -> {IMAGE_SIZE}, cv2 threads: {args.threads}")
+    print(f"{'Method':<32}{'ms/image':>10}{'speedup':>9}{'max diff':>10}{'mean diff':>11}")
+    reference, base_time = None, None
+    for name, fn, inputs in cases:
+        result, seconds = timed(fn, inputs)
+        if reference is None:
+            reference, base_time = result, seconds
+        diff = np.abs(result.astype(np.int16) - reference.astype(np.int16))
+        print(f"{name:<32}{seconds * 1000:>10.2f}{base_time / seconds:>8.1f}x{diff.max():>10d}{diff.mean():>11.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+CPU 실행 모드 비교: fp32 vs bfloat16 autocast, 기본 메모리 형식 vs channels_last (backbone별).
+
+각 모드에서 head 학습 step(고정 backbone forward + head backward)과 추론의 images/second를 측정하고,
+fp32 대비 정확도 차이를 보고합니다.
+- --split과 --checkpoint-dir를 주면: 학습된 모델(`best_<backbone>_model_overall.pth`)의 test 정확도/F1을 모드별로 비교
+- 주지 않으면: 같은 가중치/입력에서 fp32 예측과의 top-1 일치율과 최대 logit 차이
+- --split과 --train-epochs N을 주면: 모드마다 같은 시드로 첫 fold의 head를 `train_fold`로 N epoch 학습하고
+  (학습도 해당 모드의 bf16/channels_last로 실행) best val 정확도와 test 정확도, fp32 대비 test 정확도 차이를 비교
+
+앞의 두 방식은 fp32로 학습된(또는 무작위) 가중치를 각 모드로 추론만 하므로 bf16/channels_last 학습 경로의
+정확도 영향은 --train-epochs로만 확인할 수 있습니다.
+
+실행: python simple_test/bench_cpu_precision.py --backbones efficientnet_b4 xception vit --threads 8
+      python simple_test/bench_cpu_precision.py --backbones efficientnet_b4 --split ./combined_dataset/combined_dataset.json --train-epochs 3
+"""
+import argparse
+import copy
+import os
+import sys
+import time
+
+import torch
+import torch.nn as nn
+import torch.optim as optim
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import step_7_va_measurement_v1 as engine  # noqa: E402
+from va_models import MODEL_FACTORIES, SCHEDULER_STEP_SIZE, create_backbone_model  # noqa: E402
+
+
+def modes_for(backbone):
+    """(이름, precision, channels_last) 목록. ViT에는 channels_last 모드를 측정하지 않음."""
+    modes = [("fp32", "fp32", False), ("bf16", "bf16", False)]
+    if backbone in engine.CHANNELS_LAST_BACKBONES:
+        modes += [("fp32 + channels_last", "fp32", True), ("bf16 + channels_last", "bf16", True)]
+    return modes
+
+
+def measure(model, images, labels, precision, channels_last, steps, train):
+    """
+    train=True이면 head 학습 step, False이면 추론의 images/second.
+    학습 step이 바꾼 가중치/BatchNorm 통계는 측정 후 되돌려 모드 간 정확도 비교에 영향을 주지 않습니다.
+    """
+    state = copy.deepcopy(model.state_dict()) if train else None
+    criterion = nn.CrossEntropyLoss()
+    optimizer = optim.Adam([p for p in model.parameters() if p.requires_grad], lr=1e-4)
+    images = engine.to_device(images, channels_last)
+    model.train(train)
+
+    def step():
+        if train:
+            optimizer.zero_grad()
+            with engine.autocast_context(precision):
+                outputs = model(images)
+            criterion(outputs.float(), labels).backward()
+            optimizer.step()
+        else:
+            with torch.no_grad(), engine.autocast_context(precision):
+                model(images)
+
+    step()  # warmup (oneDNN 커널 선택)
+    start = time.perf_counter()
+    for _ in range(steps):
+        step()
+    speed = steps * len(images) / (time.perf_counter() - start)
+    if state is not None:
+        model.load_state_dict(state)
+    return speed
+
+
+def train_and_evaluate(backbone, fold_loaders, test_loader, num_classes, precision, channels_last, num_epochs, seed,
+                       pretrained=True):
+    """
+    한 모드로 첫 fold의 head를 학습하고 best 가중치로 test를 평가합니다 (모드마다 같은 시드의 head 초기화/shuffle 순서).
+    Returns:
+        tuple: (best val accuracy, test accuracy)
+    """
+    fold_name = fold_loaders.fold_names[0]
+    fold_loaders.release()  # 로더를 새로 만들어 모드마다 같은 shuffle 순서에서 시작
+    loaders = fold_loaders[fold_name]
+    torch.manual_seed(seed)
+    model = engine.prepare_model(create_backbone_model(backbone, num_classes, pretrained=pretrained), channels_last)
+    _, lr = MODEL_FACTORIES[backbone]
+    _, best_val_accuracy, best_state = engine.train_fold(model, loaders["train"], loaders["val"], num_epochs, lr,
+                                                         SCHEDULER_STEP_SIZE[backbone], precision=precision,
+                                                         channels_last=channels_last)
+    engine.restore_state(model, best_state)
+    _, meter = engine.evaluate_metrics(model, test_loader, nn.CrossEntropyLoss(), precision, channels_last)
+    fold_loaders.release()
+    return best_val_accuracy, float(meter.accuracy())
+
+
+@torch.no_grad()
+def agreement(model, images, precision, channels_last, reference):
+    model.eval()
+    with engine.autocast_context(precision):
+        logits = model(engine.to_device(images, channels_last)).float()
+    match = (logits.argmax(dim=1) == reference.argmax(dim=1)).float().mean().item()
+    return 100 * match, (logits - reference).abs().max().item()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backbones", nargs="*", default=list(MODEL_FACTORIES), choices=list(MODEL_FACTORIES))
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--steps", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=None, help="intra-op 스레드 수")
+    parser.add_argument("--num-classes", type=int, default=11)
+    parser.add_argument("--split", default=None, help="test 정확도 비교용 분할 파일")
+    parser.add_argument("--checkpoint-dir", default=None, help="best_<backbone>_model_overall.pth가 있는 폴더")
+    parser.add_argument("--train-epochs", type=int, default=0,
+                        help="모드마다 첫 fold의 head를 N epoch 학습하여 val/test 정확도 비교 (--split 필요)")
+    parser.add_argument("--seed", type=int, default=42, help="--train-epochs의 head 초기화/shuffle 시드")
+    parser.add_argument("--no-pretrained", action="store_true")
+    args = parser.parse_args()
+    if args.train_epochs and not args.split:
+        parser.error("--train-epochs requires --split")
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    torch.manual_seed(0)
+    images = torch.randn(args.batch_size, 3, 224, 224)
+    labels = torch.randint(0, args.num_classes, (args.batch_size,))
+    test_loader = fold_loaders = None
+    if args.train_epochs:
+        fold_loaders, test_loader, args.num_classes = engine.build_fold_loaders(args.split, args.batch_size,
+                                                                                seed=args.seed)
+        labels = torch.randint(0, args.num_classes, (args.batch_size,))
+    elif args.split and args.checkpoint_dir:
+        _, test_loader, _ = engine.build_fold_loaders(args.split, args.batch_size)
+
+    print(f"Threads: {torch.get_num_threads()}, batch: {args.batch_size}, "
+          f"bf16 kernels: {torch.backends.mkldnn.is_available()}")
+    if fold_loaders:
+        header = f"Val Acc / Test Acc (d fp32) after {args.train_epochs} epochs"
+    else:
+        header = "Test Acc / F1" if test_loader else "Top-1 agree / max |dlogit|"
+    print(f"{'Backbone':<16}{'Mode':<22}{'train img/s':>12}{'infer img/s':>12}  {header}")
+    for backbone in args.backbones:
+        model = create_backbone_model(backbone, args.num_classes, pretrained=not args.no_pretrained)
+        if test_loader and not fold_loaders:
+            checkpoint = os.path.join(args.checkpoint_dir, f"best_{backbone}_model_overall.pth")
+            model.load_state_dict(torch.load(checkpoint, map_location="cpu"))
+        model.eval()
+        with torch.no_grad():
+            reference = model(images).float()
+
+        base_train = base_infer = base_test = None
+        for name, precision, channels_last in modes_for(backbone):
+            model = model.to(memory_format=torch.channels_last if channels_last else torch.contiguous_format)
+            train_speed = measure(model, images, labels, precision, channels_last, args.steps, train=True)
+            infer_speed = measure(model, images, labels, precision, channels_last, args.steps, train=False)
+            base_train, base_infer = base_train or train_speed, base_infer or infer_speed
+            if fold_loaders:
+                val_accuracy, test_accuracy = train_and_evaluate(
+                    backbone, fold_loaders, test_loader, args.num_classes, precision, channels_last,
+                    args.train_epochs, args.seed, pretrained=not args.no_pretrained)
+                base_test = test_accuracy if base_test is None else base_test
+                quality = f"{val_accuracy:6.2f}% / {test_accuracy:6.2f}% ({test_accuracy - base_test:+.2f})"
+            elif test_loader:
+                _, f1, cm = engine.evaluate_model(model, test_loader, nn.CrossEntropyLoss(), precision, channels_last)
+                quality = f"{100 * cm.diagonal().sum() / cm.sum():6.2f}% / {f1:.4f}"
+            else:
+                match, max_diff = agreement(model, images, precision, channels_last, reference)
+                quality = f"{match:6.2f}% / {max_diff:.4f}"
+            print(f"{backbone:<16}{name:<22}{train_speed:>7.1f} ({train_speed / base_train:.2f}x)"
+                  f"{infer_speed:>7.1f} ({infer_speed / base_infer:.2f}x)  {quality}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+step_4_crop2 크롭 엔진 벤치마크.
+
+합성 펀더스 유사 이미지(검은 배경 + 밝은 원판 + 노이즈)에서 기존 픽셀 탐색 루프
+(`crop_image_to_black_square_legacy`)와 벡터화 엔진(`crop_image_to_black_square`)의
+결과가 동일한지 확인하고, 초당 처리 이미지 수를 비교합니다.
+
+실행: python simple_test/bench_crop_engine.py [--count 20] [--width 3000] [--height 2000]
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from step_4_crop2 import crop_image_to_black_square, crop_image_to_black_square_legacy  # noqa: E402
+
+
+def make_fundus_like_image(width, height, rng):
+    """검은 배경 위에 중심이 약간 어긋난 밝은 원판과 혈관 유사 노이즈를 그린 BGR 이미지를 만듭니다."""
+    image = np.zeros((height, width, 3), dtype=np.uint8)
+    radius = int(min(width, height) * rng.uniform(0.40, 0.52))
+    center = (width // 2 + int(rng.integers(-20, 21)), height // 2 + int(rng.integers(-20, 21)))
+    color = tuple(int(c) for c in rng.integers(60, 220, size=3))
+    cv2.circle(image, center, radius, color, thickness=-1)
+
+    noise = rng.integers(0, 30, size=image.shape, dtype=np.uint8)
+    disc = image.any(axis=2)
+    image[disc] = np.minimum(image[disc].astype(np.uint16) + noise[disc], 255).astype(np.uint8)
+    return image
+
+
+def check_equivalence(num_cases, rng):
+    """다양한 크기(홀수/짝수, 세로형, 흑백, 완전 비검정)의 이미지에서 두 엔진의 결과를 비교합니다."""
+    cases = []
+    for _ in range(num_cases):
+        w, h = int(rng.integers(3, 400)), int(rng.integers(3, 400))
+        cases.append(make_fundus_like_image(w, h, rng))
+    cases.append(np.full((101, 57, 3), 255, dtype=np.uint8))  # 검은 모서리가 없는 경우
+    cases.append(np.zeros((64, 80, 3), dtype=np.uint8))  # 전부 검은 경우
+    cases.append(make_fundus_like_image(300, 200, rng)[:, :, 0])  # 단일 채널
+
+    for i, image in enumerate(cases):
+        expected = crop_image_to_black_square_legacy(image)
+        actual = crop_image_to_black_square(image)
+        if expected.shape != actual.shape or not np.array_equal(expected, actual):
+            raise AssertionError(f"case {i}: legacy {expected.shape} != vectorized {actual.shape}")
+    print(f"Equivalence: {len(cases)} cases identical")
+
+
+def benchmark(crop_fn, images):
+    """이미지 목록 전체를 크롭하는 데 걸린 시간으로 초당 처리 이미지 수를 계산합니다."""
+    start = time.perf_counter()
+    for image in images:
+        crop_fn(image)
+    elapsed = time.perf_counter() - start
+    return len(images) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=20, help="벤치마크에 사용할 이미지 수")
+    parser.add_argument("--width", type=int, default=3000)
+    parser.add_argument("--height", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    check_equivalence(200, rng)
+
+    images = [make_fundus_like_image(args.width, args.height, rng) for _ in range(args.count)]
+    legacy_ips = benchmark(crop_image_to_black_square_legacy, images)
+    vectorized_ips = benchmark(crop_image_to_black_square, images)
+
+    print(f"Images: {args.count} x {args.width}x{args.height}")
+    print(f"Legacy loop : {legacy_ips:10.1f} images/s")
+    print(f"Vectorized  : {vectorized_ips:10.1f} images/s  ({vectorized_ips / legacy_ips:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
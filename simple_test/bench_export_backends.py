@@ -0,0 +1,81 @@
+"""
+내보낸 모델 백엔드 비교 (backbone별): eager PyTorch vs TorchScript vs ONNX Runtime (CPU).
+
+backbone마다 모델을 TorchScript/ONNX로 내보내고, 같은 입력에서 eager 출력과의 최대 logit 차이/top-1 일치율과
+batch 크기별 지연 시간(ms/batch, images/second)을 출력합니다.
+- --checkpoint-dir를 주면 학습된 `best_<backbone>_model_overall.pth`를, 주지 않으면 head가 무작위 초기화된 모델을 사용
+
+실행: python simple_test/bench_export_backends.py --backbones efficientnet_b4 xception vit --threads 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from va_export import (EagerBackend, OnnxRuntimeBackend, TorchScriptBackend, check_parity,  # noqa: E402
+                       export_onnx, export_torchscript)
+from va_models import MODEL_FACTORIES, create_backbone_model, load_trained_model  # noqa: E402
+
+
+def measure_latency(backend, images, steps):
+    """warmup 1회 후 steps번 실행한 batch 지연 시간의 중앙값(ms)."""
+    backend(images)
+    times = []
+    for _ in range(steps):
+        start = time.perf_counter()
+        backend(images)
+        times.append(time.perf_counter() - start)
+    return 1000 * float(np.median(times))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backbones", nargs="*", default=list(MODEL_FACTORIES), choices=list(MODEL_FACTORIES))
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 16])
+    parser.add_argument("--steps", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=None, help="intra-op 스레드 수 (PyTorch, ONNX Runtime 공통)")
+    parser.add_argument("--num-classes", type=int, default=11)
+    parser.add_argument("--checkpoint-dir", default=None, help="best_<backbone>_model_overall.pth가 있는 폴더")
+    parser.add_argument("--no-pretrained", action="store_true")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    torch.manual_seed(0)
+    print(f"Threads: {torch.get_num_threads()}")
+    print(f"{'Backbone':<16}{'Backend':<14}{'Batch':>6}{'ms/batch':>10}{'img/s':>9}{'speedup':>9}  Parity")
+    with tempfile.TemporaryDirectory() as export_dir:
+        for backbone in args.backbones:
+            if args.checkpoint_dir:
+                checkpoint = os.path.join(args.checkpoint_dir, f"best_{backbone}_model_overall.pth")
+                model, _, _ = load_trained_model(checkpoint, backbone)
+            else:
+                model = create_backbone_model(backbone, args.num_classes, pretrained=not args.no_pretrained).eval()
+            backends = {
+                "eager": EagerBackend(model),
+                "torchscript": TorchScriptBackend(export_torchscript(model, os.path.join(export_dir, f"{backbone}.pt"))),
+                "onnxruntime": OnnxRuntimeBackend(export_onnx(model, os.path.join(export_dir, f"{backbone}.onnx")),
+                                                  args.threads),
+            }
+            parity_images = torch.randn(max(args.batch_sizes), 3, 224, 224)
+            parity = {"eager": ""}
+            for name, backend in list(backends.items())[1:]:
+                result = check_parity(backends["eager"], backend, parity_images)
+                parity[name] = f"max |dlogit| {result['max_abs_diff']:.1e}, top-1 {result['top1_agreement']:.0f}%"
+            for batch_size in args.batch_sizes:
+                images = torch.randn(batch_size, 3, 224, 224)
+                base = None
+                for name, backend in backends.items():
+                    latency = measure_latency(backend, images, args.steps)
+                    base = base or latency
+                    print(f"{backbone:<16}{name:<14}{batch_size:>6}{latency:>10.1f}{1000 * batch_size / latency:>9.1f}"
+                          f"{base / latency:>8.2f}x  {parity[name]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+step_5 환자 단위 테스트 분할 벤치마크.
+
+합성 환자 크기 분포(기하/포아송/소수의 대형 환자가 섞인 heavy-tail)에서 기존 방식
+(`calculate_test_size_random` + 리스트 기반 remaining_ids)과 `select_test_patients_knapsack`
++ 집합 기반 remaining_ids의 실행 시간과 목표 `test_ratio` 대비 오차를 비교합니다.
+
+실행: python simple_test/bench_patient_split.py [--sizes 1000 10000 100000 1000000] [--legacy-max 20000]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from step_5_kfold_dataset_split_train_val_test_for_all_class_v2 import (  # noqa: E402
+    calculate_test_size_random,
+    select_test_patients_knapsack,
+)
+
+DISTRIBUTIONS = {
+    "geometric": lambda rng, n: rng.geometric(0.35, size=n),
+    "poisson": lambda rng, n: rng.poisson(4, size=n) + 1,
+    "heavy_tail": lambda rng, n: np.minimum(rng.pareto(1.2, size=n) * 2 + 1, 500).astype(int),
+}
+
+
+def make_patients(sizes):
+    """환자 ID → 가짜 파일 리스트 딕셔너리를 만듭니다."""
+    return {f"P{i:07d}": [None] * int(size) for i, size in enumerate(sizes)}
+
+
+def run_legacy(patient_ids, patients, test_ratio, seed):
+    selected, ratio, _ = calculate_test_size_random(patient_ids, patients, test_ratio, random_state=seed)
+    remaining = [pid for pid in patient_ids if pid not in selected]  # 기존 process_folder_v2와 동일
+    return ratio, len(remaining)
+
+
+def run_knapsack(patient_ids, patients, test_ratio, seed):
+    selected, ratio, _ = select_test_patients_knapsack(patient_ids, patients, test_ratio, random_state=seed)
+    selected_set = set(selected)
+    remaining = [pid for pid in patient_ids if pid not in selected_set]
+    return ratio, len(remaining)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    parser.add_argument("--legacy-max", type=int, default=20000, help="이보다 환자 수가 많으면 기존 방식은 건너뜀 (O(n^2))")
+    parser.add_argument("--test-ratio", type=float, default=0.15)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{'distribution':<12} {'patients':>9} | {'legacy s':>9} {'ratio err':>9} | {'knapsack s':>10} {'ratio err':>9}")
+    for name, sampler in DISTRIBUTIONS.items():
+        for n in args.sizes:
+            patients = make_patients(sampler(rng, n))
+            patient_ids = list(patients.keys())
+
+            if n <= args.legacy_max:
+                (legacy_ratio, _), legacy_time = timed(run_legacy, patient_ids, patients, args.test_ratio, args.seed)
+                legacy_cols = f"{legacy_time:9.3f} {abs(legacy_ratio - args.test_ratio):9.5f}"
+            else:
+                legacy_cols = f"{'skipped':>9} {'-':>9}"
+            (ratio, _), knapsack_time = timed(run_knapsack, patient_ids, patients, args.test_ratio, args.seed)
+            print(f"{name:<12} {n:>9} | {legacy_cols} | {knapsack_time:10.3f} {abs(ratio - args.test_ratio):9.5f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+분할 파일 형식 벤치마크: indent=4 JSON vs 압축 npz (`split_format.py`).
+
+실제 데이터와 같은 경로 패턴(./preprocessed_va_datasets/<class>/<patient>_<n>_crop.bmp)의
+합성 분할 데이터셋을 만들어 파일 크기와 로드 시간을 비교합니다.
+
+실행: python simple_test/bench_split_format.py [--images 200000] [--folds 5]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from split_format import load_compact_split, load_split_dataset, save_compact_split  # noqa: E402
+
+
+def make_dataset(num_images, k_folds, rng):
+    """환자 단위로 test/fold를 나눈 합성 분할 데이터셋 (combined_dataset.json과 같은 구조)."""
+    classes = rng.integers(0, 11, size=num_images)
+    patients = rng.integers(0, num_images // 4 + 1, size=num_images)
+    paths = [f"./preprocessed_va_datasets/{c:02d}/{p:08d}_{i}_crop.bmp" for i, (c, p) in enumerate(zip(classes, patients))]
+    labels = {path: float(c) / 10 for path, c in zip(paths, classes)}
+
+    group = patients % (k_folds + 1)  # 0: test, 1..k: fold별 val
+    test = [path for path, g in zip(paths, group) if g == 0]
+    folds = {}
+    for k in range(k_folds):
+        folds[f"fold_{k}"] = {
+            "train": [path for path, g in zip(paths, group) if g not in (0, k + 1)],
+            "val": [path for path, g in zip(paths, group) if g == k + 1],
+        }
+    return {"folds": folds, "test": test, "labels": labels}
+
+
+def timed(fn, *args, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=200000)
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    dataset = make_dataset(args.images, args.folds, np.random.default_rng(args.seed))
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, "combined_dataset.json")
+        npz_path = os.path.join(tmp, "combined_dataset.npz")
+        with open(json_path, "w") as f:
+            json.dump(dataset, f, indent=4)
+        save_compact_split(dataset, npz_path)
+
+        loaded_json, json_time = timed(load_split_dataset, json_path)
+        _, npz_time = timed(load_compact_split, npz_path)
+        loaded_npz, npz_dict_time = timed(load_split_dataset, npz_path)
+        assert loaded_npz == loaded_json
+
+        json_size, npz_size = os.path.getsize(json_path), os.path.getsize(npz_path)
+        print(f"Images: {args.images}, folds: {args.folds}")
+        print(f"JSON (indent=4): {json_size / 1e6:8.2f} MB, load {json_time * 1000:8.1f} ms")
+        print(f"NPZ (compact)  : {npz_size / 1e6:8.2f} MB, load {npz_time * 1000:8.1f} ms "
+              f"({json_size / npz_size:.1f}x smaller, {json_time / npz_time:.1f}x faster)")
+        print(f"NPZ -> JSON-compatible dict: {npz_dict_time * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+`step_6_compuate_mean_std.py` 히스토그램 모드 확인: 합성 이미지에서 numpy로 직접 계산한 값과 비교합니다.
+
+- 평균/표준편차, 백분위수 (q=0 → 최솟값, q=100 → 최댓값 포함, np.percentile(method="inverted_cdf") 기준)
+- exclude_black=True일 때 검은 마스크 픽셀 제외
+- HistogramCache: 같은 경로의 파일을 다시 쓰면 (size, mtime_ns)가 달라져 히스토그램을 새로 계산
+
+실행: python simple_test/check_histogram_stats.py [--images 8] [--size 64]
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from step_6_compuate_mean_std import HistogramCache, HistogramStats, image_histograms  # noqa: E402
+
+PERCENTILES = [0, 1, 50, 99, 100]
+
+
+def make_image(rng, size, low, high):
+    """[low, high) 값의 원판 + 검은 바깥 영역 (최솟값이 0이 아닌 bin에서 시작하도록 원판 값은 low 이상)."""
+    yy, xx = np.mgrid[:size, :size]
+    inside = (yy - size / 2) ** 2 + (xx - size / 2) ** 2 < (size / 2.2) ** 2
+    image = rng.integers(low, high, size=(size, size, 3), dtype=np.uint8)
+    image[~inside] = 0
+    return image
+
+
+def check_stats(images):
+    stats = HistogramStats()
+    for image in images:
+        stats.add(*image_histograms(image))
+    pixels = np.concatenate([image.reshape(-1, 3) for image in images])
+    foreground = pixels[pixels.max(axis=1) > 0]
+    for exclude_black, values in ((False, pixels), (True, foreground)):
+        mean, std = stats.mean_std(exclude_black)
+        assert np.allclose(mean, values.mean(axis=0) / 255.0), "mean mismatch"
+        assert np.allclose(std, values.std(axis=0) / 255.0), "std mismatch"
+        expected = np.percentile(values, PERCENTILES, axis=0, method="inverted_cdf").astype(np.int64)
+        actual = stats.percentiles(PERCENTILES, exclude_black)
+        assert np.array_equal(actual, expected), f"percentiles mismatch: {actual.tolist()} != {expected.tolist()}"
+        print(f"exclude_black={exclude_black}: percentiles {PERCENTILES} -> {actual.tolist()} OK")
+    assert stats.percentiles([0], exclude_black=True).min() > 0, "q=0 must be the minimum populated bin"
+
+
+def check_cache(rng, size):
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "image.png")
+        cache_path = os.path.join(folder, "histograms.npz")
+        Image.fromarray(make_image(rng, size, 10, 20)).save(path)
+        cache = HistogramCache()
+        assert cache.update([path], num_workers=1) == 1
+        cache.save(cache_path)
+
+        cache = HistogramCache.load(cache_path)
+        assert cache.update([path], num_workers=1) == 0, "unchanged file must be reused"
+        Image.fromarray(make_image(rng, size, 200, 210)).save(path)  # 다시 crop된 것처럼 같은 경로에 덮어쓰기
+        os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1))  # 같은 크기/시각으로 저장되는 경우에도 구분
+        assert cache.update([path], num_workers=1) == 1, "rewritten file must be recomputed"
+        assert cache.stats([path]).percentiles([0], exclude_black=True).min() >= 200, "stale histogram reused"
+    print("HistogramCache: unchanged file reused, rewritten file recomputed OK")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=8)
+    parser.add_argument("--size", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    check_stats([make_image(rng, args.size, 5, 250) for _ in range(args.images)])
+    check_cache(rng, args.size)
+
+
+if __name__ == "__main__":
+    main()
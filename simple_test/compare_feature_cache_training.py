@@ -0,0 +1,116 @@
+"""
+고정 backbone 학습 비교: 기존 fold 루프(매 epoch 전체 forward) vs 특징 캐시 모드(`va_features.py`).
+
+같은 fold의 train/val로 두 방식을 각각 학습하고, test 분할에서의 정확도/F1과 학습 시간을 나란히 출력합니다.
+
+실행: python simple_test/compare_feature_cache_training.py ./combined_dataset/combined_dataset.json \
+          --backbone efficientnet_b4 --fold fold_0 --epochs 50 --variants 4
+"""
+import argparse
+import copy
+import os
+import sys
+import time
+
+import torch
+import torch.nn as nn
+import torch.optim as optim
+from sklearn.metrics import f1_score
+from torch.utils.data import DataLoader
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from split_format import load_split_dataset  # noqa: E402
+from va_dataset import FoldDataset, eval_transform, train_transform, transform_labels  # noqa: E402
+from va_features import train_fold_with_feature_cache  # noqa: E402
+from va_models import MODEL_FACTORIES, SCHEDULER_STEP_SIZE, create_backbone_model  # noqa: E402
+
+
+@torch.no_grad()
+def evaluate(model, loader):
+    model.eval()
+    y_true, y_pred = [], []
+    for images, labels in loader:
+        y_pred.extend(model(images).argmax(dim=1).tolist())
+        y_true.extend(labels.tolist())
+    accuracy = 100 * sum(t == p for t, p in zip(y_true, y_pred)) / len(y_true)
+    return accuracy, f1_score(y_true, y_pred, average="weighted")
+
+
+def train_fold_full(model, train_loader, val_loader, num_epochs, lr, step_size=None):
+    """
+    노트북의 fold 루프와 같은 방식: 매 epoch 전체 모델 forward/backward, best val accuracy의 가중치 선택.
+    step_size가 None이면 scheduler 미사용 (`SCHEDULER_STEP_SIZE`와 같은 의미).
+    """
+    optimizer = optim.Adam([p for p in model.parameters() if p.requires_grad], lr=lr)
+    scheduler = optim.lr_scheduler.StepLR(optimizer, step_size=step_size, gamma=0.1) if step_size else None
+    criterion = nn.CrossEntropyLoss()
+    best_val_accuracy, best_state = -1.0, None
+    for epoch in range(num_epochs):
+        model.train()
+        for images, labels in train_loader:
+            optimizer.zero_grad()
+            loss = criterion(model(images), labels)
+            loss.backward()
+            optimizer.step()
+        val_accuracy, _ = evaluate(model, val_loader)
+        if val_accuracy > best_val_accuracy:
+            best_val_accuracy, best_state = val_accuracy, copy.deepcopy(model.state_dict())
+        print(f"Epoch [{epoch+1}/{num_epochs}], Val Accuracy: {val_accuracy:.2f}%")
+        if scheduler:
+            scheduler.step()
+    model.load_state_dict(best_state)
+    return model
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("split_path", help="combined_dataset.json 또는 .npz")
+    parser.add_argument("--backbone", default="efficientnet_b4", choices=list(MODEL_FACTORIES))
+    parser.add_argument("--fold", default=None, help="비교할 fold (기본값: 첫 번째 fold)")
+    parser.add_argument("--epochs", type=int, default=50)
+    parser.add_argument("--variants", type=int, default=4, help="특징 캐시 모드의 train 증강 변형 수")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--cache-dir", default=None, help="특징 캐시 폴더 (기본값: 메모리)")
+    parser.add_argument("--no-pretrained", action="store_true", help="사전 학습 가중치 없이 실행 (동작 확인용)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    data = load_split_dataset(args.split_path)
+    labels = transform_labels(data["labels"])
+    num_classes = max(labels.values()) + 1
+    fold_name = args.fold or next(iter(data["folds"]))
+    train_paths, val_paths = data["folds"][fold_name]["train"], data["folds"][fold_name]["val"]
+    test_paths = data["test"] or val_paths
+
+    train_dataset = FoldDataset(train_paths, labels, transform=train_transform)
+    val_dataset = FoldDataset(val_paths, labels, transform=eval_transform)
+    test_loader = DataLoader(FoldDataset(test_paths, labels, transform=eval_transform), batch_size=args.batch_size)
+    _, lr = MODEL_FACTORIES[args.backbone]
+    step_size = SCHEDULER_STEP_SIZE[args.backbone]  # 학습 엔진(run_kfold)과 같은 scheduler 설정
+    results = {}
+
+    torch.manual_seed(args.seed)
+    model = create_backbone_model(args.backbone, num_classes, pretrained=not args.no_pretrained)
+    start_time = time.time()
+    model = train_fold_full(model, DataLoader(train_dataset, batch_size=args.batch_size, shuffle=True),
+                            DataLoader(val_dataset, batch_size=args.batch_size), args.epochs, lr, step_size)
+    results["full forward"] = (time.time() - start_time, *evaluate(model, test_loader))
+
+    torch.manual_seed(args.seed)
+    model = create_backbone_model(args.backbone, num_classes, pretrained=not args.no_pretrained)
+    start_time = time.time()
+    model, _ = train_fold_with_feature_cache(model, args.backbone, train_dataset, train_paths, val_dataset,
+                                             val_paths, cache_dir=args.cache_dir, fold_name=fold_name,
+                                             num_variants=args.variants, num_epochs=args.epochs,
+                                             batch_size=args.batch_size, lr=lr, step_size=step_size, seed=args.seed)
+    results[f"feature cache (x{args.variants})"] = (time.time() - start_time, *evaluate(model, test_loader))
+
+    print(f"\nBackbone: {args.backbone}, fold: {fold_name}, epochs: {args.epochs}, "
+          f"train/val/test: {len(train_paths)}/{len(val_paths)}/{len(test_paths)}")
+    print(f"{'Mode':<22}{'Train time (s)':>16}{'Test Acc (%)':>14}{'Test F1':>10}")
+    for mode, (seconds, accuracy, f1) in results.items():
+        print(f"{mode:<22}{seconds:>16.2f}{accuracy:>14.2f}{f1:>10.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+`va_predict.py --serve` HTTP 서비스 부하 테스트.
+
+동시 클라이언트 수만큼 스레드가 이미지를 반복해서 POST /predict로 보내고,
+요청 지연 시간의 p50/p99와 전체 images/second, 서버가 실제로 묶은 평균 마이크로 배치 크기를 출력합니다.
+
+실행:
+    python va_predict.py ./best_va_model/best_vit_model_overall.pth --serve --port 8000 --threads 8
+    python simple_test/load_test_predict.py ./new_images --url http://127.0.0.1:8000 --concurrency 1 8 32
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import urllib.request
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from va_predict import collect_image_paths  # noqa: E402
+
+
+def post_image(url, body):
+    request = urllib.request.Request(f"{url}/predict", data=body, headers={"Content-Type": "application/octet-stream"})
+    with urllib.request.urlopen(request) as response:
+        return json.load(response)
+
+
+def get_health(url):
+    with urllib.request.urlopen(f"{url}/health") as response:
+        return json.load(response)
+
+
+def run_load(url, images, concurrency, num_requests):
+    """
+    concurrency개 스레드가 합계 num_requests개의 요청을 보냅니다.
+    Returns:
+        tuple: (요청별 지연 시간 배열(s), 전체 소요 시간(s), 실패 수)
+    """
+    latencies, failures = [], []
+    lock = threading.Lock()
+    counter = iter(range(num_requests))
+
+    def client():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            start = time.perf_counter()
+            try:
+                post_image(url, images[i % len(images)])
+            except Exception as error:
+                with lock:
+                    failures.append(error)
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return np.array(latencies), time.perf_counter() - start, len(failures)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="+", help="요청에 사용할 이미지 폴더 또는 파일")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32], help="동시 클라이언트 수 (여러 개면 차례로 측정)")
+    parser.add_argument("--requests", type=int, default=200, help="동시성 설정마다 보낼 요청 수")
+    parser.add_argument("--warmup", type=int, default=4)
+    args = parser.parse_args()
+
+    images = []
+    for path in collect_image_paths(args.inputs):
+        with open(path, "rb") as f:
+            images.append(f.read())
+    if not images:
+        parser.error("no images found in inputs")
+    health = get_health(args.url)
+    print(f"Server: {health['backbone']} ({health['num_classes']} classes), {len(images)} distinct images")
+    for body in images[:args.warmup]:
+        post_image(args.url, body)
+
+    print(f"{'Concurrency':>12}{'p50 (ms)':>10}{'p99 (ms)':>10}{'images/s':>10}{'mean batch':>12}{'failed':>8}")
+    for concurrency in args.concurrency:
+        before = get_health(args.url)
+        latencies, elapsed, failed = run_load(args.url, images, concurrency, args.requests)
+        after = get_health(args.url)
+        batches = after["batches"] - before["batches"]
+        mean_batch = len(latencies) / batches if batches else 0.0
+        p50, p99 = (np.percentile(latencies, [50, 99]) * 1000) if len(latencies) else (float("nan"),) * 2
+        print(f"{concurrency:>12}{p50:>10.1f}{p99:>10.1f}{len(latencies) / elapsed:>10.1f}{mean_batch:>12.2f}"
+              f"{failed:>8}")
+
+
+if __name__ == "__main__":
+    main()
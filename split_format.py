@@ -0,0 +1,269 @@
+"""
+K-Fold 분할 결과의 압축 바이너리 형식 (.npz).
+
+`combined_dataset.json`은 같은 파일 경로를 fold별 train/val, test, labels 키에 반복해서 저장합니다.
+이 형식은 경로를 한 번만 저장(경로 테이블)하고 각 분할은 정수 인덱스 배열로, 레이블은
+경로 테이블과 같은 순서의 배열로 저장합니다.
+
+npz 구성:
+    paths         uint8   - "\n"으로 연결한 UTF-8 경로 테이블
+    labels        float64 - 경로 테이블 순서의 레이블
+    test          int32   - test 경로 인덱스
+    fold_names    uint8   - "\n"으로 연결한 fold 이름 (저장 순서 유지)
+    <fold>/train  int32   - fold별 train 경로 인덱스
+    <fold>/val    int32   - fold별 val 경로 인덱스
+
+실행 (JSON → npz 변환 및 크기/로드 시간 비교):
+    python split_format.py ./combined_dataset/combined_dataset.json ./combined_dataset/combined_dataset.npz
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+SPLIT_FORMAT_VERSION = 1
+
+
+def _encode_strings(strings):
+    return np.frombuffer("\n".join(strings).encode("utf-8"), dtype=np.uint8)
+
+
+def _decode_strings(array):
+    text = array.tobytes().decode("utf-8")
+    return text.split("\n") if text else []
+
+
+class CompactSplit:
+    """
+    경로 테이블 + 인덱스 배열로 표현한 분할 데이터셋.
+
+    Attributes:
+        paths (list): 경로 테이블 (중복 없음)
+        labels (ndarray): 경로 테이블 순서의 레이블
+        folds (dict): {fold 이름: {"train": 인덱스 배열, "val": 인덱스 배열}}
+        test (ndarray): test 인덱스 배열
+    """
+
+    def __init__(self, paths, labels, folds, test):
+        self.paths = paths
+        self.labels = labels
+        self.folds = folds
+        self.test = test
+
+    @classmethod
+    def from_dataset(cls, dataset):
+        """JSON 구조({"folds", "test", "labels"})에서 경로를 중복 없이 모아 인덱스로 변환합니다."""
+        path_ids = {}
+        paths = []
+
+        def intern(split_paths):
+            indices = np.empty(len(split_paths), dtype=np.int32)
+            for i, path in enumerate(split_paths):
+                idx = path_ids.get(path)
+                if idx is None:
+                    idx = path_ids[path] = len(paths)
+                    paths.append(path)
+                indices[i] = idx
+            return indices
+
+        folds = {
+            fold_name: {"train": intern(fold_data["train"]), "val": intern(fold_data["val"])}
+            for fold_name, fold_data in dataset["folds"].items()
+        }
+        test = intern(dataset["test"])
+        intern(dataset["labels"])  # 분할에 없는 레이블 키도 보존
+
+        label_map = dataset["labels"]
+        labels = np.array([label_map[path] for path in paths], dtype=np.float64)
+        return cls(paths, labels, folds, test)
+
+    def save(self, path, compressed=True):
+        """npz로 저장합니다. compressed=True이면 공통 경로 접두사가 zip 압축으로 크게 줄어듭니다."""
+        arrays = {
+            "version": np.array(SPLIT_FORMAT_VERSION),
+            "paths": _encode_strings(self.paths),
+            "labels": self.labels,
+            "test": self.test,
+            "fold_names": _encode_strings(list(self.folds)),
+        }
+        for fold_name, fold_data in self.folds.items():
+            arrays[f"{fold_name}/train"] = fold_data["train"]
+            arrays[f"{fold_name}/val"] = fold_data["val"]
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        save_fn = np.savez_compressed if compressed else np.savez
+        with open(path, "wb") as f:  # 파일 객체로 넘겨 np.savez가 ".npz"를 덧붙이지 않도록 함
+            save_fn(f, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as npz:
+            version = int(npz["version"])
+            if version != SPLIT_FORMAT_VERSION:
+                raise ValueError(f"Unsupported split format version in {path}: {version}")
+            paths = _decode_strings(npz["paths"])
+            folds = {
+                fold_name: {"train": npz[f"{fold_name}/train"], "val": npz[f"{fold_name}/val"]}
+                for fold_name in _decode_strings(npz["fold_names"])
+            }
+            return cls(paths, npz["labels"], folds, npz["test"])
+
+    def split_indices(self, split, fold_name=None):
+        """split="train"/"val"이면 fold_name의 인덱스, split="test"이면 test 인덱스를 반환합니다."""
+        if split == "test":
+            return self.test
+        return self.folds[fold_name][split]
+
+    def split_paths(self, split, fold_name=None):
+        return [self.paths[i] for i in self.split_indices(split, fold_name).tolist()]
+
+    def dataset_args(self, split, fold_name=None):
+        """
+        `FoldDataset(image_paths, labels, transform)`에 그대로 넘길 수 있는 (image_paths, labels) 쌍.
+        labels는 해당 분할의 경로만 담은 {경로: 레이블} 딕셔너리입니다.
+        """
+        indices = self.split_indices(split, fold_name).tolist()
+        image_paths = [self.paths[i] for i in indices]
+        labels = dict(zip(image_paths, self.labels[indices].tolist()))
+        return image_paths, labels
+
+    def to_dataset(self):
+        """기존 JSON과 같은 구조의 딕셔너리로 변환합니다 (`json.load` 결과와 호환)."""
+        return {
+            "folds": {
+                fold_name: {"train": self.split_paths("train", fold_name), "val": self.split_paths("val", fold_name)}
+                for fold_name in self.folds
+            },
+            "test": self.split_paths("test"),
+            "labels": dict(zip(self.paths, self.labels.tolist())),
+        }
+
+    def export_json(self, path, indent=4):
+        """호환성을 위한 JSON 내보내기 (기존 combined_dataset.json 형식)."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.to_dataset(), f, indent=indent)
+
+
+def save_compact_split(dataset, path, compressed=True):
+    """JSON 구조의 분할 데이터셋을 npz로 저장합니다."""
+    compact = CompactSplit.from_dataset(dataset)
+    compact.save(path, compressed)
+    return compact
+
+
+def load_compact_split(path):
+    return CompactSplit.load(path)
+
+
+def load_split_dataset(path):
+    """
+    확장자에 따라 JSON 또는 npz 분할 파일을 읽어 JSON 구조의 딕셔너리로 반환합니다.
+    노트북의 `json.load(f)`를 대체할 수 있습니다.
+    """
+    if str(path).endswith(".npz"):
+        return load_compact_split(path).to_dataset()
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def _load_raw_arrays(path):
+    """npz 배열을 문자열 디코딩 없이 그대로 읽습니다 (병합용)."""
+    with np.load(path) as npz:
+        version = int(npz["version"])
+        if version != SPLIT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported split format version in {path}: {version}")
+        return {key: npz[key] for key in npz.files}
+
+
+def merge_compact_splits(input_paths, output_path, num_workers=None, compressed=True):
+    """
+    클래스별 npz 분할 파일들을 하나로 병합합니다.
+
+    파일 읽기(압축 해제)는 스레드 풀에서 병렬로 수행하고, 경로 문자열은 디코딩하지 않은 채
+    경로 테이블 바이트를 이어 붙이고 인덱스에 앞선 파일들의 경로 수만큼 오프셋을 더합니다.
+    Args:
+        input_paths (list): 클래스별 npz 경로 (이 순서로 병합)
+        output_path (str): 병합된 npz 경로
+        num_workers (int, optional): 읽기 스레드 수 (기본값: 입력 파일 수와 CPU 수 중 작은 값)
+    Returns:
+        int: 병합된 경로 수
+    """
+    input_paths = list(input_paths)
+    num_workers = num_workers or min(len(input_paths), os.cpu_count() or 1) or 1
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        parts = list(executor.map(_load_raw_arrays, input_paths))
+
+    path_blobs, labels, tests = [], [], []
+    fold_names = []
+    fold_parts = {}
+    offset = 0
+    for arrays in parts:
+        blob = arrays["paths"]
+        num_paths = int(np.count_nonzero(blob == ord("\n"))) + 1 if len(blob) else 0
+        if num_paths:
+            path_blobs.append(blob)
+        labels.append(arrays["labels"])
+        tests.append(arrays["test"] + offset)
+        for fold_name in _decode_strings(arrays["fold_names"]):
+            if fold_name not in fold_parts:
+                fold_names.append(fold_name)
+                fold_parts[fold_name] = {"train": [], "val": []}
+            fold_parts[fold_name]["train"].append(arrays[f"{fold_name}/train"] + offset)
+            fold_parts[fold_name]["val"].append(arrays[f"{fold_name}/val"] + offset)
+        offset += num_paths
+
+    separator = np.array([ord("\n")], dtype=np.uint8)
+    joined = []
+    for i, blob in enumerate(path_blobs):
+        if i:
+            joined.append(separator)
+        joined.append(blob)
+
+    def concat(arrays, dtype):
+        return np.concatenate(arrays).astype(dtype, copy=False) if arrays else np.empty(0, dtype=dtype)
+
+    merged = {
+        "version": np.array(SPLIT_FORMAT_VERSION),
+        "paths": concat(joined, np.uint8),
+        "labels": concat(labels, np.float64),
+        "test": concat(tests, np.int32),
+        "fold_names": _encode_strings(fold_names),
+    }
+    for fold_name in fold_names:
+        merged[f"{fold_name}/train"] = concat(fold_parts[fold_name]["train"], np.int32)
+        merged[f"{fold_name}/val"] = concat(fold_parts[fold_name]["val"], np.int32)
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    save_fn = np.savez_compressed if compressed else np.savez
+    with open(output_path, "wb") as f:
+        save_fn(f, **merged)
+    return offset
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a split JSON to the compact npz format and compare.")
+    parser.add_argument("json_path", help="입력 JSON (예: ./combined_dataset/combined_dataset.json)")
+    parser.add_argument("npz_path", help="출력 npz 경로")
+    args = parser.parse_args()
+
+    dataset, json_time = _timed(load_split_dataset, args.json_path)
+    save_compact_split(dataset, args.npz_path)
+    compact, npz_time = _timed(load_compact_split, args.npz_path)
+    _, npz_dict_time = _timed(load_split_dataset, args.npz_path)
+
+    assert compact.to_dataset() == dataset, "round trip mismatch"
+    json_size = os.path.getsize(args.json_path)
+    npz_size = os.path.getsize(args.npz_path)
+    print(f"JSON : {json_size / 1e6:8.2f} MB, load {json_time * 1000:8.1f} ms")
+    print(f"NPZ  : {npz_size / 1e6:8.2f} MB, load {npz_time * 1000:8.1f} ms "
+          f"(as JSON dict: {npz_dict_time * 1000:.1f} ms)  -> {json_size / npz_size:.1f}x smaller")
@@ -1,16 +1,23 @@
 import os
 import shutil
-from collections import defaultdict
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 import random
 
-def group_files_by_patient(source_folder):
+from patient_index import class_name_from_folder, load_patient_index
+
+def group_files_by_patient(source_folder, index=None):
     """
     그룹화: 환자 ID를 기준으로 파일을 그룹화합니다.
     Args:
         source_folder (str): 파일이 저장된 원본 폴더 경로.
+        index (PatientIndex, optional): 환자 인덱스. 주어지면 폴더를 다시 스캔하지 않고 인덱스에서 조회.
     Returns:
         dict: 환자 ID를 키로 하고 파일 목록을 값으로 하는 딕셔너리.
     """
+    if index is not None:
+        return index.group_by_patient(class_name_from_folder(source_folder))
+
     patient_files = defaultdict(list)  # 환자 ID를 키로 하고 파일 목록을 저장할 딕셔너리
 
     # 원본 폴더의 파일 목록을 순회
@@ -21,20 +28,107 @@ def group_files_by_patient(source_folder):
 
     return patient_files  # 환자별로 그룹화된 파일 딕셔너리 반환
 
-def copy_patient_files(source_folder, destination_folder, num_files=None):
+TRANSFER_STRATEGIES = ("copy", "hardlink", "symlink", "reflink", "auto")
+FICLONE = 0x40049409  # Linux ioctl: 파일 내용을 복사 없이 공유 (Btrfs, XFS 등 CoW 파일시스템)
+
+
+def reflink_file(source_path, destination_path):
+    """
+    Copy-on-write 복제(reflink)로 파일을 만듭니다. 데이터 블록은 공유되어 I/O가 거의 없습니다.
+    Args:
+        source_path (str): 원본 파일 경로.
+        destination_path (str): 대상 파일 경로.
+    Raises:
+        OSError: 플랫폼이나 파일시스템이 reflink를 지원하지 않는 경우.
+    """
+    try:
+        import fcntl
+    except ImportError as e:  # Windows 등 fcntl이 없는 플랫폼
+        raise OSError("reflink is not supported on this platform") from e
+
+    try:
+        with open(source_path, "rb") as src, open(destination_path, "wb") as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+    except OSError:
+        if os.path.exists(destination_path):
+            os.remove(destination_path)  # 실패 시 빈 파일이 남지 않도록 정리
+        raise
+    shutil.copystat(source_path, destination_path)
+
+
+def transfer_file(source_path, destination_path, strategy="copy"):
+    """
+    지정한 전송 방식으로 파일 하나를 대상 경로에 만듭니다. 링크/복제가 불가능하면 복사로 대체합니다.
+    Args:
+        source_path (str): 원본 파일 경로.
+        destination_path (str): 대상 파일 경로.
+        strategy (str): "copy", "hardlink", "symlink", "reflink", "auto" (reflink → hardlink → copy 순서로 시도).
+    Returns:
+        str: 실제로 사용된 전송 방식.
+    """
+    if strategy not in TRANSFER_STRATEGIES:
+        raise ValueError(f"Unknown transfer strategy: {strategy}. Choose from {TRANSFER_STRATEGIES}.")
+
+    if os.path.lexists(destination_path):
+        # 링크는 기존 파일을 덮어쓰지 못하고, 이전 실행의 하드/심볼릭 링크 위로 복사하면 원본을 가리키므로
+        # (shutil.SameFileError 또는 원본 내용 변경) 방식과 관계없이 먼저 삭제
+        os.remove(destination_path)
+
+    attempts = ["reflink", "hardlink"] if strategy == "auto" else [strategy]
+    for method in attempts:
+        try:
+            if method == "hardlink":
+                os.link(source_path, destination_path)
+            elif method == "symlink":
+                os.symlink(os.path.abspath(source_path), destination_path)
+            elif method == "reflink":
+                reflink_file(source_path, destination_path)
+            else:
+                break
+            return method
+        except OSError:
+            continue  # 다른 볼륨(EXDEV), 미지원 파일시스템 등: 다음 방식 시도
+
+    shutil.copy2(source_path, destination_path)  # 파일 복사 (메타데이터 포함)
+    return "copy"
+
+
+def transfer_files(file_pairs, strategy="copy", num_threads=1):
+    """
+    여러 파일을 한 번에 전송합니다. 실제 복사가 필요한 경우 스레드 풀로 I/O를 병렬화합니다.
+    Args:
+        file_pairs (list): (원본 경로, 대상 경로) 튜플 리스트.
+        strategy (str): `transfer_file`의 전송 방식.
+        num_threads (int): 동시에 전송할 스레드 수 (1이면 순차 처리).
+    Returns:
+        Counter: 실제로 사용된 전송 방식별 파일 수.
+    """
+    if num_threads <= 1:
+        return Counter(transfer_file(src, dst, strategy) for src, dst in file_pairs)
+
+    with ThreadPoolExecutor(max_workers=num_threads) as executor:
+        used = executor.map(lambda pair: transfer_file(pair[0], pair[1], strategy), file_pairs)
+        return Counter(used)
+
+
+def copy_patient_files(source_folder, destination_folder, num_files=None, strategy="copy", num_threads=1, index=None):
     """
     환자 파일 그룹에서 특정 개수를 복사합니다. 
     Args:
         source_folder (str): 원본 파일이 저장된 폴더 경로.
         destination_folder (str): 복사된 파일을 저장할 대상 폴더 경로.
         num_files (int, optional): 복사할 파일 수 제한 (기본값은 None으로, 모든 파일 복사).
+        strategy (str): 전송 방식 ("copy", "hardlink", "symlink", "reflink", "auto").
+            같은 볼륨이라면 "hardlink"/"reflink"/"auto"는 데이터 복사 없이 완료됩니다.
+        num_threads (int): 복사 스레드 수 (실제 복사가 필요할 때 I/O 병렬화).
+        index (PatientIndex, optional): 원본 데이터셋의 환자 인덱스 (`patient_index.load_patient_index`).
     Returns:
         list: 복사된 파일 이름 목록.
     """
     os.makedirs(destination_folder, exist_ok=True)  # 대상 폴더가 없으면 생성
 
     # 원본 폴더의 파일을 환자별로 그룹화
-    patient_files = group_files_by_patient(source_folder)
+    patient_files = group_files_by_patient(source_folder, index)
 
     # 환자 그룹을 리스트로 변환하고 랜덤하게 섞음 (환자 단위 샘플링)
     patient_groups = list(patient_files.items())
@@ -43,25 +137,25 @@ def copy_patient_files(source_folder, destination_folder, num_files=None):
     copied_files = []  # 복사된 파일 이름을 저장할 리스트
     total_files_copied = 0  # 복사된 파일 총 수를 추적
 
-    # 환자 그룹별로 파일 복사 수행
+    # 환자 그룹별로 복사할 파일 선택
     for patient_id, files in patient_groups:
         # num_files 제한이 있는 경우, 초과하지 않도록 복사 수행
         if num_files is not None and total_files_copied + len(files) > num_files:
             break  # 남은 파일 수가 num_files를 초과하면 루프 종료
 
-        # 해당 환자의 모든 파일 복사
-        for file_name in files:
-            source_path = os.path.join(source_folder, file_name)  # 원본 파일 경로
-            destination_path = os.path.join(destination_folder, file_name)  # 대상 파일 경로
-
-            shutil.copy2(source_path, destination_path)  # 파일 복사 (메타데이터 포함)
-            copied_files.append(file_name)  # 복사된 파일 이름 추가
+        # 해당 환자의 모든 파일 선택
+        copied_files.extend(files)
 
         # 복사된 파일 수 누적
         total_files_copied += len(files)
 
+    # 선택된 파일을 한 번에 전송
+    file_pairs = [(os.path.join(source_folder, file_name), os.path.join(destination_folder, file_name))
+                  for file_name in copied_files]
+    used_strategies = transfer_files(file_pairs, strategy, num_threads)
+
     # 복사 결과 출력
-    print(f"총 {len(copied_files)}개의 파일이 복사되었습니다.")
+    print(f"총 {len(copied_files)}개의 파일이 복사되었습니다. (전송 방식: {dict(used_strategies)})")
     return copied_files  # 복사된 파일 이름 목록 반환
 
 # 실행 코드
@@ -76,9 +170,14 @@ if __name__ == "__main__":
     source_folder = "../../dataset/medical_datasets/Fundus_BCVA-Est/9"  # 원본 폴더 경로
     destination_folder = "./va_datasets/09"  # 대상 폴더 경로
     num_files = 2000  # 복사할 파일 수 제한 (2000개)
+    strategy = "auto"  # 전송 방식: 같은 볼륨이면 reflink/hardlink로 I/O 없이, 불가능하면 복사
+    num_threads = 8  # 실제 복사가 필요할 때 사용할 스레드 수
+
+    # 원본 데이터셋(클래스 폴더들의 상위 폴더) 환자 인덱스: 변경된 클래스 폴더만 재스캔
+    patient_index = load_patient_index(os.path.dirname(os.path.normpath(source_folder)))
 
     # 복사 함수 실행
-    copied_files = copy_patient_files(source_folder, destination_folder, num_files)
+    copied_files = copy_patient_files(source_folder, destination_folder, num_files, strategy, num_threads, patient_index)
 
     # 복사된 파일 출력
     print("이동된 파일:")
@@ -1,7 +1,19 @@
 import cv2
+import hashlib
+import json
 import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import matplotlib.pyplot as plt
 
+from patient_index import class_name_from_folder, load_patient_index
+
+# 크롭 알고리즘이나 파라미터가 바뀌면 올려서 매니페스트의 기존 결과를 무효화
+CROP_ALGORITHM_VERSION = "black-square-v1"
+MANIFEST_SAVE_INTERVAL = 500  # 중단되어도 진행분이 남도록 N장마다 매니페스트 저장
+
 
 def is_corner_black(image, x, y, size):
     """Checks if all corners of a square region are black."""
@@ -23,8 +35,12 @@ def is_corner_black(image, x, y, size):
     return True
 
 
-def crop_image_to_black_square(image):
-    """Crops the image to the largest square centered on the image where all corners are black."""
+def crop_image_to_black_square_legacy(image):
+    """Crops the image to the largest square centered on the image where all corners are black.
+
+    Reference implementation that probes one square size per iteration. Kept for
+    equivalence checks and benchmarks; use `crop_image_to_black_square` instead.
+    """
     h, w = image.shape[:2]
     center_x, center_y = w // 2, h // 2
     size = 1  # Initial size of the square
@@ -44,13 +60,71 @@ def crop_image_to_black_square(image):
     return image[y1:y2, x1:x2]
 
 
-def process_and_save_all_images(input_folder, output_folder):
-    """Processes all images in the input folder and saves them in the output folder."""
-    # Ensure output directory exists
-    os.makedirs(output_folder, exist_ok=True)
-    
-    # **`processed_files` 리스트 초기화**
-    processed_files = []  # Processed image pairs (original, cropped)
+def find_black_square_half_size(image, threshold=0):
+    """Finds the half size of the smallest centered square whose four corners are black.
+
+    Instead of growing the square one step at a time, all candidate corners lie on the
+    two diagonals through the image center, so the diagonals are gathered once and
+    reduced with NumPy. A pixel counts as black when every channel is <= `threshold`
+    (threshold=0 reproduces `is_corner_black`).
+
+    Returns:
+        int: half size of the square; if no square fits, the value the legacy loop
+        ends with, (min(w, h) + 1) // 2.
+    """
+    h, w = image.shape[:2]
+    center_x, center_y = w // 2, h // 2
+    max_half = (min(w, h) - 1) // 2  # Largest half size whose corners stay inside the image
+
+    k = np.arange(max_half + 1)
+    corners = np.stack([
+        image[center_y - k, center_x - k],  # Top-left
+        image[center_y - k, center_x + k],  # Top-right
+        image[center_y + k, center_x - k],  # Bottom-left
+        image[center_y + k, center_x + k],  # Bottom-right
+    ])
+    if corners.ndim == 3:  # (4, K, C) for color images
+        corners = corners.max(axis=2)
+    is_black = (corners <= threshold).all(axis=0)
+
+    if not is_black.any():
+        return (min(w, h) + 1) // 2
+    return int(np.argmax(is_black))
+
+
+def crop_image_to_black_square(image, threshold=0):
+    """Crops the image to the largest square centered on the image where all corners are black."""
+    h, w = image.shape[:2]
+    center_x, center_y = w // 2, h // 2
+    half_size = find_black_square_half_size(image, threshold)
+
+    # Calculate the cropping region
+    x1 = max(center_x - half_size, 0)
+    x2 = min(center_x + half_size, w)
+    y1 = max(center_y - half_size, 0)
+    y2 = min(center_y + half_size, h)
+
+    return image[y1:y2, x1:x2]
+
+
+def iter_crop_tasks(input_folder, output_folder, index=None):
+    """Yields (input_path, output_path) pairs, mirroring the input tree under the output folder.
+
+    With a `PatientIndex` (see patient_index.py) the file lists come from the index instead of
+    `os.walk`; `input_folder` is then either the index root or one of its class folders.
+    """
+    if index is not None:
+        if os.path.normpath(input_folder) == os.path.normpath(index.root):
+            folders = [(os.path.join(input_folder, name), os.path.join(output_folder, name)) for name in index.class_names()]
+        else:
+            folders = [(input_folder, output_folder)]
+        for class_folder, save_folder in folders:
+            os.makedirs(save_folder, exist_ok=True)
+            for file_name in index.files(class_name_from_folder(class_folder)):
+                input_path = os.path.join(class_folder, file_name)
+                output_path = os.path.join(save_folder, f"{os.path.splitext(file_name)[0]}_crop{os.path.splitext(file_name)[1]}")
+                yield input_path, output_path
+        return
 
     # **Recursively list all files in the input folder**
     for root, dirs, files in os.walk(input_folder):
@@ -61,23 +135,351 @@ def process_and_save_all_images(input_folder, output_folder):
         for file_name in files:
             input_path = os.path.join(root, file_name)
             output_path = os.path.join(save_folder, f"{os.path.splitext(file_name)[0]}_crop{os.path.splitext(file_name)[1]}")
+            yield input_path, output_path
 
-            # Load the image
-            orig_image = cv2.imread(input_path)
-            if orig_image is None:
-                print(f"Skipping {file_name}: Unable to read the file.")
-                continue
 
-            # Crop the image
-            cropped_image = crop_image_to_black_square(orig_image)
+def crop_and_save_image(input_path, output_path):
+    """Loads, crops and saves one image. Returns (orig_image, cropped_image), or None if unreadable."""
+    # Load the image
+    orig_image = cv2.imread(input_path)
+    if orig_image is None:
+        return None
 
-            # Save the cropped image
-            cv2.imwrite(output_path, cropped_image)
-            processed_files.append((orig_image, cropped_image))
-            print(f"Processed and saved: {output_path}")
+    # Crop the image
+    cropped_image = crop_image_to_black_square(orig_image)
+
+    # Save the cropped image
+    cv2.imwrite(output_path, cropped_image)
+    return orig_image, cropped_image
+
+
+def process_and_save_all_images(input_folder, output_folder):
+    """Processes all images in the input folder and saves them in the output folder.
+
+    Keeps every decoded (original, cropped) pair in memory; for large folders use
+    `iter_processed_images` / `run_streaming_crop` instead.
+    """
+    # Ensure output directory exists
+    os.makedirs(output_folder, exist_ok=True)
+    
+    # **`processed_files` 리스트 초기화**
+    processed_files = []  # Processed image pairs (original, cropped)
+
+    for input_path, output_path in iter_crop_tasks(input_folder, output_folder):
+        result = crop_and_save_image(input_path, output_path)
+        if result is None:
+            print(f"Skipping {os.path.basename(input_path)}: Unable to read the file.")
+            continue
+
+        processed_files.append(result)
+        print(f"Processed and saved: {output_path}")
 
     return processed_files
 
+
+def _init_crop_worker():
+    """Keeps OpenCV single-threaded inside each worker so processes don't oversubscribe the cores."""
+    cv2.setNumThreads(1)
+
+
+def _crop_record(input_path, output_path):
+    """Crops one image and returns a small status record; the decoded images are dropped here."""
+    start = time.perf_counter()
+    try:
+        error = None if crop_and_save_image(input_path, output_path) is not None else "Unable to read the file."
+    except Exception as e:  # 한 장의 실패가 전체 실행을 중단시키지 않도록 기록만 남김
+        error = f"{type(e).__name__}: {e}"
+    return {
+        "input_path": input_path,
+        "output_path": output_path,
+        "worker": os.getpid(),
+        "seconds": time.perf_counter() - start,
+        "error": error,
+    }
+
+
+def _crop_chunk(tasks):
+    """Worker entry point: crops one chunk of tasks and returns a status record per image."""
+    return [_crop_record(input_path, output_path) for input_path, output_path in tasks]
+
+
+def _chunked(iterable, size):
+    """Groups an iterable into lists of at most `size` items."""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_processed_images(input_folder, output_folder, num_workers=1, chunksize=32, max_in_flight=None, tasks=None,
+                          index=None):
+    """
+    Crops images lazily and yields one status record per image as soon as it is done.
+
+    Args:
+        tasks (iterable, optional): (input_path, output_path) pairs to process; defaults to
+            every file under `input_folder` (see `iter_crop_tasks`).
+        index (PatientIndex, optional): list files from the patient index instead of walking the tree.
+        num_workers (int): 1 processes in this process (one image in flight at a time);
+            > 1 uses a process pool.
+        chunksize (int): images per task submitted to the pool.
+        max_in_flight (int, optional): upper bound on images submitted but not yet yielded
+            (default: 2 chunks per worker). New chunks are only submitted as old ones finish.
+
+    Yields:
+        dict: input_path, output_path, worker, seconds, error (None on success), in walk order.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    if tasks is None:
+        tasks = iter_crop_tasks(input_folder, output_folder, index)
+
+    if num_workers <= 1:
+        for input_path, output_path in tasks:
+            yield _crop_record(input_path, output_path)
+        return
+
+    if max_in_flight is None:
+        max_in_flight = num_workers * chunksize * 2
+    chunksize = max(1, min(chunksize, max_in_flight))
+    max_chunks = max(1, max_in_flight // chunksize)
+
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=num_workers, initializer=_init_crop_worker) as executor:
+        for chunk in _chunked(tasks, chunksize):
+            if len(pending) >= max_chunks:
+                yield from pending.popleft().result()  # Submission order keeps records in os.walk order
+            pending.append(executor.submit(_crop_chunk, chunk))
+        while pending:
+            yield from pending.popleft().result()
+
+
+class CropRunStats:
+    """Streaming per-worker counters for the end-of-run crop summary."""
+
+    def __init__(self):
+        self.per_worker = {}
+        self.failures = []
+        self.total = 0
+
+    def add(self, record):
+        stats = self.per_worker.setdefault(record["worker"], {"images": 0, "failed": 0, "seconds": 0.0})
+        stats["images"] += 1
+        stats["seconds"] += record["seconds"]
+        self.total += 1
+        if record["error"] is not None:
+            stats["failed"] += 1
+            self.failures.append(record)
+
+    def print_summary(self, wall_time):
+        """Prints per-worker throughput and every failure in one summary block."""
+        print("\n===== Crop summary =====")
+        for worker, stats in sorted(self.per_worker.items()):
+            rate = stats["images"] / stats["seconds"] if stats["seconds"] > 0 else 0.0
+            print(f"Worker {worker}: {stats['images']} images, {stats['failed']} failed, "
+                  f"busy {stats['seconds']:.1f}s, {rate:.1f} images/s")
+        total_rate = self.total / wall_time if wall_time > 0 else 0.0
+        print(f"Total: {self.total} images, {len(self.failures)} failed, {wall_time:.1f}s wall, {total_rate:.1f} images/s")
+        for record in self.failures:
+            print(f"  FAILED {record['input_path']}: {record['error']}")
+
+
+class ComparisonPreview:
+    """Bounded preview ring: keeps only the first and last `num_each` records for display_comparisons."""
+
+    def __init__(self, num_each=5):
+        self.num_each = num_each
+        self.head = []
+        self.tail = deque(maxlen=num_each)
+
+    def add(self, record):
+        if record["error"] is not None:
+            return
+        if len(self.head) < self.num_each:
+            self.head.append(record)
+        else:
+            self.tail.append(record)
+
+    def records(self):
+        return self.head + list(self.tail)
+
+
+def load_crop_manifest(manifest_path):
+    """Loads the crop manifest ({source path: signature}); returns an empty dict if it does not exist."""
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, "r") as f:
+        manifest = json.load(f)
+    return manifest.get("entries", {})
+
+
+def save_crop_manifest(manifest_path, entries):
+    """Writes the manifest atomically (temp file + rename) so an interrupted run never leaves it half-written."""
+    manifest_dir = os.path.dirname(os.path.abspath(manifest_path))
+    os.makedirs(manifest_dir, exist_ok=True)
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"algorithm": CROP_ALGORITHM_VERSION, "entries": entries}, f)
+    os.replace(tmp_path, manifest_path)
+
+
+def file_digest(path, block_size=1 << 20):
+    """SHA-1 of the file contents, read in 1 MB blocks."""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def plan_incremental_crop(input_folder, output_folder, entries, use_hash=False, index=None):
+    """
+    Compares the input tree with the manifest and decides what actually needs to be cropped.
+
+    A file is skipped when its manifest entry has the same size, mtime and crop-algorithm
+    version and the output still exists. With `use_hash=True`, a file whose size/mtime changed
+    but whose content hash did not (e.g. after a copy that reset mtimes) is also skipped.
+    Files listed by a stale patient `index` but deleted from disk are skipped and treated as
+    removed sources (their outputs are returned in `stale_keys`).
+
+    Returns:
+        tuple: (tasks, signatures, stale_keys, num_skipped)
+            tasks: (input_path, output_path) pairs to process
+            signatures: {source key: new manifest signature} for those tasks
+            stale_keys: manifest keys under `input_folder` whose source file is gone
+    """
+    tasks, signatures = [], {}
+    seen = set()
+    num_skipped = 0
+    num_missing = 0
+
+    for input_path, output_path in iter_crop_tasks(input_folder, output_folder, index):
+        key = os.path.normpath(input_path)
+        try:
+            st = os.stat(input_path)
+        except FileNotFoundError:
+            num_missing += 1  # 인덱스가 갱신되기 전에 삭제된 파일
+            continue
+        seen.add(key)
+        signature = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "version": CROP_ALGORITHM_VERSION,
+                     "output_path": output_path}
+
+        entry = entries.get(key)
+        up_to_date = (entry is not None and entry.get("version") == CROP_ALGORITHM_VERSION
+                      and entry.get("output_path") == output_path and os.path.exists(output_path))
+        if up_to_date and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+            num_skipped += 1
+            continue
+        if use_hash:
+            signature["sha1"] = file_digest(input_path)
+            if up_to_date and entry.get("sha1") == signature["sha1"]:
+                entries[key] = signature  # 내용은 같고 stat만 바뀐 경우: 서명만 갱신
+                num_skipped += 1
+                continue
+
+        tasks.append((input_path, output_path))
+        signatures[key] = signature
+
+    if num_missing:
+        print(f"Skipped {num_missing} files listed in the patient index but missing on disk")
+    stale_keys = [key for key in entries if key not in seen and is_under_folder(key, input_folder)]
+    return tasks, signatures, stale_keys, num_skipped
+
+
+def is_under_folder(path, folder):
+    """True if `path` lies inside `folder` (works for "." and mixed relative/absolute paths)."""
+    rel = os.path.relpath(path, folder)
+    return rel != os.curdir and rel != os.pardir and not rel.startswith(os.pardir + os.sep)
+
+
+def remove_stale_outputs(entries, stale_keys):
+    """Deletes cropped outputs whose source image no longer exists and drops them from the manifest."""
+    for key in stale_keys:
+        output_path = entries.pop(key).get("output_path")
+        if output_path and os.path.exists(output_path):
+            os.remove(output_path)
+            print(f"Removed stale output: {output_path}")
+
+
+def run_streaming_crop(input_folder, output_folder, num_workers=1, chunksize=32, max_in_flight=None, num_preview=5,
+                       manifest_path=None, use_hash=False, index=None):
+    """
+    Runs the crop in constant memory: results are consumed as they are yielded, only summary
+    counters and a bounded preview ring are kept.
+
+    With `manifest_path`, the run is incremental: only new or changed source files are cropped,
+    outputs whose sources disappeared are deleted, and the manifest is updated as results arrive.
+
+    Returns:
+        list: (original, cropped) pairs for up to `num_preview` first and last images, reloaded from disk.
+    """
+    stats = CropRunStats()
+    preview = ComparisonPreview(num_preview)
+
+    tasks, signatures, entries = None, {}, None
+    if manifest_path is not None:
+        entries = load_crop_manifest(manifest_path)
+        tasks, signatures, stale_keys, num_skipped = plan_incremental_crop(input_folder, output_folder, entries, use_hash,
+                                                                           index)
+        remove_stale_outputs(entries, stale_keys)
+        print(f"Manifest: {len(tasks)} to process, {num_skipped} up to date, {len(stale_keys)} stale removed")
+
+    start = time.perf_counter()
+    try:
+        records = iter_processed_images(input_folder, output_folder, num_workers, chunksize, max_in_flight, tasks, index)
+        for i, record in enumerate(records, 1):
+            stats.add(record)
+            preview.add(record)
+            if num_workers <= 1 and record["error"] is None:
+                print(f"Processed and saved: {record['output_path']}")
+
+            if entries is not None:
+                key = os.path.normpath(record["input_path"])
+                if record["error"] is None:
+                    entries[key] = signatures[key]
+                else:
+                    entries.pop(key, None)
+                if i % MANIFEST_SAVE_INTERVAL == 0:
+                    save_crop_manifest(manifest_path, entries)
+    finally:
+        if entries is not None:
+            save_crop_manifest(manifest_path, entries)
+    stats.print_summary(time.perf_counter() - start)
+
+    return load_comparison_pairs(preview.records(), num_preview)
+
+
+def process_and_save_all_images_parallel(input_folder, output_folder, num_workers=None, chunksize=32, max_in_flight=None):
+    """
+    Processes all images with a process pool, keeping the same mirrored output tree and `_crop` naming.
+
+    Tasks are submitted in chunks of `chunksize` images; workers return only status records
+    (not the decoded images), so the parent process stays light.
+
+    Returns:
+        list: one record per image (input_path, output_path, worker, seconds, error).
+    """
+    num_workers = num_workers or os.cpu_count()
+
+    stats = CropRunStats()
+    start = time.perf_counter()
+    records = []
+    for record in iter_processed_images(input_folder, output_folder, num_workers, chunksize, max_in_flight):
+        stats.add(record)
+        records.append(record)
+    stats.print_summary(time.perf_counter() - start)
+    return records
+
+
+def load_comparison_pairs(records, num_each=5):
+    """Reloads (original, cropped) pairs from disk for the first and last `num_each` successful records."""
+    succeeded = [record for record in records if record["error"] is None]
+    selected = succeeded if len(succeeded) <= num_each * 2 else succeeded[:num_each] + succeeded[-num_each:]
+    return [(cv2.imread(record["input_path"]), cv2.imread(record["output_path"])) for record in selected]
+
 def display_comparisons(processed_files):
     """Displays comparisons for the first 5 and last 5 processed files with size information."""
     num_files = len(processed_files)
@@ -115,14 +517,18 @@ def display_comparisons(processed_files):
     plt.show()
 
 
-def main(input_folder, output_folder):
-    """Main function to process and compare images."""
-    processed_files = process_and_save_all_images(input_folder, output_folder)
+def main(input_folder, output_folder, num_workers=1, chunksize=32, max_in_flight=None, manifest_path=None, index=None):
+    """Main function to process and compare images. num_workers > 1 enables the process-pool mode."""
+    processed_files = run_streaming_crop(input_folder, output_folder, num_workers, chunksize, max_in_flight,
+                                         manifest_path=manifest_path, index=index)
     display_comparisons(processed_files)
 
 # 실행 코드
 if __name__ == "__main__":
     input_folder = './va_datasets/06'  # **탑레벨 폴더**
     output_folder = './preprocessed_va_datasets/06'  # **변환 데이터 저장 폴더**
+    num_workers = 1  # **1보다 크면 멀티 프로세스로 처리 (예: os.cpu_count())**
+    manifest_path = './preprocessed_va_datasets_manifest.json'  # **증분 처리용 매니페스트 (None이면 전체 재처리)**
+    patient_index = load_patient_index('./va_datasets')  # **폴더 재스캔 대신 환자 인덱스 사용 (None이면 os.walk)**
 
-    main(input_folder, output_folder)
\ No newline at end of file
+    main(input_folder, output_folder, num_workers, manifest_path=manifest_path, index=patient_index)
\ No newline at end of file
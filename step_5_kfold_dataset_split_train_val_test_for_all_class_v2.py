@@ -1,16 +1,26 @@
 import os  # 운영체제와 상호작용을 위한 모듈
 import json  # JSON 파일 읽기 및 저장을 위한 모듈
+import shutil  # 스풀 파일 복사 및 임시 폴더 삭제
+import tempfile  # 스트리밍 병합용 임시 폴더
+import zlib  # 클래스 이름에서 시드를 파생하기 위한 CRC32
+from concurrent.futures import ProcessPoolExecutor  # 클래스 폴더 병렬 처리
 import numpy as np  # 수치 연산을 위한 모듈
 from sklearn.model_selection import KFold  # K-Fold 교차검증을 위한 모듈
+from patient_index import class_name_from_folder, load_patient_index  # 환자 인덱스 (폴더 재스캔 방지)
+from split_format import merge_compact_splits, save_compact_split  # 경로 테이블 + 인덱스 배열 형식의 분할 파일
 
-def read_file_data(folder_path):
+def read_file_data(folder_path, index=None):
     """
     지정된 폴더에서 BMP 파일 목록을 읽어 반환합니다.
     Args:
         folder_path (str): BMP 파일이 있는 폴더 경로
+        index (PatientIndex, optional): 환자 인덱스. 주어지면 폴더를 다시 스캔하지 않고 인덱스에서 조회
     Returns:
         list: BMP 파일 이름 리스트
     """
+    if index is not None:
+        return index.files(class_name_from_folder(folder_path), extension=".bmp")
+
     file_data = []
     for file_name in os.listdir(folder_path):  # 폴더 내 모든 파일을 순회
         if file_name.endswith(".bmp"):  # 파일 확장자가 .bmp인지 확인
@@ -49,7 +59,94 @@ def calculate_test_size_random(patient_ids, patients, test_ratio=0.2, random_sta
     actual_test_ratio = current_test_size / total_data_size  # 실제 테스트 비율 계산
     return selected_test_ids, actual_test_ratio, random_state  # 선택된 환자 ID와 비율 반환
 
-def process_folder_v2(folder_path, test_ratio, k_folds, output_base_path, val_ratio=0.2):
+def _fill_gap_by_swaps(sizes, selected, gap):
+    """
+    테스트 세트의 부족분(gap)을 환자 교환으로 줄입니다 (bounded knapsack 방식).
+    환자 크기는 작은 정수이므로 크기별 대표 환자만 비교하여, 선택된 환자 a를 미선택 환자 b로
+    바꾸거나(0 < b - a <= gap) 미선택 환자를 추가(b <= gap)하는 최선의 이동을 반복합니다.
+    Args:
+        sizes (ndarray): 섞인 순서의 환자별 데이터 개수
+        selected (ndarray): 섞인 순서의 선택 여부 (bool, 제자리에서 수정)
+        gap (int): 목표 테스트 데이터 개수 - 현재 테스트 데이터 개수
+    Returns:
+        int: 남은 부족분
+    """
+    while gap > 0:
+        sel_pos = np.flatnonzero(selected)
+        unsel_pos = np.flatnonzero(~selected)
+        if len(unsel_pos) == 0:
+            break
+        # 크기별 첫 번째 환자만 후보로 사용 (O(고유 크기 수^2))
+        sel_sizes, sel_first = np.unique(sizes[sel_pos], return_index=True)
+        unsel_sizes, unsel_first = np.unique(sizes[unsel_pos], return_index=True)
+        sel_sizes = np.concatenate(([0], sel_sizes))  # 크기 0 = 제거 없이 추가만 하는 경우
+        sel_first = np.concatenate(([-1], sel_first))
+
+        gain = unsel_sizes[None, :] - sel_sizes[:, None]
+        gain[(gain <= 0) | (gain > gap)] = 0
+        best = int(gain.max())
+        if best == 0:
+            break
+        a_idx, b_idx = np.unravel_index(int(gain.argmax()), gain.shape)
+        if sel_first[a_idx] >= 0:
+            selected[sel_pos[sel_first[a_idx]]] = False
+        selected[unsel_pos[unsel_first[b_idx]]] = True
+        gap -= best
+    return gap
+
+
+def select_test_patients_knapsack(patient_ids, patients, test_ratio=0.2, random_state=None):
+    """
+    테스트 데이터셋에 포함될 환자 ID를 선형 시간에 선택합니다.
+    `calculate_test_size_random`과 같이 무작위 순서로 채우되, 목표를 넘는 환자를 만나도 멈추지 않고
+    건너뛰며(first-fit), 남은 부족분은 환자 교환(`_fill_gap_by_swaps`)으로 메워 `test_ratio`에 더 가깝게 맞춥니다.
+    전역 np.random 상태를 바꾸지 않습니다.
+    Args:
+        patient_ids (list): 환자 ID 리스트
+        patients (dict): 환자 ID와 해당 파일 리스트를 매핑한 딕셔너리
+        test_ratio (float): 테스트 데이터 비율 (기본값 0.2)
+        random_state (int, optional): 재현 가능한 결과를 위한 랜덤 시드 값
+    Returns:
+        tuple: (선택된 테스트 환자 ID, 실제 테스트 비율, 사용된 랜덤 시드)
+    """
+    if random_state is None:
+        random_state = np.random.randint(0, 10000)  # 랜덤 시드가 없으면 랜덤 생성
+    num_patients = len(patient_ids)
+    sizes = np.fromiter((len(patients[pid]) for pid in patient_ids), dtype=np.int64, count=num_patients)
+    total_data_size = int(sizes.sum())
+    if total_data_size == 0:
+        return [], 0.0, random_state
+    test_data_target_size = int(total_data_size * test_ratio)  # 목표 테스트 데이터 개수
+
+    order = np.random.RandomState(random_state).permutation(num_patients)  # 환자 순서 무작위 섞기
+    shuffled_sizes = sizes[order]
+    selected = np.zeros(num_patients, dtype=bool)
+
+    # 1) 처음으로 목표를 넘기 직전까지는 누적합으로 한 번에 선택
+    cumulative = np.cumsum(shuffled_sizes)
+    prefix = int(np.searchsorted(cumulative, test_data_target_size, side="right"))
+    selected[:prefix] = True
+    gap = test_data_target_size - (int(cumulative[prefix - 1]) if prefix else 0)
+
+    # 2) 목표를 넘는 환자는 건너뛰고 계속 채움
+    if gap > 0:
+        for i, size in enumerate(shuffled_sizes[prefix:].tolist(), start=prefix):
+            if size <= gap:
+                selected[i] = True
+                gap -= size
+                if gap == 0:
+                    break
+
+    # 3) 남은 부족분은 환자 교환으로 채움
+    gap = _fill_gap_by_swaps(shuffled_sizes, selected, gap)
+
+    selected_test_ids = [patient_ids[i] for i in order[selected].tolist()]
+    actual_test_ratio = (test_data_target_size - gap) / total_data_size  # 실제 테스트 비율 계산
+    return selected_test_ids, actual_test_ratio, random_state
+
+
+def process_folder_v2(folder_path, test_ratio, k_folds, output_base_path, val_ratio=0.2, index=None,
+                      test_selector=calculate_test_size_random, compact=False, seed=None):
     """
     폴더의 데이터를 읽고, train/validation/test 세트로 나눈 후 JSON 파일로 저장합니다.
     Args:
@@ -58,6 +155,12 @@ def process_folder_v2(folder_path, test_ratio, k_folds, output_base_path, val_ra
         k_folds (int): K-Fold 개수
         output_base_path (str): 결과 JSON 파일을 저장할 경로
         val_ratio (float): Validation 데이터 비율 (K_FOLDS=1 일 때만 사용)
+        index (PatientIndex, optional): 데이터셋 폴더의 환자 인덱스 (`patient_index.load_patient_index`)
+        test_selector (callable): 테스트 환자 선택 함수. 기본값은 기존 `calculate_test_size_random`
+            (같은 시드면 기존과 같은 테스트 환자), `select_test_patients_knapsack`을 주면 TEST_RATIO에 더 가깝게 선택
+        compact (bool): True이면 `{label}_dataset.npz`(압축 바이너리 형식)도 함께 저장
+        seed (int, optional): 이 폴더 전용 랜덤 시드. 주어지면 테스트 선택과 KFold 시드를 여기서 파생하여
+            전역 np.random 상태와 무관하게 재현 가능 (None이면 기존처럼 전역 상태 사용)
     """
     label_str = os.path.basename(folder_path.strip("/"))  # 폴더 이름에서 레이블 추출
     try:
@@ -68,7 +171,7 @@ def process_folder_v2(folder_path, test_ratio, k_folds, output_base_path, val_ra
 
     print("----------- Label-----------", label)  # 레이블 출력
 
-    data = read_file_data(folder_path)  # BMP 파일 읽기
+    data = read_file_data(folder_path, index)  # BMP 파일 읽기
     if not data:  # 데이터가 없으면 종료
         print(f"No BMP files found in folder: {folder_path}. Skipping.")
         return
@@ -83,11 +186,18 @@ def process_folder_v2(folder_path, test_ratio, k_folds, output_base_path, val_ra
 
     patient_ids = list(patients.keys())  # 환자 ID 목록 생성
 
+    # 폴더 전용 시드가 있으면 테스트 선택/KFold 시드를 파생, 없으면 전역 난수 사용
+    if seed is not None:
+        test_seed, kfold_seed = np.random.RandomState(seed).randint(0, 10000, size=2).tolist()
+    else:
+        test_seed, kfold_seed = None, None
+
     # 테스트 데이터셋 추출
-    selected_test_ids, actual_test_ratio, test_random_state = calculate_test_size_random(
-        patient_ids, patients, test_ratio
+    selected_test_ids, actual_test_ratio, test_random_state = test_selector(
+        patient_ids, patients, test_ratio, random_state=test_seed
     )
-    remaining_ids = [pid for pid in patient_ids if pid not in selected_test_ids]  # 테스트 제외 환자 ID
+    selected_test_set = set(selected_test_ids)  # 리스트 탐색(O(n^2)) 대신 집합으로 O(n)
+    remaining_ids = [pid for pid in patient_ids if pid not in selected_test_set]  # 테스트 제외 환자 ID
 
     # 테스트 데이터 파일
     test_data_files = [file for pid in selected_test_ids for file in patients[pid]]
@@ -118,7 +228,9 @@ def process_folder_v2(folder_path, test_ratio, k_folds, output_base_path, val_ra
     else:
         # K-Fold 교차검증
         n_splits = min(k_folds, len(remaining_ids))
-        kf = KFold(n_splits=n_splits, shuffle=True, random_state=np.random.randint(0, 10000))
+        if kfold_seed is None:
+            kfold_seed = np.random.randint(0, 10000)
+        kf = KFold(n_splits=n_splits, shuffle=True, random_state=kfold_seed)
 
         for fold_idx, (train_idx, val_idx) in enumerate(kf.split(remaining_ids)):
             train_patients = [remaining_ids[i] for i in train_idx]
@@ -152,13 +264,17 @@ def process_folder_v2(folder_path, test_ratio, k_folds, output_base_path, val_ra
 
     print(f"Saved dataset for label {label} to {output_path}")
 
-def combine_folds_v2(base_path, output_path):
+    if compact:
+        save_compact_split(dataset, os.path.join(output_base_path, f"{label}_dataset.npz"))
+
+def combine_folds_v2(base_path, output_path, compact_path=None):
     """
     여러 폴더에서 생성된 JSON 파일을 읽어와 데이터를 합치고, 하나의 JSON 파일로 저장합니다.
     
     Args:
         base_path (str): JSON 파일이 저장된 폴더 경로.
         output_path (str): 병합된 데이터를 저장할 JSON 파일 경로.
+        compact_path (str, optional): 주어지면 경로 테이블 + 인덱스 배열 형식의 npz도 함께 저장 (`split_format.py`).
     
     이 함수는 다음 작업을 수행합니다:
     1. `base_path` 폴더에 있는 모든 JSON 파일을 순회하며 데이터를 읽습니다.
@@ -207,6 +323,158 @@ def combine_folds_v2(base_path, output_path):
 
     print(f"Combined dataset saved to {output_path}")  # 데이터 저장 완료 메시지 출력
 
+    if compact_path is not None:
+        save_compact_split(combined_dataset, compact_path)  # 압축 바이너리 형식 저장
+        print(f"Compact split saved to {compact_path}")
+
+
+def _append_items(spool, encoded_items, indent):
+    """
+    스풀 파일에 JSON 항목을 indent=4 형식으로 이어 씁니다. 첫 항목 앞에는 줄바꿈, 이후 항목 앞에는 ",\n".
+    spool은 [파일 객체, 항목 수] 리스트입니다.
+    """
+    f = spool[0]
+    for item in encoded_items:
+        f.write(("\n" if spool[1] == 0 else ",\n") + indent + item)
+        spool[1] += 1
+
+
+def _copy_section(out, spool, open_char, close_char, indent):
+    """스풀 파일 내용을 괄호로 감싸 출력 파일에 복사합니다 (비어 있으면 "[]"/"{}" 그대로)."""
+    f, count = spool
+    out.write(open_char)
+    if count:
+        f.flush()
+        f.seek(0)
+        shutil.copyfileobj(f, out)
+        out.write("\n" + indent)
+    out.write(close_char)
+
+
+def combine_folds_streaming(base_path, output_path):
+    """
+    `combine_folds_v2`와 같은 결과(JSON, indent=4)를 만들되, 클래스별 JSON 파일을 하나씩 읽어
+    구역(fold별 train/val, test, labels)별 임시 스풀 파일에 바로 기록한 뒤 순서대로 이어 붙입니다.
+    최대 메모리 사용량은 가장 큰 클래스 파일 하나 크기로 제한됩니다.
+
+    Args:
+        base_path (str): 클래스별 `*_dataset.json` 파일이 저장된 폴더 경로.
+        output_path (str): 병합된 데이터를 저장할 JSON 파일 경로.
+
+    클래스 폴더가 다르면 파일 경로도 다르므로, labels 키의 중복 제거는 하지 않습니다.
+    """
+    output_dir = os.path.dirname(os.path.abspath(output_path))
+    os.makedirs(output_dir, exist_ok=True)
+    spool_dir = tempfile.mkdtemp(prefix=".combine_", dir=output_dir)
+    spools = {}  # 구역 이름 -> [스풀 파일 객체, 항목 수]
+    fold_names = []
+
+    def spool_for(section):
+        if section not in spools:
+            spools[section] = [open(os.path.join(spool_dir, f"{len(spools)}.part"), "w+"), 0]
+        return spools[section]
+
+    try:
+        for file_name in sorted(os.listdir(base_path)):  # 파일 시스템과 무관하게 같은 병합 순서
+            if not file_name.endswith("_dataset.json"):
+                continue
+            with open(os.path.join(base_path, file_name), "r") as f:
+                data = json.load(f)  # 한 번에 클래스 하나만 메모리에 유지
+
+            for fold_name, fold_data in data["folds"].items():
+                if fold_name not in fold_names:
+                    fold_names.append(fold_name)
+                for split in ("train", "val"):
+                    _append_items(spool_for(f"{fold_name}/{split}"), map(json.dumps, fold_data[split]), " " * 16)
+            _append_items(spool_for("test"), map(json.dumps, data["test"]), " " * 8)
+            _append_items(spool_for("labels"),
+                          (f"{json.dumps(path)}: {json.dumps(label)}" for path, label in data["labels"].items()),
+                          " " * 8)
+            del data
+
+        tmp_path = f"{output_path}.tmp"
+        with open(tmp_path, "w") as out:
+            out.write('{\n    "folds": ')
+            if fold_names:
+                out.write("{")
+                for i, fold_name in enumerate(fold_names):
+                    out.write(("\n" if i == 0 else ",\n") + f'        {json.dumps(fold_name)}: {{\n            "train": ')
+                    _copy_section(out, spool_for(f"{fold_name}/train"), "[", "]", " " * 12)
+                    out.write(',\n            "val": ')
+                    _copy_section(out, spool_for(f"{fold_name}/val"), "[", "]", " " * 12)
+                    out.write("\n        }")
+                out.write("\n    }")
+            else:
+                out.write("{}")
+            out.write(',\n    "test": ')
+            _copy_section(out, spool_for("test"), "[", "]", " " * 4)
+            out.write(',\n    "labels": ')
+            _copy_section(out, spool_for("labels"), "{", "}", " " * 4)
+            out.write("\n}")
+        os.replace(tmp_path, output_path)
+    finally:
+        for f, _ in spools.values():
+            f.close()
+        shutil.rmtree(spool_dir, ignore_errors=True)
+
+    print(f"Combined dataset saved to {output_path}")
+
+
+def combine_compact_folds(base_path, output_path, num_workers=None):
+    """
+    클래스별 `*_dataset.npz` 파일을 병렬로 읽어 하나의 npz로 병합합니다 (`split_format.merge_compact_splits`).
+    파일 순서는 JSON 병합 결과(`combine_folds_streaming`)와 같도록 이름순으로 정렬합니다.
+    JSON만 있고 npz가 없는 클래스가 있으면 JSON 병합 결과와 달라지므로 FileNotFoundError를 발생시킵니다
+    (compact=False로 만든 분할이면 `process_folders_parallel(..., compact=True)`로 다시 생성).
+    """
+    file_names = sorted(os.listdir(base_path))
+    npz_names = [name for name in file_names if name.endswith("_dataset.npz")]
+    missing = [name[:-len(".json")] for name in file_names
+               if name.endswith("_dataset.json") and f"{name[:-len('.json')]}.npz" not in npz_names]
+    if missing:
+        raise FileNotFoundError(f"Missing compact split (.npz) for {len(missing)} class file(s) in {base_path}: "
+                                f"{', '.join(missing)}")
+    input_paths = [os.path.join(base_path, name) for name in npz_names]
+    num_paths = merge_compact_splits(input_paths, output_path, num_workers)
+    print(f"Compact split with {num_paths} paths saved to {output_path}")
+
+
+def class_seed(base_seed, class_name):
+    """기본 시드와 클래스 이름에서 클래스별 시드를 파생합니다 (처리 순서/워커 수와 무관)."""
+    sequence = np.random.SeedSequence([base_seed, zlib.crc32(class_name.encode("utf-8"))])
+    return int(sequence.generate_state(1)[0])
+
+
+def process_folders_parallel(base_folder, folder_names, test_ratio, k_folds, output_base_path, val_ratio,
+                             index=None, base_seed=0, num_workers=None, compact=True,
+                             test_selector=calculate_test_size_random):
+    """
+    클래스 폴더들을 프로세스 풀에서 동시에 분할합니다.
+    각 폴더는 `class_seed(base_seed, 폴더 이름)`으로 시드가 고정되므로 워커 수와 완료 순서에 관계없이
+    결과가 동일합니다.
+    Args:
+        base_folder (str): 클래스 폴더들이 들어 있는 데이터셋 폴더
+        folder_names (list): 처리할 클래스 폴더 이름 목록
+        index (PatientIndex, optional): 환자 인덱스 (각 워커로 전달되어 폴더 재스캔 없이 사용)
+        base_seed (int): 클래스별 시드를 파생할 기본 시드
+        num_workers (int, optional): 프로세스 수 (1이면 순차 처리, 기본값: CPU 수)
+        test_selector (callable): 테스트 환자 선택 함수 (`process_folder_v2` 참고)
+    """
+    jobs = [
+        (os.path.join(base_folder, folder_name), test_ratio, k_folds, output_base_path, val_ratio, index,
+         test_selector, compact, class_seed(base_seed, folder_name))
+        for folder_name in folder_names
+    ]
+    if num_workers == 1:
+        for job in jobs:
+            process_folder_v2(*job)
+        return
+
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        futures = [executor.submit(process_folder_v2, *job) for job in jobs]
+        for future in futures:
+            future.result()  # 워커에서 발생한 예외를 여기서 다시 발생시킴
+
 
 def main_v2():
     """
@@ -216,14 +484,23 @@ def main_v2():
     TEST_RATIO = 0.15  # 테스트 비율
     VAL_RATIO = 0.15  # Validation 비율
     K_FOLDS = 2  # K-Fold 개수
+    SEED = 42  # 클래스별 시드를 파생할 기본 시드 (워커 수와 관계없이 같은 분할)
+    NUM_WORKERS = os.cpu_count()  # 클래스 폴더를 동시에 처리할 프로세스 수 (1이면 순차 처리)
+    # 테스트 환자 선택: knapsack 방식은 TEST_RATIO에 더 가깝지만 기존 calculate_test_size_random과 테스트 환자가 달라짐
+    TEST_SELECTOR = select_test_patients_knapsack
     OUTPUT_BASE_PATH = "./data_split_v2"  # 개별 데이터셋 저장 경로
     OUTPUT_COMBINED_PATH = "./combined_dataset/combined_dataset.json"  # 병합된 데이터셋 경로
+    OUTPUT_COMPACT_PATH = "./combined_dataset/combined_dataset.npz"  # 병합된 데이터셋 (압축 바이너리) 경로
+
+    # 클래스 폴더 목록과 파일 목록은 환자 인덱스에서 조회 (변경된 폴더만 재스캔)
+    patient_index = load_patient_index(BASE_DATA_FOLDER)
+    process_folders_parallel(BASE_DATA_FOLDER, patient_index.class_names(), TEST_RATIO, K_FOLDS, OUTPUT_BASE_PATH,
+                             VAL_RATIO, patient_index, base_seed=SEED, num_workers=NUM_WORKERS,
+                             test_selector=TEST_SELECTOR)
 
-    for folder_name in os.listdir(BASE_DATA_FOLDER):
-        folder_path = os.path.join(BASE_DATA_FOLDER, folder_name)
-        if os.path.isdir(folder_path):
-            process_folder_v2(folder_path, TEST_RATIO, K_FOLDS, OUTPUT_BASE_PATH, VAL_RATIO)
-    combine_folds_v2(OUTPUT_BASE_PATH, OUTPUT_COMBINED_PATH)
+    # 클래스 파일을 하나씩 스트리밍 병합 (JSON) + 클래스별 npz 병렬 병합
+    combine_folds_streaming(OUTPUT_BASE_PATH, OUTPUT_COMBINED_PATH)
+    combine_compact_folds(OUTPUT_BASE_PATH, OUTPUT_COMPACT_PATH)
 
 if __name__ == "__main__":
     main_v2()
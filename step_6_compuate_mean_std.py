@@ -1,9 +1,12 @@
 import os
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 from PIL import Image
 from torchvision import transforms
 from tqdm import tqdm
 
+from split_format import load_split_dataset
+
 # 이미지 처리 및 텐서 변환
 transform = transforms.Compose([
     transforms.ToTensor()
@@ -51,9 +54,327 @@ def compute_mean_std(image_folder):
 
     return mean, std
 
+IMAGE_EXTENSIONS = ('png', 'jpg', 'jpeg', 'bmp', 'tiff')
+
+
+class ChannelStats:
+    """
+    채널별 (픽셀 수, 평균, 편차 제곱합 M2) 부분 통계.
+    부분 통계끼리는 Chan et al.의 병렬 분산 공식으로 합치므로 워커별 결과를 안정적으로 병합할 수 있습니다.
+    """
+
+    def __init__(self, count=0, mean=None, m2=None):
+        self.count = count
+        self.mean = np.zeros(3) if mean is None else mean
+        self.m2 = np.zeros(3) if m2 is None else m2
+
+    @classmethod
+    def from_image(cls, image):
+        """
+        uint8 (H, W, 3) 배열의 통계. 255^2 < 2^16이므로 제곱은 uint16으로 계산하고 합은 정수로 구해 정확합니다.
+        값은 ToTensor와 같은 [0, 1] 스케일로 반환합니다.
+        """
+        pixels = image.reshape(-1, 3)
+        count = pixels.shape[0]
+        s1 = pixels.sum(axis=0, dtype=np.uint64)
+        s2 = np.square(pixels, dtype=np.uint16).sum(axis=0, dtype=np.uint64)
+        # M2 = s2 - s1^2 / n (정수 연산으로 계산 후 스케일 조정)
+        m2 = np.array([(count * int(b) - int(a) ** 2) / count for a, b in zip(s1, s2)]) / 255.0 ** 2
+        return cls(count, s1.astype(np.float64) / count / 255.0, m2)
+
+    def merge(self, other):
+        """두 부분 통계를 합칩니다 (Chan et al. 병렬 분산 결합)."""
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            return ChannelStats(other.count, other.mean.copy(), other.m2.copy())
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        mean = self.mean + delta * (other.count / count)
+        m2 = self.m2 + other.m2 + delta ** 2 * (self.count * other.count / count)
+        return ChannelStats(count, mean, m2)
+
+    @property
+    def std(self):
+        return np.sqrt(self.m2 / self.count)  # 모집단 표준편차 (compute_mean_std와 동일)
+
+
+def list_image_files(image_folder):
+    """폴더를 재귀적으로 탐색하여 이미지 파일 경로 목록을 반환합니다."""
+    return [os.path.join(root, file)
+            for root, _, files in os.walk(image_folder)
+            for file in files if file.lower().endswith(IMAGE_EXTENSIONS)]
+
+
+def split_file_list(split_path, split="train", fold_name=None):
+    """
+    분할 파일(combined_dataset.json 또는 .npz)에서 이미지 목록을 가져옵니다.
+    Args:
+        split_path (str): 분할 파일 경로.
+        split (str): "train", "val" 또는 "test".
+        fold_name (str, optional): fold 이름. None이면 모든 fold의 해당 split 합집합 (순서 유지, 중복 제거).
+    Returns:
+        list: 이미지 경로 목록.
+    """
+    dataset = load_split_dataset(split_path)
+    if split == "test":
+        return list(dataset["test"])
+    fold_names = [fold_name] if fold_name is not None else list(dataset["folds"])
+    return list(dict.fromkeys(path for name in fold_names for path in dataset["folds"][name][split]))
+
+
+def _stats_worker(file_paths):
+    """워커: 파일 목록을 uint8 배열로 바로 디코딩하여 부분 통계와 실패 목록을 반환합니다."""
+    stats = ChannelStats()
+    failures = []
+    for file_path in file_paths:
+        try:
+            with Image.open(file_path) as image:
+                array = np.asarray(image.convert('RGB'))  # 텐서 변환 없이 uint8 (H, W, 3)
+        except Exception as e:
+            failures.append((file_path, str(e)))
+            continue
+        stats = stats.merge(ChannelStats.from_image(array))
+    return stats, failures
+
+
+def compute_mean_std_parallel(image_folder=None, file_list=None, num_workers=None, chunksize=64):
+    """
+    여러 프로세스에서 채널별 평균(mean)과 표준 편차(std)를 계산합니다.
+
+    Args:
+        image_folder (str, optional): 이미지가 포함된 최상위 폴더 경로 (file_list가 없을 때 사용).
+        file_list (list, optional): 통계를 계산할 이미지 경로 목록 (예: `split_file_list`로 가져온 train 분할).
+        num_workers (int, optional): 프로세스 수 (기본값: CPU 수).
+        chunksize (int): 워커 한 번에 넘길 이미지 수.
+
+    Returns:
+        tuple: 채널별 평균과 표준 편차 ([0, 1] 스케일, compute_mean_std와 동일).
+    """
+    if file_list is None:
+        file_list = list_image_files(image_folder)
+    chunks = [file_list[i:i + chunksize] for i in range(0, len(file_list), chunksize)]
+
+    total = ChannelStats()
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        for stats, failures in tqdm(executor.map(_stats_worker, chunks), total=len(chunks), desc="Computing stats"):
+            total = total.merge(stats)
+            for file_path, error in failures:
+                print(f"Failed to process {file_path}: {error}")
+
+    return total.mean, total.std
+
+
+class HistogramStats:
+    """
+    채널별 256-bin 히스토그램으로 구한 정확한 통계.
+
+    Attributes:
+        hist (ndarray): (3, 256) 전체 픽셀 히스토그램
+        black_hist (ndarray): (3, 256) 펀더스 원판 바깥의 검은 마스크 픽셀 히스토그램
+            (모든 채널 값이 black_threshold 이하인 픽셀)
+    """
+
+    def __init__(self, hist=None, black_hist=None):
+        self.hist = np.zeros((3, 256), dtype=np.int64) if hist is None else hist.astype(np.int64)
+        self.black_hist = np.zeros((3, 256), dtype=np.int64) if black_hist is None else black_hist.astype(np.int64)
+
+    def add(self, hist, black_hist):
+        self.hist += hist
+        self.black_hist[:, :black_hist.shape[1]] += black_hist
+
+    def counts(self, exclude_black=False):
+        return self.hist - self.black_hist if exclude_black else self.hist
+
+    def num_pixels(self, exclude_black=False):
+        return int(self.counts(exclude_black)[0].sum())
+
+    @property
+    def black_fraction(self):
+        """검은 마스크 픽셀 비율."""
+        total = self.num_pixels()
+        return int(self.black_hist[0].sum()) / total if total else 0.0
+
+    def mean_std(self, exclude_black=False):
+        """채널별 평균과 (모집단) 표준편차 ([0, 1] 스케일)."""
+        counts = self.counts(exclude_black)
+        values = np.arange(256, dtype=np.float64)
+        n = counts.sum(axis=1)
+        mean = (counts * values).sum(axis=1) / n
+        var = (counts * (values[None, :] - mean[:, None]) ** 2).sum(axis=1) / n
+        return mean / 255.0, np.sqrt(var) / 255.0
+
+    def percentiles(self, qs, exclude_black=False):
+        """
+        채널별 백분위수 (0~255 픽셀 값). 누적 빈도가 q% 이상이면서 0보다 큰 첫 번째 값을 반환합니다
+        (np.percentile(method="inverted_cdf")와 같음: q=0은 최솟값, q=100은 최댓값).
+        Returns:
+            ndarray: (len(qs), 3)
+        """
+        counts = self.counts(exclude_black)
+        cumulative = counts.cumsum(axis=1)
+        n = cumulative[:, -1]
+        result = np.empty((len(qs), 3), dtype=np.int64)
+        for i, q in enumerate(qs):
+            for c in range(3):
+                result[i, c] = np.searchsorted(cumulative[c], max(q / 100.0 * n[c], 1), side="left")
+        return np.minimum(result, 255)
+
+
+def image_histograms(image, black_threshold=0):
+    """
+    uint8 (H, W, 3) 이미지의 채널별 히스토그램 (정수 bincount만 사용).
+    Returns:
+        tuple: ((3, 256) 전체 히스토그램, (3, black_threshold + 1) 검은 마스크 픽셀 히스토그램)
+    """
+    black = image.max(axis=2) <= black_threshold
+    hist = np.stack([np.bincount(image[..., c].ravel(), minlength=256) for c in range(3)])
+    black_hist = np.stack([np.bincount(image[..., c][black], minlength=black_threshold + 1) for c in range(3)])
+    return hist.astype(np.uint32), black_hist.astype(np.uint32)
+
+
+def _histogram_worker(args):
+    """워커: 파일별 히스토그램 목록과 실패 목록을 반환합니다."""
+    file_paths, black_threshold = args
+    results, failures = [], []
+    for file_path in file_paths:
+        try:
+            with Image.open(file_path) as image:
+                array = np.asarray(image.convert('RGB'))
+        except Exception as e:
+            failures.append((file_path, str(e)))
+            continue
+        results.append((file_path, *image_histograms(array, black_threshold)))
+    return results, failures
+
+
+class HistogramCache:
+    """
+    파일별 히스토그램 저장소 (npz). 한 번 계산해 두면 어떤 부분집합(예: fold별 train)의 통계도
+    이미지를 다시 읽지 않고 히스토그램 합으로 다시 계산할 수 있습니다.
+    crop 매니페스트와 같이 파일별 (size, mtime_ns)를 함께 저장하여, 다시 crop된 파일은 새로 계산합니다.
+    """
+
+    def __init__(self, black_threshold=0):
+        self.black_threshold = black_threshold
+        self.entries = {}  # 파일 경로 -> ((3, 256) hist, (3, t+1) black_hist, (size, mtime_ns))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as npz:
+            cache = cls(int(npz["black_threshold"]))
+            if "signature" in npz:
+                signatures = [tuple(signature) for signature in npz["signature"].tolist()]
+            else:
+                signatures = [None] * len(npz["paths"])  # 시그니처가 없는 이전 형식: 모두 다시 계산
+            for file_path, hist, black_hist, signature in zip(npz["paths"].tolist(), npz["hist"], npz["black_hist"],
+                                                              signatures):
+                cache.entries[file_path] = (hist, black_hist, signature)
+        return cache
+
+    def save(self, path):
+        paths = list(self.entries)
+        hists = np.stack([self.entries[p][0] for p in paths]) if paths else np.zeros((0, 3, 256), np.uint32)
+        black_hists = (np.stack([self.entries[p][1] for p in paths]) if paths
+                       else np.zeros((0, 3, self.black_threshold + 1), np.uint32))
+        signatures = np.array([self.entries[p][2] or (-1, -1) for p in paths], dtype=np.int64).reshape(-1, 2)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(f, paths=np.array(paths), hist=hists, black_hist=black_hists, signature=signatures,
+                                black_threshold=np.array(self.black_threshold))
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def file_signature(file_path):
+        """(size, mtime_ns). 파일이 없으면 None."""
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    def update(self, file_list, num_workers=None, chunksize=64):
+        """
+        캐시에 없거나 (size, mtime_ns)가 달라진 파일만 프로세스 풀에서 읽어 히스토그램을 갱신합니다.
+        갱신된 파일 수를 반환합니다.
+        """
+        signatures = {}
+        for file_path in file_list:
+            signature = self.file_signature(file_path)
+            entry = self.entries.get(file_path)
+            if entry is None or signature is None or entry[2] != signature:
+                signatures[file_path] = signature
+                self.entries.pop(file_path, None)  # 읽기에 실패해도 오래된 히스토그램을 쓰지 않음
+        missing = list(signatures)
+        chunks = [(missing[i:i + chunksize], self.black_threshold) for i in range(0, len(missing), chunksize)]
+        if not chunks:
+            return 0
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            for results, failures in tqdm(executor.map(_histogram_worker, chunks), total=len(chunks),
+                                          desc="Computing histograms"):
+                for file_path, hist, black_hist in results:
+                    self.entries[file_path] = (hist, black_hist, signatures[file_path])
+                for file_path, error in failures:
+                    print(f"Failed to process {file_path}: {error}")
+        return len(missing)
+
+    def stats(self, file_list=None):
+        """file_list(기본값: 전체)의 히스토그램을 합산한 HistogramStats. 캐시에 없는 파일은 건너뜁니다."""
+        stats = HistogramStats()
+        for file_path in (self.entries if file_list is None else file_list):
+            entry = self.entries.get(file_path)
+            if entry is not None:
+                stats.add(entry[0], entry[1])
+        return stats
+
+
+def compute_mean_std_histogram(image_folder=None, file_list=None, exclude_black=False, cache_path=None,
+                               black_threshold=0, num_workers=None, chunksize=64):
+    """
+    히스토그램 누적 방식으로 채널별 평균(mean)과 표준 편차(std)를 계산합니다.
+    부동소수 배열을 만들지 않고 정수 bincount만 사용하며, 결과는 정확합니다.
+
+    Args:
+        image_folder (str, optional): 이미지가 포함된 최상위 폴더 경로 (file_list가 없을 때 사용).
+        file_list (list, optional): 통계를 계산할 이미지 경로 목록.
+        exclude_black (bool): True이면 펀더스 원판 바깥의 검은 마스크 픽셀을 제외.
+        cache_path (str, optional): 파일별 히스토그램 저장 경로 (.npz). 있으면 읽고, 새로 추가/변경된 파일만 계산 후 저장.
+        black_threshold (int): 모든 채널 값이 이 값 이하이면 검은 마스크 픽셀로 간주.
+
+    Returns:
+        tuple: (채널별 평균, 채널별 표준 편차, HistogramStats) - 백분위수/검은 픽셀 비율은 HistogramStats에서 조회.
+    """
+    if file_list is None:
+        file_list = list_image_files(image_folder)
+
+    cache = None
+    if cache_path is not None and os.path.exists(cache_path):
+        cache = HistogramCache.load(cache_path)
+        if cache.black_threshold != black_threshold:
+            cache = None  # 임계값이 다르면 검은 마스크 히스토그램을 재사용할 수 없음
+    if cache is None:
+        cache = HistogramCache(black_threshold)
+
+    if cache.update(file_list, num_workers, chunksize) and cache_path is not None:
+        cache.save(cache_path)
+
+    stats = cache.stats(file_list)
+    mean, std = stats.mean_std(exclude_black)
+    return mean, std, stats
+
 if __name__ == "__main__":
     folder_path = "./preprocessed_va_datasets"  # 이미지 폴더 경로
-    mean, std = compute_mean_std(folder_path)
+    split_path = None  # 예: "./combined_dataset/combined_dataset.json" → train 분할만 사용
+    histogram_cache_path = "./preprocessed_va_datasets_histograms.npz"  # 파일별 히스토그램 저장 (None이면 병렬 합산 방식)
+    exclude_black = False  # True이면 펀더스 원판 바깥 검은 영역 제외
+
+    file_list = split_file_list(split_path, "train") if split_path else None
+    if histogram_cache_path is not None:
+        mean, std, stats = compute_mean_std_histogram(folder_path, file_list, exclude_black, histogram_cache_path)
+        print("Black-border pixel fraction:", stats.black_fraction)
+        print("Channel-wise 1/50/99 percentiles:", stats.percentiles([1, 50, 99], exclude_black).tolist())
+    else:
+        mean, std = compute_mean_std_parallel(folder_path, file_list)
 
     print("Channel-wise Mean:", mean)
     print("Channel-wise Std:", std)
\ No newline at end of file
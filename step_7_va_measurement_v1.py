@@ -1,17 +1,569 @@
+"""
+VA 분류 모델 K-Fold 학습 엔진 (step_7_va_measurement_v1.ipynb의 fold 루프를 모듈로 분리).
+
+ViT / EfficientNet-B4 / Xception 노트북 셀이 각각 복제하던 fold 루프, 최적 모델 저장/불러오기, 평가 함수를
+하나로 합쳐 어떤 backbone이든 같은 코드로 학습합니다. 노트북 없이 배치 작업으로 실행할 수 있고,
+epoch마다 단계별(data / forward / backward / val) 소요 시간을 JSON Lines 로그로 기록합니다.
+
+실행:
+    python step_7_va_measurement_v1.py --backbone vit --split ./combined_dataset/combined_dataset.json \
+        --output-dir ./best_va_model --log ./logs/train_vit.jsonl
+"""
+import argparse
+import copy
 import json
-import numpy as np 
-from pathlib import Path
-from torch.utils.data import Dataset, DataLoader
-from torch import nn, optim  # 신경망 모델과 최적화 함수
-from PIL import Image
-from torchvision import transforms 
-from torchvision.models import efficientnet_b0  # 사전 학습된 EfficientNet 모델
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
 import torch
 import torch.nn as nn
 import torch.optim as optim
-import matplotlib.pyplot as plt
-from sklearn.metrics import confusion_matrix, f1_score, ConfusionMatrixDisplay
+
+from va_features import dataset_paths, train_fold_with_feature_cache
+from va_metrics import ConfusionMatrixMeter
+from va_models import MODEL_FACTORIES, SCHEDULER_STEP_SIZE, create_backbone_model
+
+device = torch.device("cuda" if torch.cuda.is_available() else "cpu")  # GPU 사용 가능 여부 확인
+
+
+# channels_last 메모리 형식이 효과가 있는 합성곱 backbone (ViT는 패치 임베딩 이후 합성곱이 없음)
+CHANNELS_LAST_BACKBONES = ("efficientnet_b4", "xception")
+PRECISIONS = ("fp32", "bf16")
+
+
+def autocast_context(precision="fp32"):
+    """precision="bf16"이면 bfloat16 autocast (CPU/GPU 공통), "fp32"이면 아무것도 하지 않는 context."""
+    if precision == "bf16":
+        return torch.autocast(device_type=device.type, dtype=torch.bfloat16)
+    return nullcontext()
+
+
+def to_device(images, channels_last=False):
+    """입력 배치를 device로 옮기고 필요하면 channels_last 형식으로 변환합니다."""
+    images = images.to(device)
+    return images.contiguous(memory_format=torch.channels_last) if channels_last else images
+
+
+def prepare_model(model, channels_last=False):
+    """모델을 device로 옮기고 필요하면 가중치를 channels_last 형식으로 변환합니다."""
+    model = model.to(device)
+    return model.to(memory_format=torch.channels_last) if channels_last else model
+
+
+def resolve_channels_last(backbone, channels_last="auto"):
+    """"auto"이면 합성곱 backbone에만 channels_last 적용, "on"/"off"는 그대로."""
+    if channels_last == "auto":
+        return backbone in CHANNELS_LAST_BACKBONES
+    return channels_last in (True, "on")
+
+
+# 평가 함수
+def evaluate_metrics(model, data_loader, criterion, precision="fp32", channels_last=False, keep_predictions=False):
+    """
+    배치마다 혼동 행렬만 누적하는 평가 루프 (샘플별 예측은 keep_predictions=True일 때만 보관).
+    Returns:
+        tuple: (평균 loss, ConfusionMatrixMeter)
+    """
+    model.eval()
+    total_loss = 0.0
+    meter = None
+
+    with torch.no_grad(), autocast_context(precision):
+        for images, labels in data_loader:
+            images, labels = to_device(images, channels_last), labels.to(device).long()
+            outputs = model(images)
+            loss = criterion(outputs.float(), labels)
+            total_loss += loss.item()
+
+            if meter is None:
+                meter = ConfusionMatrixMeter(outputs.shape[1], keep_predictions, device=outputs.device)
+            meter.update(outputs, labels)
+
+    return total_loss / len(data_loader), meter
+
+
+def evaluate_model(model, dataloader, criterion, precision="fp32", channels_last=False):
+    """
+    Returns:
+        tuple: (평균 loss, weighted F1, confusion matrix)
+    """
+    loss, meter = evaluate_metrics(model, dataloader, criterion, precision, channels_last)
+    return loss, meter.f1("weighted"), meter.compact_confusion_matrix()[1]
+
+
+def evaluate_model_with_labels(model, data_loader, criterion, precision="fp32", channels_last=False):
+    """
+    Evaluate the model and compute the confusion matrix, loss, and F1 score.
+    Args:
+        model (nn.Module): Trained model.
+        data_loader (DataLoader): Data loader for evaluation.
+        criterion (nn.Module): Loss function.
+        precision (str): "fp32" or "bf16" (autocast).
+        channels_last (bool): Feed inputs in channels_last memory format.
+    Returns:
+        loss (float): Average loss over the dataset.
+        f1 (float): F1 score.
+        cm (ndarray): Confusion matrix.
+        y_true (list): True labels.
+        y_pred (list): Predicted labels.
+    """
+    loss, meter = evaluate_metrics(model, data_loader, criterion, precision, channels_last, keep_predictions=True)
+    return loss, meter.f1("weighted"), meter.compact_confusion_matrix()[1], meter.y_true, meter.y_pred
+
+
+# 최적 모델 저장 및 불러오기
+def atomic_save(state, path):
+    """임시 파일에 저장한 뒤 os.replace로 교체 (저장 중 중단되어도 기존 파일은 그대로 남음)."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    torch.save(state, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def save_best_model(model, path):
+    atomic_save(model.state_dict(), path)
+    print(f"Best model saved to {path}")
+
+
+def load_best_model(model, path):
+    model.load_state_dict(torch.load(path, map_location=device))
+    print(f"Best model loaded from {path}")
+    return model
+
+
+def save_history(history, path):
+    """
+    학습 기록 저장.
+    Args:
+        history (dict): 학습 기록.
+        path (str): 저장 경로.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(history, f)
+    print(f"History saved to {path}")
+
+
+def snapshot_state(model, trainable_only=False):
+    """
+    모델 가중치의 CPU 복사본 (학습이 계속되어도 바뀌지 않음).
+    Args:
+        trainable_only (bool): True이면 requires_grad 파라미터(backbone이 고정이면 MLP head)와 버퍼만 복사.
+            train 모드에서는 고정된 backbone의 BatchNorm running 통계도 갱신되므로 버퍼는 항상 포함 (크기는 작음)
+    """
+    keys = None
+    if trainable_only:
+        keys = {name for name, param in model.named_parameters() if param.requires_grad}
+        keys |= {name for name, _ in model.named_buffers()}
+    return {name: value.detach().to("cpu", copy=True) for name, value in model.state_dict().items()
+            if keys is None or name in keys}
+
+
+def restore_state(model, state):
+    """snapshot_state 결과를 모델에 다시 적용합니다 (trainable_only 복사본이면 해당 가중치만)."""
+    _, unexpected = model.load_state_dict(state, strict=False)
+    if unexpected:
+        raise RuntimeError(f"State does not match the model (unexpected keys: {unexpected[:3]})")
+    return model
+
+
+class CheckpointWriter:
+    """
+    체크포인트를 백그라운드 스레드에서 저장합니다 (학습 루프는 복사본만 넘기고 바로 진행).
+    저장은 `atomic_save`로 하므로 중단되어도 파일이 깨지지 않으며, 오류는 다음 flush/close에서 발생합니다.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                state, path = item
+                atomic_save(state, path)
+            except Exception as error:
+                self._error = error
+            finally:
+                self._queue.task_done()
+
+    def save(self, state, path):
+        """state는 `snapshot_state` 등으로 만든 복사본이어야 합니다 (학습 중인 텐서를 넘기지 않음)."""
+        self._queue.put((state, path))
+
+    def flush(self):
+        """대기 중인 저장이 끝날 때까지 기다립니다."""
+        self._queue.join()
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def close(self):
+        """대기 중인 저장을 마치고 스레드를 종료합니다 (저장 오류가 있어도 스레드는 종료)."""
+        try:
+            self.flush()
+        finally:
+            self._queue.put(None)
+            self._thread.join()
+
+
+def training_state_path(output_dir, backbone, fold_name):
+    """fold/backbone별 학습 재개용 체크포인트 경로."""
+    return os.path.join(output_dir, "checkpoints", f"{backbone}_{fold_name}.pth")
+
+
+class PhaseTimer:
+    """단계별(data, forward, backward, val 등) 누적 소요 시간."""
+
+    def __init__(self):
+        self.totals = defaultdict(float)
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.totals[name] += time.perf_counter() - start
+
+    def as_dict(self):
+        return {name: round(seconds, 4) for name, seconds in self.totals.items()}
+
+
+class TimingLog:
+    """
+    JSON Lines 형식의 구조화 학습 로그. 한 줄에 레코드 하나({"event": ..., ...})를 기록하고 바로 flush하므로
+    중단된 작업의 로그도 남습니다. path가 None이면 기록하지 않습니다.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._file = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._file = open(path, "a")
+
+    def write(self, event, **fields):
+        if self._file is None:
+            return
+        record = {"time": round(time.time(), 3), "event": event, **fields}
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def train_one_epoch(model, loader, criterion, optimizer, timer, precision="fp32", channels_last=False):
+    """
+    한 epoch 학습. 배치를 기다린 시간(data), forward+loss(forward), backward+step(backward)을 timer에 누적합니다.
+    precision="bf16"이면 forward를 bfloat16 autocast로 실행합니다 (bf16은 지수 범위가 fp32와 같아 GradScaler 불필요).
+    Returns:
+        tuple: (평균 train loss, train accuracy(%), 샘플 수)
+    """
+    model.train()
+    train_loss, correct, total, num_batches = 0.0, 0, 0, 0
+    iterator = iter(loader)
+    while True:
+        with timer.phase("data"):
+            batch = next(iterator, None)
+            if batch is not None:
+                images, labels = to_device(batch[0], channels_last), batch[1].to(device).long()
+        if batch is None:
+            break
+
+        with timer.phase("forward"):
+            optimizer.zero_grad()
+            with autocast_context(precision):
+                outputs = model(images)
+            loss = criterion(outputs.float(), labels)
+        with timer.phase("backward"):
+            loss.backward()
+            optimizer.step()
+
+        train_loss += loss.item()
+        correct += (outputs.argmax(dim=1) == labels).sum().item()
+        total += labels.size(0)
+        num_batches += 1
+    return train_loss / max(num_batches, 1), 100 * correct / max(total, 1), total
+
+
+def train_fold(model, train_loader, val_loader, num_epochs, lr, step_size=None, checkpoint_path=None, writer=None,
+               resume=False, log=None, backbone=None, fold_name=None, precision="fp32", channels_last=False):
+    """
+    한 fold 학습: epoch마다 train → val 평가, val accuracy가 가장 높은 epoch의 가중치를 메모리에 보관.
+    checkpoint_path가 주어지면 epoch마다 학습 상태(가중치, optimizer, scheduler, 난수 상태, history, best 가중치)를
+    writer로 백그라운드 저장하고, resume=True이면 저장된 epoch 다음부터 이어서 학습합니다.
+    Returns:
+        tuple: (history, best val accuracy, best 가중치 (`snapshot_state(trainable_only=True)`)).
+            학습한 epoch이 없으면 best 가중치는 현재 가중치
+    """
+    log = log or TimingLog()
+    criterion = nn.CrossEntropyLoss()
+    optimizer = optim.Adam([p for p in model.parameters() if p.requires_grad], lr=lr)
+    scheduler = optim.lr_scheduler.StepLR(optimizer, step_size=step_size, gamma=0.1) if step_size else None
+
+    history = {"train_loss": [], "val_loss": [], "train_accuracy": [], "val_accuracy": []}
+    best_val_accuracy = -1.0  # 첫 epoch은 정확도가 0%여도 저장
+    best_state = None
+    start_epoch = 0
+    generator = getattr(train_loader, "generator", None)  # shuffle 순서 (make_loader의 torch.Generator)
+    if resume and checkpoint_path and os.path.exists(checkpoint_path):
+        checkpoint = torch.load(checkpoint_path, map_location="cpu", weights_only=False)
+        restore_state(model, checkpoint["model"])
+        optimizer.load_state_dict(checkpoint["optimizer"])
+        if scheduler and checkpoint["scheduler"]:
+            scheduler.load_state_dict(checkpoint["scheduler"])
+        torch.set_rng_state(checkpoint["rng_state"])
+        if generator is not None and checkpoint.get("generator_state") is not None:
+            generator.set_state(checkpoint["generator_state"])  # 이어서 학습해도 epoch 0의 순서를 반복하지 않음
+        history, best_val_accuracy = checkpoint["history"], checkpoint["best_val_accuracy"]
+        best_state, start_epoch = checkpoint["best_state"], checkpoint["epoch"]
+        print(f"Resumed {fold_name} from {checkpoint_path} (epoch {start_epoch}/{num_epochs})")
+        log.write("resume", backbone=backbone, fold=fold_name, epoch=start_epoch)
+
+    for epoch in range(start_epoch, num_epochs):
+        start_time = time.time()
+        timer = PhaseTimer()
+        train_loss, train_accuracy, num_samples = train_one_epoch(model, train_loader, criterion, optimizer, timer,
+                                                                  precision, channels_last)
+
+        with timer.phase("val"):
+            val_loss, meter = evaluate_metrics(model, val_loader, criterion, precision, channels_last)
+        val_accuracy, f1 = float(meter.accuracy()), meter.f1("weighted")
+        history["train_loss"].append(train_loss)
+        history["train_accuracy"].append(train_accuracy)
+        history["val_loss"].append(val_loss)
+        history["val_accuracy"].append(val_accuracy)
+
+        improved = val_accuracy > best_val_accuracy
+        with timer.phase("checkpoint"):
+            state = snapshot_state(model, trainable_only=True)
+            if improved:
+                print(f"New best Val Accuracy: {val_accuracy:.2f}% (Previous: {best_val_accuracy:.2f}%)")
+                best_val_accuracy, best_state = val_accuracy, state
+            if checkpoint_path and writer:
+                writer.save({"epoch": epoch + 1, "model": state, "optimizer": copy.deepcopy(optimizer.state_dict()),
+                             "scheduler": scheduler.state_dict() if scheduler else None,
+                             "rng_state": torch.get_rng_state(),
+                             "generator_state": generator.get_state() if generator is not None else None,
+                             "history": copy.deepcopy(history),
+                             "best_val_accuracy": best_val_accuracy, "best_state": best_state}, checkpoint_path)
+
+        epoch_time = time.time() - start_time
+        print(f"Epoch [{epoch+1}/{num_epochs}], Time: {epoch_time:.2f}s, Train Accuracy: {train_accuracy:.2f}%, "
+              f"Val Accuracy: {val_accuracy:.2f}%, F1 Score: {f1:.4f}")
+        log.write("epoch", backbone=backbone, fold=fold_name, epoch=epoch + 1, seconds=round(epoch_time, 4),
+                  phases=timer.as_dict(), samples_per_second=round(num_samples / epoch_time, 2),
+                  train_loss=train_loss, train_accuracy=train_accuracy, val_loss=val_loss,
+                  val_accuracy=val_accuracy, f1=f1, f1_macro=meter.f1("macro"),
+                  ordinal_mae=meter.ordinal_mae(), per_class_recall=meter.summary()["per_class_recall"],
+                  lr=optimizer.param_groups[0]["lr"], improved=improved)
+
+        if scheduler:
+            scheduler.step()
+    if best_state is None:  # num_epochs=0 또는 best 가중치가 없는 체크포인트에서 재개
+        best_state = snapshot_state(model, trainable_only=True)
+    return history, best_val_accuracy, best_state
+
+
+def run_kfold(backbone, fold_loaders, test_loader, num_classes, num_epochs=50, output_dir=".", log_path=None,
+              pretrained=True, seed=None, precision="fp32", channels_last="auto", num_threads=None, resume=False,
+              feature_cache=False, feature_cache_dir=None, feature_variants=4):
+    """
+    K-Fold 학습 루프. fold마다 모델을 새로 만들어 학습하고, best epoch 가중치로 test를 평가하여
+    fold별/전체 최적 모델을 저장한 뒤 전체 최적 모델로 최종 평가합니다.
+    best 가중치는 메모리에 보관하고(backbone이 고정이면 head와 버퍼만), 파일 저장은 백그라운드 스레드에서 수행합니다.
+    Args:
+        backbone (str): "vit", "efficientnet_b4", "xception"
+        fold_loaders: `FoldManager` 또는 {fold 이름: {"train": DataLoader, "val": DataLoader}}
+        test_loader (DataLoader): test 로더
+        output_dir (str): 모델/학습 기록 저장 폴더
+        log_path (str, optional): JSON Lines 타이밍 로그 경로
+        seed (int, optional): fold마다 head 초기화를 재현하기 위한 torch 시드
+        precision (str): "fp32" 또는 "bf16" (CPU bfloat16 autocast)
+        channels_last (str or bool): "auto"이면 EfficientNet/Xception에만 channels_last 적용
+        num_threads (int, optional): intra-op 스레드 수 (torch.set_num_threads)
+        resume (bool): `<output_dir>/checkpoints/<backbone>_<fold>.pth`가 있으면 저장된 epoch부터 이어서 학습
+            (완료된 fold는 학습 없이 best 가중치로 test만 다시 평가). 같은 backbone 가중치(사전 학습 또는 같은 seed) 필요
+        feature_cache (bool): True이면 `va_features.train_fold_with_feature_cache`로 학습 (backbone 특징을 한 번만
+            계산하고 head만 학습). 특징 추출은 fp32이며 resume은 적용되지 않음 (특징 캐시 파일로 대신 재사용)
+        feature_cache_dir (str, optional): 특징 캐시(npz) 폴더. None이면 메모리에서만 사용
+        feature_variants (int): 특징 캐시 모드의 train 증강 변형 수
+    Returns:
+        dict: fold별 결과, 전체 최적 모델 경로, 최종 test 지표 (cm, y_true, y_pred 포함), 마지막 fold의 history
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision: {precision} (choose from {', '.join(PRECISIONS)})")
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    channels_last = resolve_channels_last(backbone, channels_last)
+    _, lr = MODEL_FACTORIES[backbone]
+    step_size = SCHEDULER_STEP_SIZE[backbone]
+    overall_best_model_path = os.path.join(output_dir, f"best_{backbone}_model_overall.pth")
+    criterion = nn.CrossEntropyLoss()
+    log = TimingLog(log_path)
+    writer = CheckpointWriter()
+    log.write("start", backbone=backbone, num_epochs=num_epochs, num_classes=num_classes, device=str(device),
+              torch_threads=torch.get_num_threads(), precision=precision, channels_last=channels_last,
+              feature_cache=feature_cache)
+
+    try:
+        overall_start_time = time.time()
+        best_overall_accuracy = -1.0  # 첫 fold는 정확도가 0%여도 저장
+        best_overall_state = None
+        fold_results = {}
+        history = None
+        for fold_name, loaders in fold_loaders.items():
+            print(f"\nTraining Fold: {fold_name}")
+            fold_start_time = time.time()
+            if seed is not None:
+                torch.manual_seed(seed)
+            model = prepare_model(create_backbone_model(backbone, num_classes, pretrained=pretrained), channels_last)
+            if feature_cache:
+                train_dataset, val_dataset = loaders["train"].dataset, loaders["val"].dataset
+                model, history = train_fold_with_feature_cache(
+                    model, backbone, train_dataset, dataset_paths(train_dataset), val_dataset,
+                    dataset_paths(val_dataset), cache_dir=feature_cache_dir, fold_name=fold_name,
+                    num_variants=feature_variants, num_epochs=num_epochs, batch_size=loaders["train"].batch_size,
+                    lr=lr, step_size=step_size, seed=seed or 0, device=device)
+                best_val_accuracy = max(history["val_accuracy"], default=-1.0)
+                best_state = snapshot_state(model, trainable_only=True)  # best head가 이미 붙어 있음
+                log.write("feature_cache", backbone=backbone, fold=fold_name, epochs=len(history["val_accuracy"]),
+                          seconds=round(time.time() - fold_start_time, 4), best_val_accuracy=best_val_accuracy)
+            else:
+                history, best_val_accuracy, best_state = train_fold(
+                    model, loaders["train"], loaders["val"], num_epochs, lr, step_size,
+                    training_state_path(output_dir, backbone, fold_name), writer, resume, log, backbone, fold_name,
+                    precision, channels_last)
+            save_history(history, os.path.join(output_dir, f"history_{backbone}_{fold_name}.json"))
+
+            print(f"\nRestoring the best weights for Fold {fold_name}...")
+            best_model = restore_state(model, best_state)
+            test_start_time = time.time()
+            test_loss, meter = evaluate_metrics(best_model, test_loader, criterion, precision, channels_last)
+            fold_test_accuracy, f1 = float(meter.accuracy()), meter.f1("weighted")
+            print(f"Fold Test Loss: {test_loss:.4f}, Test Accuracy: {fold_test_accuracy:.2f}%, F1 Score: {f1:.4f}, "
+                  f"Ordinal MAE: {meter.ordinal_mae():.3f}")
+            fold_state = snapshot_state(best_model)  # 전체 state_dict (기존 파일과 같은 형식)
+            writer.save(fold_state, os.path.join(output_dir, f"best_{backbone}_model_{fold_name}.pth"))
+
+            if fold_test_accuracy > best_overall_accuracy:
+                print(f"New overall best Test Accuracy: {fold_test_accuracy:.2f}% "
+                      f"(Previous: {best_overall_accuracy:.2f}%)")
+                best_overall_accuracy, best_overall_state = fold_test_accuracy, fold_state
+                writer.save(fold_state, overall_best_model_path)
+
+            fold_results[fold_name] = {"best_val_accuracy": best_val_accuracy, "test_loss": test_loss,
+                                       "test_accuracy": fold_test_accuracy, "test_f1": f1,
+                                       "test_f1_macro": meter.f1("macro"), "test_ordinal_mae": meter.ordinal_mae()}
+            log.write("fold", backbone=backbone, fold=fold_name, seconds=round(time.time() - fold_start_time, 4),
+                      test_seconds=round(time.time() - test_start_time, 4), **fold_results[fold_name])
+
+        overall_train_time = time.time() - overall_start_time
+
+        # --- Final Evaluation ---
+        print("\nRestoring the overall best model for final testing...")
+        final_best_model = restore_state(model, best_overall_state)
+        final_test_loss, final_meter = evaluate_metrics(final_best_model, test_loader, criterion, precision,
+                                                        channels_last, keep_predictions=True)
+        final_test_accuracy, final_f1 = final_meter.accuracy(), final_meter.f1("weighted")
+        print(f"Final Test Loss: {final_test_loss:.4f}, Total Train Time: {overall_train_time:.2f}s, "
+              f"Test Accuracy: {final_test_accuracy:.2f}%, F1 Score: {final_f1:.4f}")
+        log.write("final", backbone=backbone, train_seconds=round(overall_train_time, 4), test_loss=final_test_loss,
+                  test_accuracy=float(final_test_accuracy), test_f1=final_f1, metrics=final_meter.summary())
+    finally:  # 중단/예외 시에도 대기 중인 체크포인트를 저장하고 로그를 닫음
+        writer.close()
+        log.close()
+
+    return {
+        "folds": fold_results,
+        "overall_best_model_path": overall_best_model_path,
+        "train_seconds": overall_train_time,
+        "test_loss": final_test_loss,
+        "test_accuracy": float(final_test_accuracy),
+        "test_f1": final_f1,
+        "metrics": final_meter.summary(),
+        "confusion_matrix": final_meter.compact_confusion_matrix()[1],
+        "y_true": final_meter.y_true,
+        "y_pred": final_meter.y_pred,
+        "history": history,
+    }
+
+
+def build_fold_loaders(split_path, batch_size=32, loader_config_path=None, tensor_cache_path=None, seed=42,
+                       folds=None):
+    """
+    노트북 1~2번 셀과 같은 구성으로 fold 로더와 test 로더를 만듭니다.
+    Returns:
+        tuple: (FoldManager, test DataLoader, num_classes)
+    """
+    from va_dataset import EvalTensorStore, eval_transform, train_transform
+    from va_loader import FoldManager, load_loader_config
+
+    manager = FoldManager.from_path(split_path, batch_size=batch_size,
+                                    loader_config=load_loader_config(loader_config_path), seed=seed,
+                                    train_transform=train_transform, eval_transform=eval_transform,
+                                    eval_store=None if tensor_cache_path else EvalTensorStore(),
+                                    tensor_cache_path=tensor_cache_path)
+    if folds:
+        manager.split.folds = {name: manager.split.folds[name] for name in folds}
+    num_classes = int(max(len(np.unique(manager.labels)), manager.labels.max() + 1))
+    return manager, manager.test_loader(), num_classes
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the K-fold transfer-learning loop for one backbone.")
+    parser.add_argument("--backbone", default="vit", choices=list(MODEL_FACTORIES))
+    parser.add_argument("--split", default="./combined_dataset/combined_dataset.json",
+                        help="분할 파일 (combined_dataset.json 또는 .npz)")
+    parser.add_argument("--epochs", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--folds", nargs="*", default=None, help="학습할 fold (기본값: 전체)")
+    parser.add_argument("--output-dir", default="./best_va_model")
+    parser.add_argument("--log", default=None, help="JSON Lines 타이밍 로그 경로 (기본값: <output-dir>/train_<backbone>.jsonl)")
+    parser.add_argument("--loader-config", default="./loader_config.json", help="va_loader.py 튜닝 결과")
+    parser.add_argument("--tensor-cache", default=None, help="va_dataset.py로 만든 사전 디코딩 캐시 (.npy)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-pretrained", action="store_true", help="사전 학습 가중치 없이 실행 (동작 확인용)")
+    parser.add_argument("--precision", default="fp32", choices=PRECISIONS, help="bf16: CPU bfloat16 autocast")
+    parser.add_argument("--channels-last", default="auto", choices=("auto", "on", "off"),
+                        help="auto: EfficientNet/Xception에만 적용")
+    parser.add_argument("--threads", type=int, default=None, help="intra-op 스레드 수 (기본값: torch 기본값)")
+    parser.add_argument("--resume", action="store_true", help="<output-dir>/checkpoints의 학습 상태에서 이어서 학습")
+    parser.add_argument("--feature-cache", action="store_true",
+                        help="고정 backbone 특징을 한 번만 계산하고 head만 학습 (va_features.py)")
+    parser.add_argument("--feature-cache-dir", default=None, help="특징 캐시(npz) 폴더 (기본값: 메모리)")
+    parser.add_argument("--feature-variants", type=int, default=4, help="특징 캐시 모드의 train 증강 변형 수")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    fold_loaders, test_loader, num_classes = build_fold_loaders(args.split, args.batch_size, args.loader_config,
+                                                                args.tensor_cache, args.seed, args.folds)
+    print(f"Using device: {device}, backbone: {args.backbone}, classes: {num_classes}, precision: {args.precision}")
+    log_path = args.log or os.path.join(args.output_dir, f"train_{args.backbone}.jsonl")
+    result = run_kfold(args.backbone, fold_loaders, test_loader, num_classes, num_epochs=args.epochs,
+                       output_dir=args.output_dir, log_path=log_path, pretrained=not args.no_pretrained,
+                       seed=args.seed, precision=args.precision, channels_last=args.channels_last,
+                       num_threads=args.threads, resume=args.resume, feature_cache=args.feature_cache,
+                       feature_cache_dir=args.feature_cache_dir, feature_variants=args.feature_variants)
+    print(json.dumps(result["folds"], indent=4))
+    return result
 
 
-global device
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")  # GPU 사용 가능 여부 확인
\ No newline at end of file
+if __name__ == "__main__":
+    main()
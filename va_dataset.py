@@ -0,0 +1,501 @@
+"""
+VA 예측 학습용 데이터셋 및 전처리 모듈 (step_7 노트북에서 import하여 사용).
+
+- FoldDataset: 이미지 경로 + {경로: 레이블}로 만드는 기본 Dataset
+- ApplyCLAHE: CLAHE 대비 향상 전처리
+- train_transform / eval_transform: 학습용(무작위 증강) / 평가용(결정적) 전처리 파이프라인
+- 사전 디코딩 텐서 캐시: 결정적 전처리(크롭, CLAHE, 리사이즈)를 한 번만 수행하여 uint8 배열을
+  하나의 메모리 맵 파일(.npy)에 저장하고, CachedFoldDataset이 복사 없이 읽어 무작위 증강만 적용
+- EvalTensorStore: 평가용 전처리 결과를 메모리에 보관하여 epoch/fold 간 재사용
+
+캐시 생성:
+    python va_dataset.py ./combined_dataset/combined_dataset.json ./cache/va_224.npy
+"""
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+import torch
+from PIL import Image
+from torch.utils.data import Dataset
+from torchvision import transforms
+from torchvision.transforms import functional as F
+
+# Channel-wise Mean: [0.45242608 0.27754296 0.16601739]
+# Channel-wise Std: [0.13136276 0.09985017 0.07743429]
+NORMALIZE_MEAN = [0.45242608, 0.27754296, 0.16601739]
+NORMALIZE_STD = [0.13136276, 0.09985017, 0.07743429]
+IMAGE_SIZE = (224, 224)
+
+
+class FoldDataset(Dataset):
+    def __init__(self, image_paths, labels, transform=None):
+        """
+        Args:
+            image_paths (list): 이미지 경로 리스트
+            labels (dict): {이미지 경로: 레이블 값} 구조의 레이블
+            transform (callable, optional): 이미지 전처리 파이프라인
+        """
+        self.image_paths = image_paths
+        self.labels = [labels[path] for path in image_paths]  # 순서에 맞춘 레이블 리스트
+        self.transform = transform
+
+    def __len__(self):
+        return len(self.image_paths)
+
+    def __getitem__(self, idx):
+        image_path = self.image_paths[idx]
+        label = self.labels[idx]  # 리스트에서 인덱스로 접근
+
+        image = Image.open(image_path).convert("RGB")
+        if self.transform:
+            image = self.transform(image)
+        return image, label
+
+
+def transform_labels(labels):
+    """
+    JSON 레이블을 학습에 사용할 형식으로 변환합니다.
+    0.0, 0.1, 1.0과 같은 값을 10배로 확장하여 정수로 변환합니다.
+    """
+    transformed_labels = {str(k): int(v * 10) for k, v in labels.items()}
+    return transformed_labels
+
+
+class ApplyCLAHE:
+    """
+    CLAHE (Contrast Limited Adaptive Histogram Equalization) 적용 클래스.
+    펀더스 이미지의 대비를 향상시켜 더 뚜렷한 세부 정보를 제공.
+    """
+    def __call__(self, img):
+        img = np.array(img)  # 이미지를 NumPy 배열로 변환
+        lab = cv2.cvtColor(img, cv2.COLOR_RGB2LAB)  # RGB 이미지를 LAB 색 공간으로 변환
+        l, a, b = cv2.split(lab)  # LAB 채널 분리
+        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))  # CLAHE 생성
+        cl = clahe.apply(l)  # L 채널에 CLAHE 적용
+        limg = cv2.merge((cl, a, b))  # 처리된 L 채널과 기존 A, B 채널 병합
+        return F.to_pil_image(cv2.cvtColor(limg, cv2.COLOR_LAB2RGB))  # 다시 RGB로 변환 후 PIL 이미지로 반환
+
+
+class CLAHEPreprocess:
+    """
+    ApplyCLAHE + Resize를 대체하는 전처리 연산자.
+
+    - CLAHE 객체를 프로세스(DataLoader 워커)마다 한 번만 생성하여 재사용
+    - PIL ↔ NumPy 왕복 없이 uint8 (H, W, 3) 배열로 처리하고, L 채널만 제자리에서 변환
+    - resize_first=True이면 먼저 축소한 뒤 CLAHE 적용 (224 px에서 처리하므로 훨씬 빠르지만 결과가 약간 다름)
+    - `batch`로 여러 이미지를 한 번에 처리 (색 공간 변환은 스택 전체에 한 번 수행)
+
+    resize_first=False, output="pil"이면 `Compose([ApplyCLAHE(), Resize(size)])`와 같은 결과를 냅니다.
+    """
+
+    def __init__(self, size=IMAGE_SIZE, clip_limit=2.0, tile_grid_size=(8, 8), resize_first=False, output="numpy"):
+        """
+        Args:
+            size (tuple, optional): 출력 크기 (H, W). None이면 리사이즈하지 않음
+            clip_limit (float), tile_grid_size (tuple): cv2.createCLAHE 옵션 (ApplyCLAHE와 같은 기본값)
+            resize_first (bool): True이면 리사이즈 후 CLAHE 적용
+            output (str): "numpy"이면 uint8 (H, W, 3) 배열, "pil"이면 PIL 이미지 반환
+        """
+        self.size = tuple(size) if size else None
+        self.clip_limit = clip_limit
+        self.tile_grid_size = tuple(tile_grid_size)
+        self.resize_first = resize_first
+        self.output = output
+        self._clahe = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_clahe"] = None  # cv2.CLAHE는 pickle할 수 없으므로 워커에서 다시 생성
+        return state
+
+    @property
+    def clahe(self):
+        if self._clahe is None:
+            self._clahe = cv2.createCLAHE(clipLimit=self.clip_limit, tileGridSize=self.tile_grid_size)
+        return self._clahe
+
+    def _resize(self, image):
+        if self.size is None or image.shape[:2] == self.size:
+            return image
+        if self.resize_first:
+            return cv2.resize(image, (self.size[1], self.size[0]), interpolation=cv2.INTER_AREA)
+        return np.asarray(Image.fromarray(image).resize((self.size[1], self.size[0]), Image.BILINEAR))
+
+    def _apply_clahe_lab(self, lab):
+        """LAB 배열의 L 채널에 CLAHE를 제자리에서 적용합니다."""
+        cv2.insertChannel(self.clahe.apply(cv2.extractChannel(lab, 0)), lab, 0)
+
+    def _finish(self, image):
+        return Image.fromarray(image) if self.output == "pil" else image
+
+    def __call__(self, img):
+        image = np.asarray(img, dtype=np.uint8)
+        if self.resize_first:
+            image = self._resize(image)
+        lab = cv2.cvtColor(image, cv2.COLOR_RGB2LAB)
+        self._apply_clahe_lab(lab)
+        image = cv2.cvtColor(lab, cv2.COLOR_LAB2RGB)
+        if not self.resize_first:
+            image = self._resize(image)
+        return self._finish(image)
+
+    def batch(self, images):
+        """
+        여러 이미지를 한 번에 처리합니다.
+        Args:
+            images (list or ndarray): 이미지 리스트 또는 (N, H, W, 3) uint8 배열.
+                resize_first=False이면 모든 이미지의 크기가 같아야 함
+        Returns:
+            ndarray: (N, H', W', 3) uint8 배열
+        """
+        if self.resize_first:
+            stack = np.stack([self._resize(np.asarray(image, dtype=np.uint8)) for image in images])
+        else:
+            stack = np.ascontiguousarray(np.stack([np.asarray(image, dtype=np.uint8) for image in images]))
+        n, h, w, _ = stack.shape
+        # 색 공간 변환은 픽셀 단위이므로 (N*H, W, 3)으로 펼쳐 한 번에 수행
+        lab = cv2.cvtColor(stack.reshape(n * h, w, 3), cv2.COLOR_RGB2LAB).reshape(n, h, w, 3)
+        for i in range(n):
+            self._apply_clahe_lab(lab[i])
+        stack = cv2.cvtColor(lab.reshape(n * h, w, 3), cv2.COLOR_LAB2RGB).reshape(n, h, w, 3)
+        if not self.resize_first and self.size is not None and (h, w) != self.size:
+            stack = np.stack([self._resize(image) for image in stack])
+        return stack
+
+
+# --- 학습/평가 전처리 파이프라인 ---
+
+# 학습용: 노트북의 기존 transform과 같은 결과 (CLAHE → Resize → 무작위 증강 → 정규화)
+train_transform = transforms.Compose([
+    CLAHEPreprocess(IMAGE_SIZE, output="pil"),  # ApplyCLAHE + Resize와 같은 결과
+    transforms.RandomHorizontalFlip(p=0.5),
+    transforms.RandomVerticalFlip(p=0.5),
+    transforms.ColorJitter(brightness=0.2, contrast=0.2, saturation=0.2, hue=0.1),
+    transforms.ToTensor(),
+    transforms.Normalize(mean=NORMALIZE_MEAN, std=NORMALIZE_STD),
+])
+
+# 평가용(val/test): 무작위 변환 없이 결정적 → 같은 이미지는 항상 같은 텐서 (캐시 가능)
+eval_transform = transforms.Compose([
+    CLAHEPreprocess(IMAGE_SIZE, output="pil"),
+    transforms.ToTensor(),
+    transforms.Normalize(mean=NORMALIZE_MEAN, std=NORMALIZE_STD),
+])
+
+
+# --- 사전 디코딩 텐서 캐시 ---
+
+_clahe_preprocess = {}  # (size, resize_first) → 프로세스별 CLAHEPreprocess
+
+
+def deterministic_preprocess(image_path, size=IMAGE_SIZE, crop=False, clahe=True, resize_first=False):
+    """
+    매 epoch 같은 결과가 나오는 전처리만 적용하여 uint8 (H, W, 3) 배열을 반환합니다.
+    노트북 transform의 앞부분(ApplyCLAHE → Resize)과 같은 순서로 처리합니다.
+    Args:
+        crop (bool): True이면 step_4의 검은 테두리 크롭을 먼저 적용 (크롭되지 않은 원본을 캐시할 때)
+        clahe (bool): CLAHE 적용 여부
+        resize_first (bool): True이면 축소 후 CLAHE 적용 (`CLAHEPreprocess` 참고)
+    """
+    image = np.asarray(Image.open(image_path).convert("RGB"))
+    if crop:
+        from step_4_crop2 import crop_image_to_black_square
+        image = crop_image_to_black_square(image)
+    if not clahe:
+        return np.asarray(transforms.Resize(size)(Image.fromarray(image)), dtype=np.uint8)
+    key = (tuple(size), resize_first)
+    if key not in _clahe_preprocess:
+        _clahe_preprocess[key] = CLAHEPreprocess(size, resize_first=resize_first)
+    return _clahe_preprocess[key](image)
+
+
+def _cache_index_path(cache_path):
+    return f"{cache_path}.index.json"
+
+
+def _fill_cache_rows(args):
+    """워커: 캐시 파일을 열어 맡은 행(row)에 전처리된 이미지를 기록합니다."""
+    cache_path, rows, size, crop, clahe, resize_first = args
+    cv2.setNumThreads(1)
+    images = np.load(cache_path, mmap_mode="r+")
+    for row, image_path in rows:
+        images[row] = deterministic_preprocess(image_path, size, crop, clahe, resize_first)
+    images.flush()
+    return len(rows)
+
+
+def build_tensor_cache(image_paths, cache_path, size=IMAGE_SIZE, crop=False, clahe=True, resize_first=False,
+                       num_workers=None, chunksize=64):
+    """
+    이미지들을 한 번만 디코딩/전처리하여 (N, H, W, 3) uint8 메모리 맵 파일(.npy)과 인덱스를 만듭니다.
+    Args:
+        image_paths (list): 캐시할 이미지 경로 (중복은 한 번만 저장)
+        cache_path (str): 캐시 파일 경로 (.npy). 인덱스는 `<cache_path>.index.json`에 저장
+        size (tuple): 리사이즈 크기 (H, W)
+        crop (bool), clahe (bool), resize_first (bool): `deterministic_preprocess` 옵션
+        num_workers (int, optional): 전처리 프로세스 수 (기본값: CPU 수)
+    Returns:
+        int: 캐시된 이미지 수
+    """
+    image_paths = list(dict.fromkeys(image_paths))
+    os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+    images = np.lib.format.open_memmap(cache_path, mode="w+", dtype=np.uint8,
+                                       shape=(len(image_paths), size[0], size[1], 3))
+    del images  # 헤더와 파일 크기만 만들고 실제 기록은 워커가 수행
+
+    rows = list(enumerate(image_paths))
+    jobs = [(cache_path, rows[i:i + chunksize], size, crop, clahe, resize_first)
+            for i in range(0, len(rows), chunksize)]
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        done = 0
+        for count in executor.map(_fill_cache_rows, jobs):
+            done += count
+            print(f"\rCached {done}/{len(rows)} images", end="")
+    print()
+
+    with open(_cache_index_path(cache_path), "w") as f:
+        json.dump({"paths": image_paths, "size": list(size), "crop": crop, "clahe": clahe,
+                   "resize_first": resize_first}, f)
+    return len(image_paths)
+
+
+def load_cache_index(cache_path, size=None, crop=None, clahe=None, resize_first=None):
+    """
+    캐시 인덱스를 읽어 {이미지 경로: 행 번호} 딕셔너리를 반환합니다.
+    Args:
+        size (tuple), crop (bool), clahe (bool), resize_first (bool): 주어진 옵션은 캐시를 만들 때 기록한 값과
+            비교하여 다르면 ValueError (None이면 확인하지 않음)
+    """
+    with open(_cache_index_path(cache_path), "r") as f:
+        index = json.load(f)
+    recorded = {"size": index["size"], "crop": index["crop"], "clahe": index["clahe"],
+                "resize_first": index.get("resize_first", False)}
+    expected = {"size": None if size is None else list(size), "crop": crop, "clahe": clahe,
+                "resize_first": resize_first}
+    mismatched = [f"{name}={recorded[name]!r} (expected {value!r})" for name, value in expected.items()
+                  if value is not None and recorded[name] != value]
+    if mismatched:
+        raise ValueError(f"Tensor cache {cache_path} was built with different options: {', '.join(mismatched)}. "
+                         f"Rebuild it with `python va_dataset.py`.")
+    return {path: row for row, path in enumerate(index["paths"])}
+
+
+def cache_rows(row_index, image_paths, cache_path):
+    """
+    이미지 경로들의 캐시 행 번호 배열. 캐시에 없는 경로가 있으면 개수와 예시를 담은 ValueError를 발생시킵니다.
+    """
+    missing = [path for path in image_paths if path not in row_index]
+    if missing:
+        raise ValueError(f"{len(missing)} image(s) are not in tensor cache {cache_path} (e.g. {missing[0]}). "
+                       f"Rebuild the cache for this split with `python va_dataset.py`.")
+    return np.array([row_index[path] for path in image_paths], dtype=np.int64)
+
+
+# 캐시된 uint8 텐서에 적용하는 무작위 증강 + 정규화 (노트북 transform에서 CLAHE/Resize를 뺀 나머지)
+cached_augment_transform = transforms.Compose([
+    transforms.RandomHorizontalFlip(p=0.5),
+    transforms.RandomVerticalFlip(p=0.5),
+    transforms.ColorJitter(brightness=0.2, contrast=0.2, saturation=0.2, hue=0.1),
+    transforms.ConvertImageDtype(torch.float32),  # uint8 [0, 255] → float [0, 1] (ToTensor와 같은 스케일)
+    transforms.Normalize(mean=NORMALIZE_MEAN, std=NORMALIZE_STD),
+])
+
+# 캐시된 uint8 텐서의 평가용 변환 (정규화만 적용, eval_transform과 같은 결과)
+cached_eval_transform = transforms.Compose([
+    transforms.ConvertImageDtype(torch.float32),
+    transforms.Normalize(mean=NORMALIZE_MEAN, std=NORMALIZE_STD),
+])
+
+
+class CachedFoldDataset(Dataset):
+    """
+    `build_tensor_cache`로 만든 메모리 맵 캐시에서 읽는 FoldDataset.
+    이미지는 (3, H, W) uint8 텐서로 복사 없이 반환되며, transform에는 무작위 증강만 두면 됩니다
+    (기본값: `cached_augment_transform`).
+    """
+
+    def __init__(self, cache_path, image_paths, labels, transform=cached_augment_transform, row_index=None):
+        """
+        Args:
+            cache_path (str): 캐시 파일 경로 (.npy)
+            image_paths (list): 이미지 경로 리스트 (모두 캐시에 있어야 함)
+            labels (dict): {이미지 경로: 레이블 값} 구조의 레이블
+            transform (callable, optional): (3, H, W) uint8 텐서에 적용할 변환
+            row_index (dict, optional): 미리 읽은 `load_cache_index(cache_path)` (여러 fold에서 공유)
+        """
+        self.cache_path = cache_path
+        row_index = row_index if row_index is not None else load_cache_index(cache_path)
+        self.rows = cache_rows(row_index, image_paths, cache_path)
+        self.labels = [labels[path] for path in image_paths]
+        self.transform = transform
+        self._images = None  # DataLoader 워커마다 따로 열도록 지연 생성 (memmap이 pickle로 복사되지 않게)
+
+    @classmethod
+    def from_indices(cls, cache_path, table_rows, table_labels, indices, transform=cached_augment_transform):
+        """
+        공유 경로 테이블 기준으로 생성합니다 (경로/레이블 리스트를 만들지 않음).
+        Args:
+            table_rows (ndarray): 경로 테이블 순서의 캐시 행 번호
+            table_labels (ndarray): 경로 테이블 순서의 레이블
+            indices (ndarray): 이 분할에 속한 경로 테이블 인덱스
+        """
+        dataset = cls.__new__(cls)
+        dataset.cache_path = cache_path
+        dataset.rows = table_rows[indices]
+        dataset.labels = table_labels[indices]
+        dataset.transform = transform
+        dataset._images = None
+        return dataset
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_images"] = None
+        return state
+
+    @property
+    def images(self):
+        if self._images is None:
+            # copy-on-write 모드: 파일은 읽기 전용으로 공유하면서 torch.from_numpy가 쓰기 가능한 배열을 받도록 함
+            self._images = np.load(self.cache_path, mmap_mode="c")
+        return self._images
+
+    def __getitem__(self, idx):
+        image = torch.from_numpy(self.images[self.rows[idx]]).permute(2, 0, 1)  # (H, W, 3) → (3, H, W), 복사 없음
+        if self.transform:
+            image = self.transform(image)
+        return image, self.labels[idx]
+
+
+def _preprocess_chunk(args):
+    """워커: 이미지들에 결정적 전처리를 적용하여 (경로, uint8 배열) 리스트를 반환합니다."""
+    image_paths, size, resize_first = args
+    cv2.setNumThreads(1)
+    return [(path, deterministic_preprocess(path, size, resize_first=resize_first)) for path in image_paths]
+
+
+class EvalTensorStore:
+    """
+    평가용(val/test) 전처리 결과를 경로별로 한 번만 계산하여 epoch와 fold 사이에 공유하는 메모리 저장소.
+
+    eval 파이프라인은 결정적이므로 CLAHE/Resize 결과를 (3, H, W) uint8 텐서로 보관하고,
+    매 평가에서는 정규화만 수행합니다 (이미지당 약 150 KB 메모리 사용).
+    K-Fold의 val 분할은 서로 겹치지 않으므로 fold가 끝나면 `evict`로 해당 val을 비워
+    메모리를 test + 한 fold의 val 크기로 유지합니다 (`FoldManager.release`가 자동으로 호출).
+    """
+
+    def __init__(self, size=IMAGE_SIZE, resize_first=False, num_workers=None, chunksize=32):
+        """
+        Args:
+            size (tuple): 리사이즈 크기 (H, W)
+            resize_first (bool): `CLAHEPreprocess` 옵션 (학습 transform과 같게 둘 것)
+            num_workers (int, optional): 미리 계산할 때의 프로세스 수 (기본값: CPU 수)
+        """
+        self.size = tuple(size)
+        self.resize_first = resize_first
+        self.num_workers = num_workers
+        self.chunksize = chunksize
+        self.tensors = {}  # 이미지 경로 → (3, H, W) uint8 텐서
+
+    def preload(self, image_paths):
+        """저장소에 없는 이미지만 프로세스 풀에서 전처리하여 추가합니다. 추가된 이미지 수를 반환합니다."""
+        missing = [path for path in dict.fromkeys(image_paths) if path not in self.tensors]
+        if not missing:
+            return 0
+        chunks = [(missing[i:i + self.chunksize], self.size, self.resize_first)
+                  for i in range(0, len(missing), self.chunksize)]
+        with ProcessPoolExecutor(max_workers=self.num_workers) as executor:
+            for results in executor.map(_preprocess_chunk, chunks):
+                for path, image in results:
+                    self.tensors[path] = torch.from_numpy(image).permute(2, 0, 1).contiguous()
+        return len(missing)
+
+    def evict(self, image_paths):
+        """저장소에서 이미지들을 제거합니다. 제거된 이미지 수를 반환합니다."""
+        return sum(self.tensors.pop(path, None) is not None for path in image_paths)
+
+    def dataset(self, image_paths, labels, transform=cached_eval_transform):
+        """필요한 이미지를 미리 계산한 뒤 저장소에서 읽는 평가용 Dataset을 반환합니다."""
+        self.preload(image_paths)
+        return EvalFoldDataset(self, image_paths, labels, transform)
+
+
+class EvalFoldDataset(Dataset):
+    """`EvalTensorStore`의 전처리 결과를 읽는 평가용 FoldDataset (디코딩 없음)."""
+
+    def __init__(self, store, image_paths, labels, transform=cached_eval_transform):
+        self.store = store
+        self.image_paths = image_paths
+        self.labels = [labels[path] for path in image_paths]
+        self.transform = transform
+
+    def __len__(self):
+        return len(self.image_paths)
+
+    def __getitem__(self, idx):
+        image = self.store.tensors[self.image_paths[idx]]
+        if self.transform:
+            image = self.transform(image)
+        return image, self.labels[idx]
+
+
+class IndexedFoldDataset(Dataset):
+    """
+    모든 fold가 공유하는 경로 테이블/레이블 배열을 인덱스 배열로 참조하는 FoldDataset.
+    fold마다 경로/레이블 리스트를 새로 만들지 않습니다.
+    """
+
+    def __init__(self, paths, labels, indices, transform=None, store=None):
+        """
+        Args:
+            paths (list): 공유 경로 테이블
+            labels (ndarray): 경로 테이블 순서의 정수 레이블
+            indices (ndarray): 이 분할에 속한 경로 테이블 인덱스
+            transform (callable, optional): 이미지 전처리 파이프라인
+            store (EvalTensorStore, optional): 주어지면 디코딩 대신 저장소의 전처리 결과를 사용
+                (transform은 uint8 텐서용, 예: `cached_eval_transform`)
+        """
+        self.paths = paths
+        self.labels = labels
+        self.indices = indices
+        self.transform = transform
+        self.store = store
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, idx):
+        row = self.indices[idx]
+        if self.store is not None:
+            image = self.store.tensors[self.paths[row]]
+        else:
+            image = Image.open(self.paths[row]).convert("RGB")
+        if self.transform:
+            image = self.transform(image)
+        return image, int(self.labels[row])
+
+
+if __name__ == "__main__":
+    from split_format import load_split_dataset
+
+    parser = argparse.ArgumentParser(description="Build the pre-decoded memory-mapped image cache for a split file.")
+    parser.add_argument("split_path", help="분할 파일 (combined_dataset.json 또는 .npz)")
+    parser.add_argument("cache_path", help="캐시 파일 경로 (.npy)")
+    parser.add_argument("--size", type=int, default=IMAGE_SIZE[0])
+    parser.add_argument("--crop", action="store_true", help="크롭되지 않은 원본 이미지일 때 검은 테두리 크롭 적용")
+    parser.add_argument("--no-clahe", action="store_true")
+    parser.add_argument("--resize-first", action="store_true", help="축소 후 CLAHE 적용 (더 빠름, 결과가 약간 다름)")
+    parser.add_argument("--num-workers", type=int, default=None)
+    args = parser.parse_args()
+
+    dataset = load_split_dataset(args.split_path)
+    num_cached = build_tensor_cache(list(dataset["labels"]), args.cache_path, (args.size, args.size),
+                                    crop=args.crop, clahe=not args.no_clahe, resize_first=args.resize_first,
+                                    num_workers=args.num_workers)
+    print(f"Cached {num_cached} images to {args.cache_path}")
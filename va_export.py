@@ -0,0 +1,179 @@
+"""
+학습된 VA 모델을 TorchScript / ONNX로 내보내고 ONNX Runtime(CPU)으로 추론하는 모듈.
+
+fold 루프의 체크포인트는 state_dict만 저장하므로 서비스하려면 timm을 import하여 구조를 다시 만들어야 합니다.
+내보낸 파일은 MLP head까지 포함한 전체 모델이라 timm 없이 불러올 수 있습니다.
+- export_torchscript / export_onnx: eval 모드 모델을 추적(trace)하여 저장 (batch 크기는 가변)
+- OnnxRuntimeBackend / TorchScriptBackend: 전처리된 (B, 3, H, W) 배치 → logits
+- check_parity: 같은 입력에서 eager PyTorch 출력과의 최대 차이와 top-1 일치율
+
+실행:
+    python va_export.py ./best_va_model/best_vit_model_overall.pth --output-dir ./exported --check
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import torch
+
+from va_dataset import IMAGE_SIZE, NORMALIZE_MEAN, NORMALIZE_STD
+from va_models import load_trained_model
+
+EXPORT_FORMATS = ("torchscript", "onnx")
+ONNX_OPSET = 17
+
+
+def example_input(batch_size=2, size=IMAGE_SIZE):
+    """추적(trace)용 입력 (BatchNorm1d가 eval 모드이므로 batch 크기는 결과에 영향 없음)."""
+    return torch.randn(batch_size, 3, *size)
+
+
+def export_torchscript(model, path, size=IMAGE_SIZE):
+    """eval 모드 모델을 torch.jit.trace로 저장합니다."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with torch.no_grad():
+        traced = torch.jit.trace(model.eval(), example_input(size=size))
+    torch.jit.save(traced, path)
+    return path
+
+
+def export_onnx(model, path, size=IMAGE_SIZE, opset=ONNX_OPSET):
+    """입력 "images" (batch, 3, H, W) → 출력 "logits" (batch, num_classes) ONNX 그래프로 저장합니다."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with torch.no_grad():
+        torch.onnx.export(model.eval(), (example_input(size=size),), path, input_names=["images"],
+                          output_names=["logits"], dynamic_axes={"images": {0: "batch"}, "logits": {0: "batch"}},
+                          opset_version=opset, dynamo=False)
+    return path
+
+
+def export_metadata(backbone, num_classes, size=IMAGE_SIZE):
+    """내보낸 모델 옆에 저장하는 전처리/출력 정보 (추론 측이 va_dataset 없이도 알 수 있도록)."""
+    return {"backbone": backbone, "num_classes": num_classes, "image_size": list(size),
+            "normalize_mean": NORMALIZE_MEAN, "normalize_std": NORMALIZE_STD,
+            "preprocess": "black-border crop -> CLAHE (LAB L channel) -> resize -> normalize",
+            "input": "images", "output": "logits", "class_to_va": "class / 10"}
+
+
+def metadata_path(model_path):
+    return os.path.splitext(model_path)[0] + ".json"
+
+
+def load_metadata(model_path):
+    """내보낸 모델의 메타데이터를 읽습니다. 파일이 없으면 None."""
+    path = metadata_path(model_path)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+class OnnxRuntimeBackend:
+    """ONNX Runtime CPU 추론 (eager 모델과 같은 입출력: (B, 3, H, W) → logits)."""
+
+    def __init__(self, path, num_threads=None):
+        """
+        Args:
+            path (str): export_onnx로 저장한 .onnx 파일
+            num_threads (int, optional): intra-op 스레드 수 (None이면 ONNX Runtime 기본값)
+        """
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, images):
+        images = images.numpy() if isinstance(images, torch.Tensor) else images
+        logits = self.session.run(None, {self.input_name: np.ascontiguousarray(images, dtype=np.float32)})[0]
+        return torch.from_numpy(logits)
+
+
+class TorchScriptBackend:
+    """TorchScript 추론 (timm 없이 torch만 필요)."""
+
+    def __init__(self, path, device="cpu"):
+        self.device = torch.device(device)
+        self.module = torch.jit.load(path, map_location=self.device).eval()
+
+    @torch.no_grad()
+    def __call__(self, images):
+        return self.module(images.to(self.device)).float().cpu()
+
+
+class EagerBackend:
+    """기존 방식: timm으로 구조를 만든 eager PyTorch 모델."""
+
+    def __init__(self, model):
+        self.model = model.eval()
+
+    @torch.no_grad()
+    def __call__(self, images):
+        return self.model(images).float()
+
+
+def load_backend(path, num_threads=None):
+    """확장자로 백엔드를 고릅니다 (.onnx → ONNX Runtime, .pt → TorchScript)."""
+    if path.endswith(".onnx"):
+        return OnnxRuntimeBackend(path, num_threads)
+    return TorchScriptBackend(path)
+
+
+def check_parity(reference, backend, images):
+    """
+    Args:
+        reference (callable): eager 백엔드
+        backend (callable): 비교할 백엔드
+        images (Tensor): (B, 3, H, W) 입력
+    Returns:
+        dict: {"max_abs_diff", "top1_agreement"(%)}
+    """
+    expected, actual = reference(images), backend(images)
+    return {"max_abs_diff": float((expected - actual).abs().max()),
+            "top1_agreement": float(100 * (expected.argmax(dim=1) == actual.argmax(dim=1)).float().mean())}
+
+
+def export_checkpoint(checkpoint_path, output_dir, formats=EXPORT_FORMATS, backbone=None, num_classes=None):
+    """
+    체크포인트를 불러와 요청한 형식으로 내보냅니다. 파일 이름은 체크포인트 이름을 따릅니다
+    (`best_vit_model_overall.pth` → `best_vit_model_overall.pt`, `.onnx`, `.json`).
+    Returns:
+        tuple: (eager 모델, {형식: 경로})
+    """
+    model, backbone, num_classes = load_trained_model(checkpoint_path, backbone, num_classes)
+    stem = os.path.join(output_dir, os.path.splitext(os.path.basename(checkpoint_path))[0])
+    paths = {}
+    if "torchscript" in formats:
+        paths["torchscript"] = export_torchscript(model, stem + ".pt")
+    if "onnx" in formats:
+        paths["onnx"] = export_onnx(model, stem + ".onnx")
+    for path in paths.values():
+        with open(metadata_path(path), "w") as f:
+            json.dump(export_metadata(backbone, num_classes), f, indent=4)
+    return model, paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a trained checkpoint to TorchScript / ONNX.")
+    parser.add_argument("checkpoint", help="fold 루프가 저장한 state_dict (.pth)")
+    parser.add_argument("--output-dir", default="./exported")
+    parser.add_argument("--formats", nargs="+", default=list(EXPORT_FORMATS), choices=EXPORT_FORMATS)
+    parser.add_argument("--backbone", default=None, help="기본값: 체크포인트에서 추정")
+    parser.add_argument("--num-classes", type=int, default=None)
+    parser.add_argument("--check", action="store_true", help="내보낸 모델과 eager 출력 비교")
+    parser.add_argument("--batch-size", type=int, default=8, help="--check 입력 배치 크기")
+    args = parser.parse_args()
+
+    model, paths = export_checkpoint(args.checkpoint, args.output_dir, args.formats, args.backbone,
+                                     args.num_classes)
+    images = torch.randn(args.batch_size, 3, *IMAGE_SIZE)
+    for export_format, path in paths.items():
+        line = f"{export_format:<12} {path} ({os.path.getsize(path) / 2 ** 20:.1f} MB)"
+        if args.check:
+            parity = check_parity(EagerBackend(model), load_backend(path), images)
+            line += f"  max |dlogit| {parity['max_abs_diff']:.2e}, top-1 agreement {parity['top1_agreement']:.1f}%"
+        print(line)
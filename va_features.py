@@ -0,0 +1,267 @@
+"""
+고정(frozen) backbone 특징 캐시 학습 모드.
+
+step_7의 모든 모델은 backbone을 고정하고 MLP head만 학습하지만, 기존 fold 루프는 매 epoch 모든 이미지에
+대해 backbone forward를 다시 수행합니다. 이 모듈은 backbone의 pooled 특징을 (이미지, 증강 변형)마다
+한 번만 계산하여 메모리/디스크(npz)에 캐시하고, head는 캐시된 특징만으로 학습합니다.
+
+- train: 증강 변형 `num_variants`개를 미리 계산하고 epoch마다 변형을 번갈아 사용
+- val/test: 변형 1개 (eval transform이 결정적이면 fold 간에도 재사용 가능)
+- 캐시 파일은 backbone, 경로 목록, 변형 수, 시드, transform 구성(`transform_key`)이 모두 같을 때만 재사용
+
+주의: 캐시는 backbone을 eval 모드(BatchNorm running stats 고정)로 계산합니다. 기존 루프는 model.train()
+상태에서 backbone BatchNorm이 배치 통계를 사용하므로, 두 방식의 정확도는 `simple_test/compare_feature_cache_training.py`
+로 나란히 비교합니다.
+"""
+import copy
+import os
+import time
+
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.optim as optim
+from torch.utils.data import DataLoader
+
+from va_metrics import ConfusionMatrixMeter
+from va_models import get_head, set_head
+
+FEATURE_CACHE_VERSION = 2  # 2: transform 구성 추가
+
+
+def pooled_features(model, images):
+    """timm 모델의 head 직전 pooled 특징 (B, num_features)."""
+    return model.forward_head(model.forward_features(images), pre_logits=True)
+
+
+@torch.no_grad()
+def extract_features(model, dataset, num_variants=1, batch_size=64, num_workers=0, seed=0, device="cpu"):
+    """
+    고정 backbone으로 dataset 전체의 pooled 특징을 계산합니다.
+    Args:
+        model (nn.Module): timm 전이 학습 모델 (head는 사용하지 않음)
+        dataset (Dataset): (image, label)을 반환하는 Dataset (FoldDataset, CachedFoldDataset)
+        num_variants (int): 증강 변형 수. 변형 v는 torch 시드 `seed + v`로 계산하여 재현 가능
+        seed (int): 기준 시드
+    Returns:
+        tuple: (features (V, N, D) float32 ndarray, labels (N,) int64 ndarray)
+    """
+    model.eval()
+    variants = []
+    labels = None
+    for variant in range(num_variants):
+        torch.manual_seed(seed + variant)  # torchvision 무작위 변환과 DataLoader 워커 시드를 고정
+        loader = DataLoader(dataset, batch_size=batch_size, shuffle=False, num_workers=num_workers)
+        batches, label_batches = [], []
+        for images, labels_batch in loader:
+            batches.append(pooled_features(model, images.to(device)).float().cpu())
+            label_batches.append(torch.as_tensor(labels_batch))
+        variants.append(torch.cat(batches).numpy())
+        if labels is None:
+            labels = torch.cat(label_batches).numpy().astype(np.int64)
+    return np.stack(variants), labels
+
+
+def transform_key(transform):
+    """
+    캐시 식별용 transform 구성 문자열. Compose는 구성 요소별로, torchvision 변환은 repr(파라미터 포함)로,
+    repr이 없는 사용자 정의 변환(CLAHEPreprocess 등)은 클래스 이름과 공개 속성으로 표현합니다.
+    """
+    if transform is None:
+        return "None"
+    if hasattr(transform, "transforms"):
+        return f"{type(transform).__name__}([{', '.join(transform_key(t) for t in transform.transforms)}])"
+    if type(transform).__repr__ is object.__repr__:  # 기본 repr에는 객체 주소가 들어가므로 사용하지 않음
+        fields = {name: value for name, value in vars(transform).items() if not name.startswith("_")}
+        return f"{type(transform).__qualname__}({fields})"
+    return repr(transform)
+
+
+def dataset_paths(dataset):
+    """
+    dataset과 같은 순서의 이미지 경로 (캐시 식별용).
+    FoldDataset/EvalFoldDataset(`image_paths`)과 IndexedFoldDataset(`paths`, `indices`)을 지원합니다.
+    """
+    if hasattr(dataset, "indices") and hasattr(dataset, "paths"):
+        return [dataset.paths[i] for i in np.asarray(dataset.indices).tolist()]
+    if hasattr(dataset, "image_paths"):
+        return list(dataset.image_paths)
+    raise ValueError(f"{type(dataset).__name__} does not expose image paths for the feature cache "
+                     "(use a path-based dataset instead of the tensor cache)")
+
+
+def _cache_meta(backbone, image_paths, num_variants, seed, transform):
+    return {"backbone": backbone, "num_variants": num_variants, "seed": seed, "transform": transform,
+            "paths": list(image_paths)}
+
+
+def load_feature_cache(cache_path, backbone, image_paths, num_variants, seed, transform=None):
+    """
+    저장된 특징 캐시를 읽습니다. backbone, 경로 목록, 변형 수, 시드, transform 구성이 모두 같을 때만 사용합니다.
+    Args:
+        transform (str, optional): `transform_key` 결과
+    Returns:
+        tuple or None: (features, labels) 또는 캐시가 없거나 맞지 않으면 None
+    """
+    if not cache_path or not os.path.exists(cache_path):
+        return None
+    with np.load(cache_path) as npz:
+        if int(npz["version"]) != FEATURE_CACHE_VERSION:
+            return None
+        meta = _cache_meta(str(npz["backbone"]), npz["paths"].tolist(), int(npz["num_variants"]), int(npz["seed"]),
+                           str(npz["transform"]))
+        if meta != _cache_meta(backbone, image_paths, num_variants, seed, str(transform)):
+            return None
+        return npz["features"], npz["labels"]
+
+
+def save_feature_cache(cache_path, backbone, image_paths, num_variants, seed, features, labels, transform=None):
+    """특징 캐시를 npz로 저장합니다 (임시 파일에 쓴 뒤 rename)."""
+    os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+    tmp_path = f"{cache_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, version=np.array(FEATURE_CACHE_VERSION), backbone=np.array(backbone),
+                 paths=np.array(list(image_paths)), num_variants=np.array(num_variants), seed=np.array(seed),
+                 transform=np.array(str(transform)), features=features, labels=labels)
+    os.replace(tmp_path, cache_path)
+
+
+def cached_features(model, backbone, dataset, image_paths, cache_path=None, num_variants=1, seed=0, **kwargs):
+    """
+    특징 캐시가 있으면 읽고, 없으면 계산하여 저장합니다.
+    Args:
+        backbone (str): 캐시 식별용 백본 이름 (예: "efficientnet_b4")
+        image_paths (list): dataset과 같은 순서의 이미지 경로 (캐시 식별용)
+        cache_path (str, optional): npz 경로. None이면 메모리에서만 사용
+        kwargs: `extract_features` 옵션 (batch_size, num_workers, device)
+    Returns:
+        tuple: (features (V, N, D), labels (N,))
+    """
+    transform = transform_key(getattr(dataset, "transform", None))  # 전처리가 바뀌면 이전 특징을 재사용하지 않음
+    cached = load_feature_cache(cache_path, backbone, image_paths, num_variants, seed, transform)
+    if cached is not None:
+        print(f"Loaded cached features: {cache_path}")
+        return cached
+
+    start_time = time.time()
+    features, labels = extract_features(model, dataset, num_variants=num_variants, seed=seed, **kwargs)
+    print(f"Extracted {features.shape[0]}x{features.shape[1]} features in {time.time() - start_time:.2f}s")
+    if cache_path:
+        save_feature_cache(cache_path, backbone, image_paths, num_variants, seed, features, labels, transform)
+    return features, labels
+
+
+@torch.no_grad()
+def evaluate_head(head, features, labels, criterion, batch_size=1024):
+    """
+    캐시된 특징으로 head를 평가합니다.
+    Returns:
+        tuple: (평균 loss, accuracy(%), weighted F1)
+    """
+    head.eval()
+    features = torch.from_numpy(features)
+    labels = torch.from_numpy(labels)
+    total_loss, meter = 0.0, None
+    for start in range(0, len(labels), batch_size):
+        outputs = head(features[start:start + batch_size])
+        total_loss += criterion(outputs, labels[start:start + batch_size]).item() * len(outputs)
+        if meter is None:
+            meter = ConfusionMatrixMeter(outputs.shape[1])
+        meter.update(outputs, labels[start:start + batch_size])
+    return total_loss / len(labels), float(meter.accuracy()), meter.f1("weighted")
+
+
+def train_head_on_features(head, train_features, train_labels, val_features, val_labels, num_epochs=50,
+                           batch_size=32, lr=0.001, step_size=5, gamma=0.1, seed=0):
+    """
+    캐시된 특징으로 MLP head만 학습합니다 (노트북 루프와 같은 Adam + StepLR, best val accuracy 선택).
+    Args:
+        head (nn.Module): 학습할 head (모델에서 `get_head`로 꺼낸 모듈)
+        train_features (ndarray): (V, N, D) 증강 변형별 train 특징. epoch마다 `epoch % V`번 변형 사용
+        val_features (ndarray): (N, D) 또는 (1, N, D) val 특징
+        step_size (int, optional): StepLR 주기 (None이면 scheduler 미사용)
+    Returns:
+        tuple: (best state를 불러온 head, history). 학습한 epoch이 없으면 head는 그대로 반환
+    """
+    generator = torch.Generator().manual_seed(seed)
+    val_features = val_features[0] if val_features.ndim == 3 else val_features
+    train_labels_t = torch.from_numpy(train_labels)
+    variants = [torch.from_numpy(v) for v in train_features]
+
+    criterion = nn.CrossEntropyLoss()
+    optimizer = optim.Adam(head.parameters(), lr=lr)
+    scheduler = optim.lr_scheduler.StepLR(optimizer, step_size=step_size, gamma=gamma) if step_size else None
+
+    history = {"train_loss": [], "val_loss": [], "train_accuracy": [], "val_accuracy": []}
+    best_val_accuracy, best_state = -1.0, None
+    for epoch in range(num_epochs):
+        start_time = time.time()
+        head.train()
+        features = variants[epoch % len(variants)]
+        order = torch.randperm(len(train_labels_t), generator=generator)
+        train_loss, correct, num_samples, num_batches = 0.0, 0, 0, 0
+        for start in range(0, len(order), batch_size):
+            idx = order[start:start + batch_size]
+            if len(idx) < 2:
+                continue  # BatchNorm1d는 배치 크기 1로 학습할 수 없음
+            inputs, targets = features[idx], train_labels_t[idx]
+            optimizer.zero_grad()
+            outputs = head(inputs)
+            loss = criterion(outputs, targets)
+            loss.backward()
+            optimizer.step()
+            train_loss += loss.item()
+            correct += (outputs.argmax(dim=1) == targets).sum().item()
+            num_samples += len(idx)
+            num_batches += 1
+
+        train_accuracy = 100 * correct / max(num_samples, 1)  # 건너뛴 배치의 샘플은 제외
+        val_loss, val_accuracy, f1 = evaluate_head(head, val_features, val_labels, criterion)
+        history["train_loss"].append(train_loss / max(num_batches, 1))
+        history["train_accuracy"].append(train_accuracy)
+        history["val_loss"].append(val_loss)
+        history["val_accuracy"].append(val_accuracy)
+
+        if val_accuracy > best_val_accuracy:
+            best_val_accuracy = val_accuracy
+            best_state = copy.deepcopy(head.state_dict())
+
+        print(f"Epoch [{epoch+1}/{num_epochs}], Time: {time.time() - start_time:.3f}s, "
+              f"Train Accuracy: {train_accuracy:.2f}%, Val Accuracy: {val_accuracy:.2f}%, F1 Score: {f1:.4f}")
+        if scheduler:
+            scheduler.step()
+
+    if best_state is not None:  # num_epochs=0이면 학습하지 않은 head 그대로
+        head.load_state_dict(best_state)
+    return head, history
+
+
+def train_fold_with_feature_cache(model, backbone, train_dataset, train_paths, val_dataset, val_paths,
+                                  cache_dir=None, fold_name="fold", num_variants=4, num_epochs=50, batch_size=32,
+                                  lr=0.001, step_size=5, seed=0, **extract_kwargs):
+    """
+    한 fold를 특징 캐시 모드로 학습하고, 학습된 head를 모델에 다시 붙여 반환합니다.
+    반환된 모델은 기존 fold 루프의 모델과 같은 state_dict 구조이므로 `save_best_model`/평가 함수에 그대로 사용할 수 있습니다.
+    Args:
+        model (nn.Module): `create_*_model`로 만든 모델
+        backbone (str): 백본 이름 (캐시 파일 이름과 식별에 사용)
+        cache_dir (str, optional): 특징 캐시 폴더. None이면 메모리에서만 사용
+        num_variants (int): train 증강 변형 수
+        lr (float), step_size (int, optional): 학습 엔진과 같게 하려면 `MODEL_FACTORIES`/`SCHEDULER_STEP_SIZE`의
+            backbone 값을 전달 (step_size=None이면 scheduler 미사용)
+    Returns:
+        tuple: (모델, history)
+    """
+    def cache_path(split):
+        return os.path.join(cache_dir, f"{backbone}_{fold_name}_{split}.npz") if cache_dir else None
+
+    train_features, train_labels = cached_features(model, backbone, train_dataset, train_paths, cache_path("train"),
+                                                   num_variants=num_variants, seed=seed, **extract_kwargs)
+    val_features, val_labels = cached_features(model, backbone, val_dataset, val_paths, cache_path("val"),
+                                               num_variants=1, seed=seed, **extract_kwargs)
+    head = get_head(model).cpu()
+    head, history = train_head_on_features(head, train_features, train_labels, val_features, val_labels,
+                                           num_epochs=num_epochs, batch_size=batch_size, lr=lr,
+                                           step_size=step_size, seed=seed)
+    device = next(model.parameters()).device
+    return set_head(model, head.to(device)), history
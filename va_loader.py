@@ -0,0 +1,254 @@
+"""
+fold_loaders / test_loader용 DataLoader 생성 및 설정 자동 튜닝.
+
+- make_loader: 워커 수, persistent workers, prefetch factor, pinned memory, 재현 가능한 워커 시드를 적용한 DataLoader
+- autotune_loader: 현재 머신에서 설정 후보별 samples/second를 측정하여 가장 빠른 설정을 선택
+- FoldManager: 공유 경로 테이블 + 인덱스 배열로 fold 로더를 필요할 때 생성하고 다음 fold로 넘어가면 해제
+
+튜닝 결과 저장 (노트북이 `./loader_config.json`을 읽어 사용):
+    python va_loader.py ./combined_dataset/combined_dataset.json --output ./loader_config.json
+"""
+import argparse
+import gc
+import itertools
+import json
+import os
+import random
+import time
+
+import cv2
+import numpy as np
+import torch
+from torch.utils.data import DataLoader
+
+from split_format import CompactSplit, load_compact_split
+from va_dataset import (IMAGE_SIZE, CachedFoldDataset, IndexedFoldDataset, cache_rows, cached_augment_transform,
+                        cached_eval_transform, load_cache_index)
+
+# num_workers=0 (기존 노트북과 같은 메인 프로세스 로딩)
+DEFAULT_LOADER_CONFIG = {"num_workers": 0, "prefetch_factor": 2, "persistent_workers": True, "pin_memory": None}
+
+
+def seed_worker(worker_id):
+    """
+    DataLoader 워커 초기화: torch가 워커마다 정한 시드(base_seed + worker_id)로 numpy/random도 시드하고,
+    워커 안에서 OpenCV가 스레드를 추가로 만들지 않도록 합니다.
+    """
+    worker_seed = torch.initial_seed() % 2 ** 32
+    np.random.seed(worker_seed)
+    random.seed(worker_seed)
+    cv2.setNumThreads(1)
+
+
+def make_loader(dataset, batch_size=32, shuffle=False, num_workers=0, prefetch_factor=2, persistent_workers=True,
+                pin_memory=None, seed=0, drop_last=False):
+    """
+    DataLoader를 생성합니다.
+    Args:
+        dataset (Dataset): FoldDataset 등
+        num_workers (int): 로딩 프로세스 수 (0이면 메인 프로세스에서 로딩)
+        prefetch_factor (int): 워커당 미리 준비할 배치 수 (num_workers > 0일 때만 적용)
+        persistent_workers (bool): epoch 사이에 워커를 유지 (num_workers > 0일 때만 적용)
+        pin_memory (bool, optional): None이면 CUDA 사용 가능할 때만 True
+        seed (int): shuffle 순서와 워커 증강 시드의 기준값. 같은 seed면 같은 순서/증강이 재현됨
+    Returns:
+        DataLoader
+    """
+    if pin_memory is None:
+        pin_memory = torch.cuda.is_available()
+    kwargs = {}
+    if num_workers > 0:
+        kwargs = {"prefetch_factor": prefetch_factor, "persistent_workers": persistent_workers,
+                  "worker_init_fn": seed_worker}
+    return DataLoader(dataset, batch_size=batch_size, shuffle=shuffle, num_workers=num_workers,
+                      pin_memory=pin_memory, drop_last=drop_last,
+                      generator=torch.Generator().manual_seed(seed), **kwargs)
+
+
+def load_loader_config(path):
+    """저장된 튜닝 결과를 읽습니다. 파일이 없으면 기본 설정을 반환합니다."""
+    config = dict(DEFAULT_LOADER_CONFIG)
+    if path and os.path.exists(path):
+        with open(path, "r") as f:
+            config.update(json.load(f)["best"])
+    return config
+
+
+def measure_throughput(dataset, batch_size=32, num_batches=20, warmup_batches=2, **loader_kwargs):
+    """
+    DataLoader로 num_batches개 배치를 읽는 속도를 측정합니다 (워커 시작과 warmup 배치는 제외).
+    Returns:
+        tuple: (samples/second, 첫 배치까지 걸린 시간(s))
+    """
+    loader = make_loader(dataset, batch_size=batch_size, shuffle=True, **loader_kwargs)
+    start = time.perf_counter()
+    iterator = iter(loader)
+    next(iterator)
+    first_batch_time = time.perf_counter() - start
+    for _ in range(warmup_batches - 1):
+        next(iterator, None)
+
+    samples = 0
+    timed_start = time.perf_counter()
+    for images, _ in itertools.islice(iterator, num_batches):
+        samples += len(images)
+    elapsed = time.perf_counter() - timed_start
+    del iterator, loader  # persistent 워커 종료
+    return (samples / elapsed if samples else 0.0), first_batch_time
+
+
+def autotune_loader(dataset, batch_size=32, worker_candidates=None, prefetch_candidates=(2, 4), num_batches=20):
+    """
+    워커 수와 prefetch factor 후보를 측정하여 가장 빠른 설정을 고릅니다.
+    Args:
+        worker_candidates (list, optional): 기본값은 0, 1, 2, 4, ... CPU 수까지
+        num_batches (int): 후보마다 측정할 배치 수 (warmup 제외)
+    Returns:
+        tuple: (best 설정 딕셔너리, 후보별 결과 리스트)
+    """
+    if worker_candidates is None:
+        cpu_count = os.cpu_count() or 1
+        worker_candidates = sorted({0, cpu_count} | {2 ** i for i in range(8) if 2 ** i <= cpu_count})
+
+    results = []
+    for num_workers in worker_candidates:
+        for prefetch_factor in (prefetch_candidates if num_workers > 0 else (2,)):
+            config = {"num_workers": num_workers, "prefetch_factor": prefetch_factor, "persistent_workers": True,
+                      "pin_memory": None}
+            throughput, startup = measure_throughput(dataset, batch_size, num_batches, **config)
+            results.append({**config, "samples_per_second": throughput, "startup_seconds": startup})
+            print(f"num_workers={num_workers:2d}, prefetch_factor={prefetch_factor}: "
+                  f"{throughput:8.1f} samples/s (first batch {startup:.2f}s)")
+
+    best = max(results, key=lambda r: r["samples_per_second"])
+    best_config = {key: best[key] for key in DEFAULT_LOADER_CONFIG}
+    return best_config, results
+
+
+class FoldManager:
+    """
+    K-Fold 로더를 필요할 때 fold 단위로 만드는 관리자.
+
+    모든 fold가 하나의 경로 테이블과 레이블 배열(`CompactSplit`)을 공유하고 각 분할은 인덱스 배열로만
+    참조합니다. 다음 fold로 넘어가면 이전 fold의 Dataset/DataLoader(와 persistent 워커)를 해제합니다.
+    `items()`는 기존 `fold_loaders` 딕셔너리처럼 (fold 이름, {"train", "val"}) 쌍을 순서대로 반환합니다.
+    """
+
+    def __init__(self, split, batch_size=32, loader_config=None, seed=0, train_transform=None, eval_transform=None,
+                 eval_store=None, tensor_cache_path=None):
+        """
+        Args:
+            split (CompactSplit): 분할 데이터셋 (`CompactSplit.from_dataset(data)` 또는 npz 로드 결과)
+            loader_config (dict, optional): `make_loader` 설정 (`load_loader_config` 결과)
+            seed (int): `make_loader` 시드
+            train_transform (callable): train 분할 전처리
+            eval_transform (callable): eval_store가 없을 때 val/test 분할 전처리
+            eval_store (EvalTensorStore, optional): val/test 전처리 결과 저장소
+            tensor_cache_path (str, optional): 사전 디코딩 캐시(.npy). 주어지면 train/val 모두 캐시에서 읽음
+                (크롭 없이 CLAHE → IMAGE_SIZE로 만든 캐시여야 하며, 옵션이 다르거나 빠진 경로가 있으면 ValueError)
+        """
+        self.split = split
+        self.paths = split.paths
+        # transform_labels와 같은 변환: 0.0 ~ 1.0 → 0 ~ 10 (10배 후 정수로 버림)
+        self.labels = (np.asarray(split.labels, dtype=np.float64) * 10).astype(np.int64)
+        self.batch_size = batch_size
+        self.loader_config = loader_config or dict(DEFAULT_LOADER_CONFIG)
+        self.seed = seed
+        self.train_transform = train_transform
+        self.eval_transform = eval_transform
+        self.eval_store = eval_store
+        self.tensor_cache_path = tensor_cache_path
+        self.cache_rows = None
+        if tensor_cache_path:
+            # 캐시되지 않은 경로와 같은 전처리(크롭 없음, CLAHE → IMAGE_SIZE)로 만든 캐시인지 확인
+            row_index = load_cache_index(tensor_cache_path, size=IMAGE_SIZE, crop=False, clahe=True)
+            self.cache_rows = cache_rows(row_index, self.paths, tensor_cache_path)
+        self.current_fold = None
+        self._current = None
+
+    @classmethod
+    def from_path(cls, split_path, **kwargs):
+        """JSON 또는 npz 분할 파일에서 생성합니다."""
+        if str(split_path).endswith(".npz"):
+            return cls(load_compact_split(split_path), **kwargs)
+        with open(split_path, "r") as f:
+            return cls(CompactSplit.from_dataset(json.load(f)), **kwargs)
+
+    @property
+    def fold_names(self):
+        return list(self.split.folds)
+
+    def __len__(self):
+        return len(self.split.folds)
+
+    def _dataset(self, indices, train):
+        if self.tensor_cache_path:
+            transform = cached_augment_transform if train else cached_eval_transform
+            return CachedFoldDataset.from_indices(self.tensor_cache_path, self.cache_rows, self.labels, indices,
+                                                  transform)
+        if train:
+            return IndexedFoldDataset(self.paths, self.labels, indices, self.train_transform)
+        if self.eval_store is not None:
+            self.eval_store.preload(self.paths[i] for i in indices.tolist())
+            return IndexedFoldDataset(self.paths, self.labels, indices, cached_eval_transform, self.eval_store)
+        return IndexedFoldDataset(self.paths, self.labels, indices, self.eval_transform)
+
+    def loaders(self, fold_name):
+        """fold의 train/val 로더를 만듭니다. 다른 fold의 로더가 있으면 먼저 해제합니다."""
+        if self.current_fold == fold_name:
+            return self._current
+        self.release()
+        fold = self.split.folds[fold_name]
+        self._current = {
+            "train": make_loader(self._dataset(fold["train"], train=True), self.batch_size, shuffle=True,
+                                 seed=self.seed, **self.loader_config),
+            "val": make_loader(self._dataset(fold["val"], train=False), self.batch_size, shuffle=False,
+                               seed=self.seed, **self.loader_config),
+        }
+        self.current_fold = fold_name
+        return self._current
+
+    def release(self):
+        """현재 fold의 로더를 해제합니다 (persistent 워커 종료, eval_store에서 해당 fold의 val 제거)."""
+        if self.current_fold is not None and self.eval_store is not None and not self.tensor_cache_path:
+            self.eval_store.evict(self.paths[i] for i in self.split.folds[self.current_fold]["val"].tolist())
+        self._current = None
+        self.current_fold = None
+        gc.collect()
+
+    def test_loader(self):
+        return make_loader(self._dataset(self.split.test, train=False), self.batch_size, shuffle=False,
+                           seed=self.seed, **self.loader_config)
+
+    def items(self):
+        """(fold 이름, {"train": DataLoader, "val": DataLoader})를 fold 순서대로 생성합니다."""
+        for fold_name in self.fold_names:
+            yield fold_name, self.loaders(fold_name)
+        self.release()
+
+    def __getitem__(self, fold_name):
+        return self.loaders(fold_name)
+
+
+if __name__ == "__main__":
+    from split_format import load_split_dataset
+    from va_dataset import FoldDataset, train_transform, transform_labels
+
+    parser = argparse.ArgumentParser(description="Measure DataLoader settings on this machine and save the fastest.")
+    parser.add_argument("split_path", help="분할 파일 (combined_dataset.json 또는 .npz)")
+    parser.add_argument("--fold", default=None, help="측정에 사용할 fold의 train 분할 (기본값: 첫 번째 fold)")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--num-batches", type=int, default=20)
+    parser.add_argument("--workers", type=int, nargs="*", default=None, help="측정할 워커 수 후보")
+    parser.add_argument("--output", default="./loader_config.json")
+    args = parser.parse_args()
+
+    data = load_split_dataset(args.split_path)
+    labels = transform_labels(data["labels"])
+    fold_name = args.fold or next(iter(data["folds"]))
+    dataset = FoldDataset(data["folds"][fold_name]["train"], labels, transform=train_transform)
+
+    best_config, results = autotune_loader(dataset, args.batch_size, args.workers, num_batches=args.num_batches)
+    with open(args.output, "w") as f:
+        json.dump({"best": best_config, "batch_size": args.batch_size, "results": results}, f, indent=4)
+    print(f"Best: {best_config} -> {args.output}")
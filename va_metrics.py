@@ -0,0 +1,132 @@
+"""
+평가 지표 스트리밍 누적기.
+
+배치마다 예측을 Python 리스트에 모은 뒤 sklearn으로 계산하는 대신, `torch.bincount`로 혼동 행렬을
+배치 단위로 누적하고 모든 지표를 혼동 행렬에서 O(클래스 수²)로 계산합니다.
+- accuracy, weighted/macro F1 (sklearn `f1_score`와 같은 값), 클래스별 recall
+- ordinal MAE: 실제/예측 클래스 차이의 평균 (클래스 1단계 = VA 0.1)
+샘플별 예측은 keep_predictions=True일 때만 보관합니다.
+"""
+import numpy as np
+import torch
+
+
+class ConfusionMatrixMeter:
+    """
+    배치 단위로 혼동 행렬을 누적하는 지표 계산기.
+
+    matrix[i, j]: 실제 클래스 i를 j로 예측한 샘플 수.
+    """
+
+    def __init__(self, num_classes, keep_predictions=False, device="cpu"):
+        """
+        Args:
+            num_classes (int): 클래스 수 (레이블은 0 ~ num_classes-1)
+            keep_predictions (bool): True이면 샘플별 (실제, 예측)을 보관 (`y_true`, `y_pred`)
+            device: 누적 텐서를 둘 장치 (모델 출력과 같은 장치면 배치마다 CPU로 옮기지 않음)
+        """
+        self.num_classes = num_classes
+        self.keep_predictions = keep_predictions
+        self.matrix = torch.zeros(num_classes * num_classes, dtype=torch.int64, device=device)
+        self._y_true, self._y_pred = [], []
+
+    def reset(self):
+        self.matrix.zero_()
+        self._y_true, self._y_pred = [], []
+
+    def update(self, outputs, targets):
+        """
+        Args:
+            outputs (Tensor): (B, C) logit 또는 (B,) 예측 클래스
+            targets (Tensor): (B,) 실제 클래스
+        """
+        preds = outputs.argmax(dim=1) if outputs.ndim == 2 else outputs
+        targets = targets.to(self.matrix.device).long()
+        preds = preds.to(self.matrix.device).long()
+        self.matrix += torch.bincount(targets * self.num_classes + preds, minlength=self.num_classes ** 2)
+        if self.keep_predictions:
+            self._y_true.append(targets.cpu())
+            self._y_pred.append(preds.cpu())
+
+    @property
+    def confusion_matrix(self):
+        """(C, C) int64 ndarray."""
+        return self.matrix.view(self.num_classes, self.num_classes).cpu().numpy()
+
+    @property
+    def y_true(self):
+        return torch.cat(self._y_true).tolist() if self._y_true else []
+
+    @property
+    def y_pred(self):
+        return torch.cat(self._y_pred).tolist() if self._y_pred else []
+
+    @property
+    def count(self):
+        return int(self.matrix.sum())
+
+    def present_classes(self):
+        """실제 또는 예측에 한 번이라도 나온 클래스 (sklearn이 사용하는 레이블 집합)."""
+        cm = self.confusion_matrix
+        return np.flatnonzero(cm.sum(axis=0) + cm.sum(axis=1))
+
+    def compact_confusion_matrix(self):
+        """
+        나온 클래스만 남긴 혼동 행렬 (sklearn `confusion_matrix(y_true, y_pred)`와 같음).
+        Returns:
+            tuple: (클래스 리스트, 혼동 행렬)
+        """
+        classes = self.present_classes()
+        return classes.tolist(), self.confusion_matrix[np.ix_(classes, classes)]
+
+    def accuracy(self):
+        """정확도 (%)."""
+        cm = self.confusion_matrix
+        return 100 * np.trace(cm) / max(cm.sum(), 1)
+
+    def per_class_recall(self):
+        """클래스별 recall (support가 0인 클래스는 nan)."""
+        cm = self.confusion_matrix
+        support = cm.sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(support > 0, np.diag(cm) / support, np.nan)
+
+    def f1_per_class(self):
+        cm = self.confusion_matrix
+        tp = np.diag(cm).astype(np.float64)
+        denom = cm.sum(axis=0) + cm.sum(axis=1)  # 2TP + FP + FN
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(denom > 0, 2 * tp / denom, 0.0)
+
+    def f1(self, average="weighted"):
+        """
+        F1 score. sklearn과 같이 나온 클래스에 대해서만 평균하고, 정의되지 않는 값은 0으로 둡니다.
+        Args:
+            average (str): "weighted" (support 가중 평균) 또는 "macro"
+        """
+        classes = self.present_classes()
+        if len(classes) == 0:
+            return 0.0
+        f1 = self.f1_per_class()[classes]
+        if average == "macro":
+            return float(f1.mean())
+        support = self.confusion_matrix.sum(axis=1)[classes]
+        return float((f1 * support).sum() / max(support.sum(), 1))
+
+    def ordinal_mae(self):
+        """평균 절대 클래스 오차 (VA 단계 수, 1단계 = VA 0.1)."""
+        cm = self.confusion_matrix
+        steps = np.abs(np.arange(self.num_classes)[:, None] - np.arange(self.num_classes)[None, :])
+        return float((cm * steps).sum() / max(cm.sum(), 1))
+
+    def summary(self):
+        """로그/JSON 저장용 지표 딕셔너리."""
+        recall = self.per_class_recall()
+        return {
+            "accuracy": float(self.accuracy()),
+            "f1_weighted": self.f1("weighted"),
+            "f1_macro": self.f1("macro"),
+            "ordinal_mae": self.ordinal_mae(),
+            "per_class_recall": [None if np.isnan(r) else round(float(r), 4) for r in recall],
+            "count": self.count,
+        }
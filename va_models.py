@@ -0,0 +1,166 @@
+"""
+step_7 노트북의 전이 학습 모델 생성 함수 (ViT, EfficientNet-B4, Xception).
+
+모든 모델은 사전 학습된 backbone을 고정(freeze)하고 새로 붙인 MLP 분류기(head)만 학습합니다.
+"""
+import torch
+import torch.nn as nn
+from timm import create_model
+
+
+def create_vit_model(num_classes, version="vit_base_patch16_224", pretrained=True):
+    """
+    Create Vision Transformer (ViT) model with an enhanced classifier for transfer learning.
+    Args:
+        num_classes (int): Output class count.
+        version (str): ViT version, e.g., "vit_base_patch16_224".
+        pretrained (bool): Load pretrained backbone weights.
+    Returns:
+        model (nn.Module): Vision Transformer model.
+    """
+    model = create_model(version, pretrained=pretrained)
+    for param in model.parameters():
+        param.requires_grad = False  # Freeze all pre-trained layers
+
+    in_features = model.head.in_features
+    model.head = nn.Sequential(
+        nn.Linear(in_features, in_features // 2),
+        nn.ReLU(),
+        nn.Dropout(0.3),
+        nn.Linear(in_features // 2, in_features // 4),
+        nn.ReLU(),
+        nn.BatchNorm1d(in_features // 4),
+        nn.Linear(in_features // 4, num_classes)
+    )
+    return model
+
+
+def create_efficientnet_model(num_classes, version="efficientnet_b4", pretrained=True):
+    """
+    Create EfficientNet model with an enhanced classifier for transfer learning.
+    Args:
+        num_classes (int): Output class count.
+        version (str): EfficientNet version, e.g., "efficientnet_b4".
+        pretrained (bool): Load pretrained backbone weights.
+    Returns:
+        model (nn.Module): EfficientNet model.
+    """
+    model = create_model(version, pretrained=pretrained)  # Load pretrained EfficientNet
+    for param in model.parameters():
+        param.requires_grad = False  # Freeze all layers except the classifier
+
+    # Replace the classifier layer with an enhanced architecture
+    in_features = model.classifier.in_features
+    model.classifier = nn.Sequential(
+        nn.Linear(in_features, in_features // 2),
+        nn.ReLU(),
+        nn.Dropout(0.3),
+        nn.Linear(in_features // 2, in_features // 4),
+        nn.ReLU(),
+        nn.BatchNorm1d(in_features // 4),
+        nn.Linear(in_features // 4, num_classes)
+    )
+    return model
+
+
+def create_xception_model(num_classes, pretrained=True):
+    """
+    Create Xception model with an enhanced classifier for transfer learning.
+    Args:
+        num_classes (int): Number of output classes.
+        pretrained (bool): Load pretrained backbone weights.
+    Returns:
+        model (nn.Module): Xception model with enhanced classifier.
+    """
+    model = create_model('xception', pretrained=pretrained)
+
+    for param in model.parameters():
+        param.requires_grad = False  # Freeze all layers
+
+    in_features = model.fc.in_features
+
+    model.fc = nn.Sequential(
+        nn.Linear(in_features, in_features // 2),
+        nn.ReLU(),
+        nn.Dropout(0.3),
+        nn.Linear(in_features // 2, in_features // 4),
+        nn.ReLU(),
+        nn.BatchNorm1d(in_features // 4),
+        nn.Dropout(0.3),
+        nn.Linear(in_features // 4, num_classes)
+    )
+
+    for param in model.fc.parameters():
+        param.requires_grad = True  # Train only the classifier
+
+    return model
+
+
+# 백본 이름 → (생성 함수, 노트북에서 사용하던 학습률)
+MODEL_FACTORIES = {
+    "vit": (create_vit_model, 0.001),
+    "efficientnet_b4": (create_efficientnet_model, 0.001),
+    "xception": (create_xception_model, 0.0001),
+}
+
+# 노트북 셀별 StepLR 주기 (EfficientNet 셀은 scheduler를 사용하지 않음)
+SCHEDULER_STEP_SIZE = {"vit": 5, "efficientnet_b4": None, "xception": 5}
+
+
+def create_backbone_model(backbone, num_classes, pretrained=True):
+    """백본 이름("vit", "efficientnet_b4", "xception")으로 전이 학습 모델을 생성합니다."""
+    if backbone not in MODEL_FACTORIES:
+        raise ValueError(f"Unknown backbone: {backbone} (choose from {', '.join(MODEL_FACTORIES)})")
+    factory, _ = MODEL_FACTORIES[backbone]
+    return factory(num_classes, pretrained=pretrained)
+
+
+def head_attribute(model):
+    """timm 모델에서 분류기(head) 모듈의 속성 이름 ("head", "classifier", "fc")."""
+    return model.pretrained_cfg["classifier"]
+
+
+def get_head(model):
+    """모델의 학습 대상 MLP head 모듈."""
+    return getattr(model, head_attribute(model))
+
+
+def set_head(model, head):
+    """모델의 head 모듈을 교체합니다 (특징 캐시로 학습한 head를 전체 모델에 다시 붙일 때)."""
+    setattr(model, head_attribute(model), head)
+    return model
+
+
+# 백본별 head 속성 이름 (체크포인트 state_dict 키로 backbone을 구분할 때 사용)
+HEAD_ATTRIBUTES = {"vit": "head", "efficientnet_b4": "classifier", "xception": "fc"}
+
+
+def infer_checkpoint_config(state_dict):
+    """
+    학습된 state_dict에서 backbone 이름과 클래스 수를 추정합니다.
+    (노트북의 `best_model_overall.pth`처럼 파일 이름에 backbone이 없는 체크포인트용)
+    Returns:
+        tuple: (backbone, num_classes)
+    """
+    for backbone, attribute in HEAD_ATTRIBUTES.items():
+        head_weights = [(int(key.split(".")[1]), value) for key, value in state_dict.items()
+                        if key.startswith(f"{attribute}.") and key.endswith(".weight") and value.ndim == 2]
+        if head_weights:
+            return backbone, max(head_weights, key=lambda item: item[0])[1].shape[0]
+    raise ValueError("Cannot infer the backbone from the checkpoint (no head/classifier/fc MLP weights)")
+
+
+def load_trained_model(checkpoint_path, backbone=None, num_classes=None, map_location="cpu"):
+    """
+    fold 루프가 저장한 체크포인트(state_dict)로 모델을 만들고 eval 모드로 반환합니다.
+    backbone/num_classes를 주지 않으면 state_dict에서 추정합니다 (사전 학습 가중치는 내려받지 않음).
+    Returns:
+        tuple: (model, backbone, num_classes)
+    """
+    state_dict = torch.load(checkpoint_path, map_location=map_location)
+    inferred_backbone, inferred_classes = infer_checkpoint_config(state_dict)
+    backbone = backbone or inferred_backbone
+    num_classes = num_classes or inferred_classes
+    model = create_backbone_model(backbone, num_classes, pretrained=False)
+    model.load_state_dict(state_dict)
+    return model.eval(), backbone, num_classes
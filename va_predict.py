@@ -0,0 +1,339 @@
+"""
+학습된 VA 모델로 새 안저 이미지를 예측하는 진입점 (배치 예측 CLI + 로컬 HTTP 서비스).
+
+fold 루프가 저장한 체크포인트(`best_vit_model_overall.pth`, `best_model_overall.pth` 등)를 한 번만 불러오고,
+학습과 같은 전처리(검은 테두리 크롭 → CLAHE → 리사이즈 → 정규화)를 적용합니다.
+- 배치 예측: 폴더 또는 파일 목록을 배치 단위로 예측하여 CSV/JSON으로 저장
+- HTTP 서비스: 동시에 들어온 요청을 최대 대기 시간(max latency) 안에서 마이크로 배치로 묶어 한 번에 forward
+
+실행:
+    python va_predict.py ./best_va_model/best_vit_model_overall.pth ./new_images --output predictions.csv
+    python va_predict.py ./best_va_model/best_vit_model_overall.pth --serve --port 8000 --max-latency-ms 20
+    curl --data-binary @image.bmp http://127.0.0.1:8000/predict
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import torch
+from PIL import Image
+from torch.utils.data import Dataset
+
+from step_4_crop2 import crop_image_to_black_square
+from va_dataset import IMAGE_SIZE, CLAHEPreprocess, cached_eval_transform
+from va_export import load_backend, load_metadata
+from va_loader import make_loader
+from va_models import load_trained_model
+
+IMAGE_EXTENSIONS = (".bmp", ".png", ".jpg", ".jpeg", ".tif", ".tiff")
+EXPORTED_EXTENSIONS = (".onnx", ".pt")
+
+
+def collect_image_paths(inputs):
+    """폴더(하위 폴더 포함)와 파일 경로를 받아 이미지 파일 목록을 정렬하여 반환합니다."""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                paths.extend(os.path.join(root, name) for name in files if name.lower().endswith(IMAGE_EXTENSIONS))
+        else:
+            paths.append(item)
+    return sorted(paths)
+
+
+class PredictPreprocess:
+    """
+    예측용 결정적 전처리: (선택) 검은 테두리 크롭 → CLAHE → 리사이즈 → 정규화.
+    CLAHE/리사이즈/정규화는 평가용 `eval_transform`과 같은 결과입니다.
+    """
+
+    def __init__(self, size=IMAGE_SIZE, crop=True):
+        """
+        Args:
+            crop (bool): step_4와 같은 검은 테두리 크롭 적용 (이미 크롭된 이미지면 False)
+        """
+        self.size = tuple(size)
+        self.crop = crop
+        self.clahe = CLAHEPreprocess(size)
+
+    def __call__(self, image):
+        """
+        Args:
+            image: 이미지 경로, 이미지 파일 bytes, PIL 이미지 또는 RGB uint8 배열
+        Returns:
+            Tensor: (3, H, W) 정규화된 float 텐서
+        """
+        if isinstance(image, (bytes, bytearray)):
+            image = Image.open(io.BytesIO(image))
+        elif isinstance(image, (str, os.PathLike)):
+            image = Image.open(image)
+        if isinstance(image, Image.Image):
+            image = np.asarray(image.convert("RGB"))
+        if self.crop:
+            image = crop_image_to_black_square(image)
+        image = np.array(self.clahe(image))  # PIL 리사이즈 결과는 읽기 전용이므로 쓰기 가능한 배열로 복사
+        return cached_eval_transform(torch.from_numpy(image).permute(2, 0, 1))
+
+
+class PredictDataset(Dataset):
+    """
+    파일별 전처리 Dataset. 읽을 수 없는 파일은 예외 대신 빈 텐서와 오류 메시지를 반환하여
+    배치 예측 전체가 중단되지 않게 합니다.
+    Returns:
+        tuple: (텐서, 인덱스, 오류 메시지 (성공하면 ""))
+    """
+
+    def __init__(self, image_paths, preprocess):
+        self.image_paths = image_paths
+        self.preprocess = preprocess
+
+    def __len__(self):
+        return len(self.image_paths)
+
+    def __getitem__(self, idx):
+        try:
+            return self.preprocess(self.image_paths[idx]), idx, ""
+        except Exception as error:
+            return torch.zeros(3, *self.preprocess.size), idx, f"{type(error).__name__}: {error}"
+
+
+class VAPredictor:
+    """체크포인트를 한 번 불러와 배치 단위로 VA 클래스를 예측합니다."""
+
+    def __init__(self, checkpoint_path, backbone=None, num_classes=None, crop=True, device=None, num_threads=None):
+        """
+        Args:
+            checkpoint_path (str): fold 루프가 저장한 state_dict (.pth) 또는 `va_export.py`로 내보낸 모델
+                (.onnx → ONNX Runtime CPU, .pt → TorchScript)
+            backbone (str, optional): "vit", "efficientnet_b4", "xception". None이면 체크포인트에서 추정
+            num_classes (int, optional): None이면 체크포인트에서 추정
+            crop (bool): 입력 이미지에 검은 테두리 크롭 적용
+            num_threads (int, optional): ONNX Runtime intra-op 스레드 수
+        """
+        if checkpoint_path.endswith(EXPORTED_EXTENSIONS):
+            self.device = torch.device("cpu")
+            metadata = load_metadata(checkpoint_path) or {}
+            self.model = load_backend(checkpoint_path, num_threads)
+            self.backbone = backbone or metadata.get("backbone")
+            self.num_classes = num_classes or metadata.get("num_classes")
+        else:
+            self.device = torch.device(device or ("cuda" if torch.cuda.is_available() else "cpu"))
+            self.model, self.backbone, self.num_classes = load_trained_model(checkpoint_path, backbone, num_classes,
+                                                                              map_location=self.device)
+            self.model.to(self.device)
+        self.preprocess = PredictPreprocess(crop=crop)
+
+    @torch.no_grad()
+    def predict_tensors(self, images):
+        """
+        Args:
+            images (Tensor): (B, 3, H, W) 전처리된 배치
+        Returns:
+            list: 이미지별 {"class", "va", "confidence", "probabilities"}
+        """
+        probabilities = torch.softmax(self.model(images.to(self.device)).float(), dim=1).cpu()
+        confidence, predicted = probabilities.max(dim=1)
+        return [{"class": int(c), "va": round(int(c) / 10, 1), "confidence": float(p),
+                 "probabilities": [round(float(v), 6) for v in probs]}
+                for c, p, probs in zip(predicted, confidence, probabilities)]
+
+    def predict_images(self, images):
+        """이미지(경로, bytes, PIL, 배열) 리스트를 한 배치로 예측합니다."""
+        return self.predict_tensors(torch.stack([self.preprocess(image) for image in images]))
+
+    def predict_paths(self, image_paths, batch_size=32, num_workers=0):
+        """
+        파일 목록을 배치 단위로 예측합니다 (전처리는 DataLoader 워커에서 병렬 수행).
+        읽을 수 없는 파일은 건너뛰지 않고 {"class": None, ..., "error": 오류 메시지}로 반환합니다.
+        Yields:
+            tuple: (이미지 경로, 예측 결과 딕셔너리 (성공하면 "error"는 None))
+        """
+        loader = make_loader(PredictDataset(image_paths, self.preprocess), batch_size=batch_size,
+                             num_workers=num_workers)
+        for images, indices, errors in loader:
+            valid = [i for i, error in enumerate(errors) if not error]
+            results = iter(self.predict_tensors(images[valid]) if valid else [])
+            for idx, error in zip(indices.tolist(), errors):
+                if error:
+                    result = {"class": None, "va": None, "confidence": None, "probabilities": None, "error": error}
+                else:
+                    result = {**next(results), "error": None}
+                yield image_paths[idx], result
+
+
+class MicroBatcher:
+    """
+    동시 요청을 마이크로 배치로 묶어 모델을 한 번에 실행하는 작업 스레드.
+
+    첫 요청이 들어온 뒤 max_batch_size개가 모이거나 max_latency_ms가 지나면 바로 실행하므로,
+    요청 하나의 추가 대기 시간은 max_latency_ms를 넘지 않습니다.
+    """
+
+    def __init__(self, predictor, max_batch_size=32, max_latency_ms=20):
+        self.predictor = predictor
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency_ms / 1000
+        self.requests = queue.Queue()
+        self.num_batches = 0
+        self.num_requests = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, tensor):
+        """전처리된 (3, H, W) 텐서를 넣고 결과를 받을 Future를 반환합니다."""
+        future = Future()
+        self.requests.put((tensor, future))
+        return future
+
+    def _collect(self):
+        batch = [self.requests.get()]
+        deadline = time.perf_counter() + self.max_latency
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            self.num_batches += 1
+            self.num_requests += len(batch)
+            try:
+                results = self.predictor.predict_tensors(torch.stack([tensor for tensor, _ in batch]))
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as error:  # 배치 실패는 해당 요청들에 모두 전달
+                for _, future in batch:
+                    future.set_exception(error)
+
+
+def make_handler(predictor, batcher):
+    """POST /predict (요청 본문 = 이미지 파일 bytes), GET /health 요청 처리기."""
+
+    class PredictHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path != "/health":
+                return self._send_json(404, {"error": "not found"})
+            self._send_json(200, {"backbone": predictor.backbone, "num_classes": predictor.num_classes,
+                                  "batches": batcher.num_batches, "requests": batcher.num_requests})
+
+        def do_POST(self):
+            if self.path != "/predict":
+                return self._send_json(404, {"error": "not found"})
+            try:
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                tensor = predictor.preprocess(body)  # 전처리는 요청 스레드에서 병렬로 수행
+            except Exception as error:
+                return self._send_json(400, {"error": f"invalid image: {error}"})
+            self._send_json(200, batcher.submit(tensor).result())
+
+        def log_message(self, format, *args):
+            pass  # 요청마다 stderr 로그를 남기지 않음
+
+    return PredictHandler
+
+
+def serve(predictor, host="127.0.0.1", port=8000, max_batch_size=32, max_latency_ms=20):
+    batcher = MicroBatcher(predictor, max_batch_size, max_latency_ms)
+    server = ThreadingHTTPServer((host, port), make_handler(predictor, batcher))
+    print(f"Serving {predictor.backbone} ({predictor.num_classes} classes) on http://{host}:{port}/predict "
+          f"(max batch {max_batch_size}, max latency {max_latency_ms} ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def write_predictions(rows, output_path):
+    """(경로, 결과) 목록을 .json 또는 .csv로 저장합니다."""
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    if output_path.endswith(".json"):
+        with open(output_path, "w") as f:
+            json.dump([{"path": path, **result} for path, result in rows], f, indent=2)
+        return
+    with open(output_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["path", "class", "va", "confidence", "error"])
+        for path, result in rows:
+            if result.get("error"):
+                writer.writerow([path, "", "", "", result["error"]])
+            else:
+                writer.writerow([path, result["class"], result["va"], f"{result['confidence']:.4f}", ""])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Predict VA classes with a trained checkpoint.")
+    parser.add_argument("checkpoint", help="학습된 모델 (.pth state_dict) 또는 내보낸 모델 (.onnx, .pt)")
+    parser.add_argument("inputs", nargs="*", help="이미지 폴더 또는 파일 (--file-list와 함께 사용 가능)")
+    parser.add_argument("--file-list", default=None, help="한 줄에 하나씩 이미지 경로가 적힌 파일")
+    parser.add_argument("--backbone", default=None, choices=["vit", "efficientnet_b4", "xception"],
+                        help="기본값: 체크포인트에서 추정")
+    parser.add_argument("--num-classes", type=int, default=None)
+    parser.add_argument("--no-crop", action="store_true", help="이미 크롭된 이미지 (step_4 결과)일 때")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--num-workers", type=int, default=0, help="전처리 DataLoader 워커 수")
+    parser.add_argument("--threads", type=int, default=None, help="intra-op 스레드 수")
+    parser.add_argument("--output", default=None, help="결과 저장 경로 (.csv 또는 .json, 기본값: 화면 출력)")
+    parser.add_argument("--serve", action="store_true", help="HTTP 서비스로 실행")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-latency-ms", type=float, default=20, help="마이크로 배치를 모으는 최대 대기 시간")
+    args = parser.parse_args(argv)
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    predictor = VAPredictor(args.checkpoint, args.backbone, args.num_classes, crop=not args.no_crop,
+                            num_threads=args.threads)
+    if args.serve:
+        return serve(predictor, args.host, args.port, args.batch_size, args.max_latency_ms)
+
+    inputs = list(args.inputs)
+    if args.file_list:
+        with open(args.file_list, "r") as f:
+            inputs.extend(line.strip() for line in f if line.strip())
+    image_paths = collect_image_paths(inputs)
+    if not image_paths:
+        parser.error("no images found in inputs")
+
+    start_time = time.time()
+    rows = list(predictor.predict_paths(image_paths, args.batch_size, args.num_workers))
+    elapsed = time.time() - start_time
+    failed = [(path, result["error"]) for path, result in rows if result["error"]]
+    if args.output:
+        write_predictions(rows, args.output)
+        print(f"Saved {len(rows)} predictions to {args.output}")
+    else:
+        for path, result in rows:
+            if not result["error"]:
+                print(f"{path}\tVA {result['va']:.1f}\t(confidence {result['confidence']:.3f})")
+    for path, error in failed:
+        print(f"Failed to process {path}: {error}")
+    print(f"{len(rows)} images in {elapsed:.2f}s ({len(rows) / elapsed:.1f} images/s, {predictor.backbone})"
+          + (f", {len(failed)} failed" if failed else ""))
+
+
+if __name__ == "__main__":
+    main()
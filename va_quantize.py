@@ -0,0 +1,216 @@
+"""
+CPU 예측용 int8 양자화 도구.
+
+fold 루프의 체크포인트를 받아 양자화 모델을 만들고, test 분할에서 fp32 대비 정확도/F1 차이를
+속도 향상, 파일 크기 감소와 함께 보고합니다.
+- static (기본값): ONNX로 내보낸 뒤 fold의 train 경로 일부로 activation 범위를 보정(calibration)하여
+  전체 모델(합성곱/행렬곱)을 int8로 양자화 → `<체크포인트 이름>.int8.onnx` (ONNX Runtime CPU로 실행).
+  비교 기준인 fp32 `<체크포인트 이름>.onnx`도 메타데이터(.json)와 함께 저장
+- dynamic-head: MLP head의 Linear만 동적 양자화 (보정 불필요, 더 간단하지만 backbone은 fp32 그대로)
+  → `<체크포인트 이름>.dynamic_head.pt` (TorchScript)
+모든 결과 모델은 `va_predict.py`에 그대로 넣어 예측할 수 있습니다.
+
+실행:
+    python va_quantize.py ./best_va_model/best_efficientnet_b4_model_overall.pth \
+        ./combined_dataset/combined_dataset.json --fold fold_0 --num-calibration 256 --threads 8
+"""
+import argparse
+import copy
+import gc
+import json
+import os
+import time
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from va_dataset import eval_transform
+from va_export import (EagerBackend, OnnxRuntimeBackend, TorchScriptBackend, export_metadata, export_onnx,
+                       export_torchscript, metadata_path)
+from va_loader import FoldManager
+from va_metrics import ConfusionMatrixMeter
+from va_models import get_head, load_trained_model, set_head
+
+QUANTIZATION_MODES = ("static", "dynamic-head")
+
+
+def sample_calibration_paths(split, fold_name, num_samples=256, seed=0):
+    """fold의 train 분할에서 보정용 이미지 경로를 무작위로 고릅니다 (test/val 이미지는 사용하지 않음)."""
+    indices = np.asarray(split.folds[fold_name]["train"])
+    rng = np.random.default_rng(seed)
+    chosen = rng.choice(indices, size=min(num_samples, len(indices)), replace=False)
+    return [split.paths[i] for i in sorted(chosen.tolist())]
+
+
+class ImageCalibrationReader:
+    """
+    ONNX Runtime `CalibrationDataReader`: 보정 이미지를 평가용 전처리로 변환하여 배치 단위로 공급.
+    `__len__`/`set_range`(배치 단위)를 지원하여 `CalibStridedMinMax`로 구간마다 범위를 계산할 수 있습니다.
+    """
+
+    def __init__(self, image_paths, batch_size=4, transform=eval_transform, input_name="images"):
+        self.image_paths = image_paths
+        self.batch_size = batch_size
+        self.transform = transform
+        self.input_name = input_name
+        self.set_range(0, len(self))
+
+    def __len__(self):
+        return (len(self.image_paths) + self.batch_size - 1) // self.batch_size
+
+    def set_range(self, start_index, end_index):
+        self._next, self._end = start_index, min(end_index, len(self))
+
+    def get_next(self):
+        from PIL import Image
+
+        if self._next >= self._end:
+            return None
+        start = self._next * self.batch_size
+        self._next += 1
+        batch_paths = self.image_paths[start:start + self.batch_size]
+        images = torch.stack([self.transform(Image.open(path).convert("RGB")) for path in batch_paths])
+        return {self.input_name: images.numpy()}
+
+    def rewind(self):
+        self.set_range(0, len(self))
+
+
+def quantize_static_onnx(fp32_path, output_path, calibration_paths, batch_size=4, per_channel=True):
+    """
+    fp32 ONNX 모델을 보정 이미지로 static int8 양자화합니다 (QDQ 형식, 가중치 int8 채널별, activation uint8).
+    보정은 배치마다 모든 중간 출력의 min/max를 누적하므로 메모리 사용량은 batch_size로 정해집니다.
+    Returns:
+        str: 양자화 모델 경로
+    """
+    from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    preprocessed_path = output_path + ".pre.onnx"
+    quant_pre_process(fp32_path, preprocessed_path)  # shape inference + 그래프 최적화 (양자화 권장 전처리)
+    try:
+        quantize_static(preprocessed_path, output_path, ImageCalibrationReader(calibration_paths, batch_size),
+                        quant_format=QuantFormat.QDQ, per_channel=per_channel, activation_type=QuantType.QUInt8,
+                        weight_type=QuantType.QInt8, calibrate_method=CalibrationMethod.MinMax,
+                        extra_options={"CalibStridedMinMax": 1})  # 배치마다 min/max를 누적하여 중간 출력을 쌓지 않음
+    finally:
+        os.remove(preprocessed_path)
+    return output_path
+
+
+def quantize_head_dynamic(model):
+    """MLP head의 Linear만 int8 동적 양자화한 모델 사본을 반환합니다 (backbone은 fp32 그대로)."""
+    from torch.ao.quantization import quantize_dynamic
+
+    quantized = copy.deepcopy(model).eval()
+    return set_head(quantized, quantize_dynamic(get_head(quantized), {nn.Linear}, dtype=torch.qint8))
+
+
+def evaluate_backend(backend, test_loader):
+    """test 분할 예측의 혼동 행렬 누적기를 반환합니다."""
+    meter = None
+    for images, labels in test_loader:
+        logits = backend(images)
+        if meter is None:
+            meter = ConfusionMatrixMeter(logits.shape[1])
+        meter.update(logits, labels)
+    return meter
+
+
+def measure_latency(backend, batch_size=16, steps=5):
+    """무작위 입력 batch의 지연 시간 중앙값(ms)."""
+    images = torch.randn(batch_size, 3, 224, 224)
+    backend(images)
+    times = []
+    for _ in range(steps):
+        start = time.perf_counter()
+        backend(images)
+        times.append(time.perf_counter() - start)
+    return 1000 * float(np.median(times))
+
+
+def quantize_checkpoint(checkpoint_path, split_path, fold_name=None, mode="static", output_dir=None,
+                        num_calibration=256, batch_size=16, num_threads=None, seed=0, steps=5,
+                        calibration_batch_size=4):
+    """
+    체크포인트를 양자화하고 fp32와 비교합니다.
+    Args:
+        split_path (str): combined_dataset.json 또는 .npz (보정용 train 경로와 평가용 test 분할)
+        fold_name (str, optional): 보정 이미지를 고를 fold (기본값: 첫 번째 fold)
+        mode (str): "static" 또는 "dynamic-head"
+        output_dir (str, optional): 결과 저장 폴더 (기본값: 체크포인트와 같은 폴더)
+    Returns:
+        dict: {"quantized_path", "fp32", "quantized"} (각각 size_mb, latency_ms, accuracy, f1 ...)
+    """
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown mode: {mode} (choose from {', '.join(QUANTIZATION_MODES)})")
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    model, backbone, num_classes = load_trained_model(checkpoint_path)
+    output_dir = output_dir or os.path.dirname(os.path.abspath(checkpoint_path))
+    stem = os.path.join(output_dir, os.path.splitext(os.path.basename(checkpoint_path))[0])
+    manager = FoldManager.from_path(split_path, batch_size=batch_size, eval_transform=eval_transform, seed=seed)
+    fold_name = fold_name or manager.fold_names[0]
+
+    if mode == "static":
+        fp32_path = export_onnx(model, stem + ".onnx")  # 비교 기준이자 va_predict.py로 바로 쓸 수 있는 fp32 모델
+        with open(metadata_path(fp32_path), "w") as f:
+            json.dump(export_metadata(backbone, num_classes), f, indent=4)
+        del model  # 보정 중 메모리 확보 (이후 비교는 ONNX Runtime fp32 모델로 수행)
+        gc.collect()
+        calibration_paths = sample_calibration_paths(manager.split, fold_name, num_calibration, seed)
+        quantized_path = quantize_static_onnx(fp32_path, stem + ".int8.onnx", calibration_paths,
+                                              calibration_batch_size)
+        backends = {"fp32": (OnnxRuntimeBackend(fp32_path, num_threads), fp32_path),
+                    "quantized": (OnnxRuntimeBackend(quantized_path, num_threads), quantized_path)}
+    else:
+        calibration_paths = []
+        quantized_path = export_torchscript(quantize_head_dynamic(model), stem + ".dynamic_head.pt")
+        backends = {"fp32": (EagerBackend(model), checkpoint_path),
+                    "quantized": (TorchScriptBackend(quantized_path), quantized_path)}
+    with open(metadata_path(quantized_path), "w") as f:
+        json.dump({**export_metadata(backbone, num_classes), "quantization": mode, "calibration_fold": fold_name,
+                   "num_calibration": len(calibration_paths)}, f, indent=4)
+
+    test_loader = manager.test_loader()
+    results = {"quantized_path": quantized_path, "backbone": backbone, "mode": mode}
+    for name, (backend, path) in backends.items():
+        meter = evaluate_backend(backend, test_loader)
+        results[name] = {"size_mb": os.path.getsize(path) / 2 ** 20,
+                         "latency_ms": measure_latency(backend, batch_size, steps),
+                         "accuracy": float(meter.accuracy()), "f1": meter.f1("weighted")}
+    return results
+
+
+def print_report(results, batch_size):
+    fp32, quantized = results["fp32"], results["quantized"]
+    print(f"\nBackbone: {results['backbone']}, mode: {results['mode']} -> {results['quantized_path']}")
+    print(f"{'Model':<10}{'Size (MB)':>11}{'ms/batch':>10}{'img/s':>9}{'Test Acc (%)':>14}{'Test F1':>10}")
+    for name, row in (("fp32", fp32), ("int8", quantized)):
+        print(f"{name:<10}{row['size_mb']:>11.1f}{row['latency_ms']:>10.1f}{1000 * batch_size / row['latency_ms']:>9.1f}"
+              f"{row['accuracy']:>14.2f}{row['f1']:>10.4f}")
+    print(f"Speedup: {fp32['latency_ms'] / quantized['latency_ms']:.2f}x, "
+          f"size: {fp32['size_mb'] / quantized['size_mb']:.2f}x smaller, "
+          f"accuracy delta: {quantized['accuracy'] - fp32['accuracy']:+.2f}%p, "
+          f"F1 delta: {quantized['f1'] - fp32['f1']:+.4f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Quantize a trained checkpoint to int8 and compare with fp32.")
+    parser.add_argument("checkpoint", help="fold 루프가 저장한 state_dict (.pth)")
+    parser.add_argument("split_path", help="combined_dataset.json 또는 .npz")
+    parser.add_argument("--fold", default=None, help="보정 이미지를 고를 fold (기본값: 첫 번째 fold)")
+    parser.add_argument("--mode", default="static", choices=QUANTIZATION_MODES)
+    parser.add_argument("--num-calibration", type=int, default=256, help="보정에 사용할 train 이미지 수")
+    parser.add_argument("--output-dir", default=None, help="기본값: 체크포인트와 같은 폴더")
+    parser.add_argument("--batch-size", type=int, default=16, help="test 평가/지연 시간 측정 batch 크기")
+    parser.add_argument("--calibration-batch-size", type=int, default=4, help="보정 batch 크기 (메모리 사용량 결정)")
+    parser.add_argument("--threads", type=int, default=None, help="intra-op 스레드 수")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    results = quantize_checkpoint(args.checkpoint, args.split_path, args.fold, args.mode, args.output_dir,
+                                  args.num_calibration, args.batch_size, args.threads, args.seed,
+                                  calibration_batch_size=args.calibration_batch_size)
+    print_report(results, args.batch_size)